@@ -0,0 +1,176 @@
+"""Backtest por replay de eventos: o ``TradingEngine`` real sobre candles históricos.
+
+A gravação (``mt5_replay.Recording``/``.npz`` ou trecho do ``HistoryStore``) é servida pelo
+``mt5_replay`` e o relógio da replay é injetado no engine; a cada abertura de candle M5 o
+relógio salta para o limite e o engine processa os eventos de 15m/5m pelos mesmos métodos do
+loop ao vivo, gravando os trades no formato de ``_persist_closed_trade``.
+
+Uso: ``python backtest.py replay/win_2024.npz --start 2024-03-01 --reports backtests/run1``
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+import mt5_replay
+
+mt5_replay.install()
+
+import mt5_connector  # noqa: E402  (precisa ver o mt5_replay instalado acima)
+from engine import TradingEngine  # noqa: E402
+from execution_manager import ExecutionManager  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+from intrabar import DrillDownStats, IntrabarResolver  # noqa: E402
+from mark_store import MarkStore  # noqa: E402
+from mt5_connector import MT5Connector  # noqa: E402
+from mt5_replay import Recording, server_epoch  # noqa: E402
+from risk_manager import ExitParams  # noqa: E402
+
+
+@dataclass
+class BacktestResult:
+    bars: int
+    trades: int
+    result_points: float
+    elapsed: float
+    reports_dir: Path
+    drill_down: Optional[DrillDownStats] = None
+
+    @property
+    def bars_per_second(self) -> float:
+        return self.bars / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def recording_from_store(store: HistoryStore, symbol: str, timeframes: list[int], date_from, date_to) -> Recording:
+    """Monta uma gravação de replay a partir do histórico local (sem tocar no terminal)."""
+    recording = Recording()
+    for tf in timeframes:
+        recording.rates[(symbol, tf)] = np.array(store.read_range(symbol, tf, date_from, date_to))
+    return recording
+
+
+def run_backtest(
+    source: Recording | Path | str,
+    start=None,
+    end=None,
+    symbol: str = "WIN$",
+    capital: float = 10000.0,
+    contracts: int = 5,
+    reports_dir: str | Path = "backtests/replay",
+    derive_from: Optional[int] = None,
+    detection_lag: float = 0.0,
+    logger: Optional[logging.Logger] = None,
+    exit_params: Optional[ExitParams] = None,
+    intrabar: bool = False,
+    marks: bool = False,
+) -> BacktestResult:
+    """Roda o engine candle a candle (M5) entre ``start`` e ``end`` no horário do servidor.
+
+    ``detection_lag`` é o atraso, em segundos após a abertura, com que o loop ao vivo
+    percebe o candle novo; o candle M5 em formação entra no snapshot com esse estado.
+    ``intrabar`` liga as saídas pela máxima/mínima com drill-down (``IntrabarResolver``).
+    ``marks`` grava a marcação a mercado em ``<reports_dir>/marks``, regravando os meses da execução.
+    """
+    if mt5_connector.mt5 is not mt5_replay:
+        raise RuntimeError("mt5_connector foi importado com o MetaTrader5 real; importe backtest antes")
+
+    logger = logger or logging.getLogger("backtest")
+    session = mt5_replay.load(source)
+    base = session.recording.rates[(symbol, mt5_replay.TIMEFRAME_M5)]["time"]
+    lo = server_epoch(start) if start is not None else int(base[0])
+    hi = server_epoch(end) if end is not None else int(base[-1])
+    bar_times = base[(base >= lo) & (base <= hi)]
+    if len(bar_times) == 0:
+        raise ValueError("Nenhum candle M5 no intervalo do backtest")
+
+    session.clock.set(int(bar_times[0]))
+    session.clock.advance(detection_lag)
+    connector = MT5Connector(logger, derive_from=derive_from)
+    if not connector.connect(0, "", session.server):
+        raise RuntimeError("Falha ao iniciar a replay")
+    resolver = IntrabarResolver.from_mt5(mt5_replay) if intrabar else None
+    engine = TradingEngine(
+        logger,
+        connector,
+        ExecutionManager(logger),
+        capital,
+        symbol=symbol,
+        clock=session.clock,
+        reports_dir=str(reports_dir),
+        exit_params=exit_params,
+        intrabar=resolver,
+        marks=MarkStore(Path(reports_dir) / "marks", overwrite=True) if marks else None,
+    )
+
+    def ignore(_: str) -> None:
+        return None
+
+    started = time.perf_counter()
+    engine._process_15m_event(contracts, tag="INIT")
+    for bar_time in bar_times.tolist()[1:]:
+        session.clock.set(bar_time)
+        session.clock.advance(detection_lag)
+        engine.process_new_bars(contracts, ignore)
+    elapsed = time.perf_counter() - started
+    engine.journal.close(timeout=None)
+    if engine.marks is not None:
+        engine.marks.close()
+    connector.disconnect()
+
+    return BacktestResult(
+        bars=len(bar_times),
+        trades=engine._trade_count,
+        result_points=engine.risk.result_points,
+        elapsed=elapsed,
+        reports_dir=Path(reports_dir),
+        drill_down=resolver.stats if resolver is not None else None,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="arquivo .npz do mt5_replay")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--symbol", default="WIN$")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--contracts", type=int, default=5)
+    parser.add_argument("--reports", default="backtests/replay")
+    parser.add_argument("--derive-from", type=int)
+    parser.add_argument("--intrabar", action="store_true", help="stop/take pela máxima/mínima, com drill-down em M1/ticks")
+    parser.add_argument("--marks", action="store_true", help="grava a marcação a mercado a cada 5m em <reports>/marks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s | %(message)s")
+    result = run_backtest(
+        args.recording,
+        args.start,
+        args.end,
+        symbol=args.symbol,
+        capital=args.capital,
+        contracts=args.contracts,
+        reports_dir=args.reports,
+        derive_from=args.derive_from,
+        intrabar=args.intrabar,
+        marks=args.marks,
+    )
+    print(
+        f"candles={result.bars} trades={result.trades} resultado={result.result_points:.2f} pts "
+        f"tempo={result.elapsed:.2f}s ({result.bars_per_second:.0f} candles/s) relatórios={result.reports_dir}"
+    )
+    drill = result.drill_down
+    if drill is not None:
+        print(
+            f"intrabar: saídas={drill.touches} drill-down={drill.drilled} (M1={drill.resolved_m1} "
+            f"ticks={drill.resolved_ticks} sem_dados={drill.unresolved})"
+        )
+
+
+if __name__ == "__main__":
+    main()
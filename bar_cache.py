@@ -0,0 +1,157 @@
+"""Cache de candles por (símbolo, timeframe) com ring buffers NumPy e busca incremental no MT5."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+
+RatesFetcher = Callable[[str, int, int, int], Optional[np.ndarray]]
+PRICE_FIELDS = ("open", "high", "low", "close")
+
+
+def valid_rates(rates: np.ndarray) -> np.ndarray:
+    """Remove candles com OHLC não finito sem copiar quando todos são válidos."""
+    mask = np.isfinite(rates["open"])
+    for name in PRICE_FIELDS[1:]:
+        mask &= np.isfinite(rates[name])
+    return rates if mask.all() else rates[mask]
+
+
+class BarRingBuffer:
+    """Ring buffer de capacidade fixa que sempre entrega os últimos N candles contíguos.
+
+    Cada linha é gravada duas vezes (posição ``i`` e ``i + capacity``), então qualquer
+    janela final cabe num fatiamento simples do array e é servida como view, sem cópia.
+    """
+
+    def __init__(self, capacity: int, dtype: np.dtype) -> None:
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._writes = 0
+
+    def __len__(self) -> int:
+        return min(self._writes, self.capacity)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if not self._writes:
+            return None
+        return int(self._data["time"][(self._writes - 1) % self.capacity])
+
+    def clear(self) -> None:
+        self._writes = 0
+
+    def _put(self, index: int, row) -> None:
+        self._data[index] = row
+        self._data[index + self.capacity] = row
+
+    def merge(self, rates: np.ndarray) -> int:
+        """Regrava o último candle (em formação) e anexa os mais novos; retorna quantos entraram."""
+        last_time = self.last_time
+        appended = 0
+        for row in rates:
+            row_time = int(row["time"])
+            if last_time is not None and row_time < last_time:
+                continue
+            if last_time is not None and row_time == last_time:
+                self._put((self._writes - 1) % self.capacity, row)
+                continue
+            self._put(self._writes % self.capacity, row)
+            self._writes += 1
+            last_time = row_time
+            appended += 1
+        return appended
+
+    def view(self, count: Optional[int] = None) -> np.ndarray:
+        size = len(self)
+        count = size if count is None else min(count, size)
+        end = (self._writes - 1) % self.capacity + self.capacity + 1 if size else 0
+        out = self._data[end - count:end]
+        out.flags.writeable = False
+        return out
+
+
+@dataclass
+class BarCacheStats:
+    requests: int = 0
+    bars_received: int = 0
+    full_reloads: int = 0
+
+
+class BarCache:
+    """Mantém ``BarRingBuffer`` por (símbolo, timeframe) e pede ao MT5 só o delta.
+
+    Com o cache aquecido a busca começa com ``initial_delta`` candles a partir da posição 0
+    (o último candle já conhecido mais o em formação) e só amplia a janela se não houver
+    sobreposição com o que já está no buffer.
+    """
+
+    def __init__(self, fetch: RatesFetcher, capacity: int = 300, initial_delta: int = 2) -> None:
+        self._fetch = fetch
+        self.capacity = capacity
+        self.initial_delta = initial_delta
+        self.stats = BarCacheStats()
+        self._buffers: dict[tuple[str, Hashable], BarRingBuffer] = {}
+
+    def buffer(self, symbol: str, timeframe: int) -> Optional[BarRingBuffer]:
+        return self._buffers.get((symbol, timeframe))
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        if symbol is None:
+            self._buffers.clear()
+            return
+        for key in [k for k in self._buffers if k[0] == symbol]:
+            del self._buffers[key]
+
+    def export_state(self) -> dict[str, np.ndarray]:
+        return {f"{symbol}|{timeframe}": buf.view().copy() for (symbol, timeframe), buf in self._buffers.items() if len(buf)}
+
+    def restore_state(self, arrays: dict[str, np.ndarray]) -> None:
+        for key, rates in arrays.items():
+            symbol, timeframe = key.rsplit("|", 1)
+            buf = BarRingBuffer(self.capacity, rates.dtype)
+            buf.merge(rates[-self.capacity:])
+            self._buffers[(symbol, int(timeframe))] = buf
+
+    def _request(self, symbol: str, timeframe: int, count: int) -> Optional[np.ndarray]:
+        rates = self._fetch(symbol, timeframe, 0, count)
+        self.stats.requests += 1
+        if rates is None:
+            return None
+        self.stats.bars_received += len(rates)
+        return valid_rates(rates)
+
+    def refresh(self, symbol: str, timeframe: int) -> Optional[np.ndarray]:
+        """Atualiza o buffer com o delta do MT5 e devolve a view dos candles em cache."""
+        key = (symbol, timeframe)
+        buf = self._buffers.get(key)
+        if buf is not None and len(buf):
+            last_time = buf.last_time
+            count = self.initial_delta
+            while True:
+                rates = self._request(symbol, timeframe, count)
+                if rates is None or len(rates) == 0:
+                    return buf.view()
+                if int(rates[0]["time"]) <= last_time:
+                    buf.merge(rates)
+                    return buf.view()
+                if count >= self.capacity:
+                    break
+                count = min(count * 4, self.capacity)
+        else:
+            rates = self._request(symbol, timeframe, self.capacity)
+            if rates is None or len(rates) == 0:
+                return None
+
+        self.stats.full_reloads += 1
+        if buf is None or buf.dtype != rates.dtype:
+            buf = BarRingBuffer(self.capacity, rates.dtype)
+            self._buffers[key] = buf
+        buf.clear()
+        buf.merge(rates)
+        return buf.view()
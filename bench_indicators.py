@@ -0,0 +1,104 @@
+"""Microbenchmark e checagem de paridade dos kernels de ``indicators`` contra pandas.
+
+Uso: ``python bench_indicators.py [--bars 300 25000] [--repeat 20]``
+"""
+from __future__ import annotations
+
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+
+def pandas_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    """Expressão original de ``MT5Connector._atr``."""
+    tr1 = df["high"] - df["low"]
+    tr2 = (df["high"] - df["close"].shift()).abs()
+    tr3 = (df["low"] - df["close"].shift()).abs()
+    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    return tr.ewm(alpha=1 / period, adjust=False).mean().fillna(0).astype("float64")
+
+
+def pandas_adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
+    """Expressão original de ``MT5Connector._adx``."""
+    high = df["high"].astype("float64")
+    low = df["low"].astype("float64")
+    close = df["close"].astype("float64")
+
+    up_move = high.diff()
+    down_move = -low.diff()
+
+    plus_dm = pd.Series(np.where((up_move > down_move) & (up_move > 0), up_move, np.nan), index=df.index, dtype="float64")
+    minus_dm = pd.Series(np.where((down_move > up_move) & (down_move > 0), down_move, np.nan), index=df.index, dtype="float64")
+
+    tr = pd.concat([(high - low), (high - close.shift()).abs(), (low - close.shift()).abs()], axis=1).max(axis=1).astype("float64")
+    atr = tr.ewm(alpha=1 / period, adjust=False).mean().replace(0, np.nan).astype("float64")
+
+    plus_di = (100 * plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr).astype("float64")
+    minus_di = (100 * minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr).astype("float64")
+    dx = (100 * (plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)).astype("float64")
+    return dx.ewm(alpha=1 / period, adjust=False).mean().fillna(0).astype("float64")
+
+
+def synthetic_bars(n: int, seed: int = 7) -> pd.DataFrame:
+    """Candles sintéticos no padrão WIN (múltiplos de 5 pontos)."""
+    rng = np.random.default_rng(seed)
+    close = 120_000 + np.cumsum(rng.normal(0, 60, n)).round() // 5 * 5
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) + rng.integers(0, 40, n) * 5
+    low = np.minimum(open_, close) - rng.integers(0, 40, n) * 5
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close})
+
+
+def cases(df: pd.DataFrame) -> dict[str, tuple]:
+    h, lo, c = (df[col].to_numpy() for col in ("high", "low", "close"))
+    return {
+        "ema20": (lambda: df["close"].ewm(span=20, adjust=False).mean(), lambda: indicators.ema(c, 20)),
+        "ema50": (lambda: df["close"].ewm(span=50, adjust=False).mean(), lambda: indicators.ema(c, 50)),
+        "atr14": (lambda: pandas_atr(df), lambda: indicators.wilder_atr(h, lo, c)),
+        "adx14": (lambda: pandas_adx(df), lambda: indicators.adx(h, lo, c)),
+        "mean30": (lambda: df["close"].rolling(30).mean(), lambda: indicators.rolling_mean(c, 30)),
+        "max5": (lambda: df["high"].rolling(5).max(), lambda: indicators.rolling_max(h, 5)),
+        "min5": (lambda: df["low"].rolling(5).min(), lambda: indicators.rolling_min(lo, 5)),
+    }
+
+
+def max_rel_diff(expected: pd.Series, actual: np.ndarray) -> float:
+    exp = expected.to_numpy(dtype="float64")
+    if not np.array_equal(np.isnan(exp), np.isnan(actual)):
+        return float("inf")
+    mask = ~np.isnan(exp)
+    if not mask.any():
+        return 0.0
+    scale = np.maximum(np.abs(exp[mask]), 1.0)
+    return float(np.max(np.abs(exp[mask] - actual[mask]) / scale))
+
+
+def run(bars: list[int], repeat: int) -> bool:
+    ok = True
+    print(f"{'bars':>7} {'indicador':<8} {'pandas_us':>10} {'numpy_us':>10} {'ganho':>6} {'max_rel_diff':>13}")
+    for n in bars:
+        df = synthetic_bars(n)
+        for name, (ref, fast) in cases(df).items():
+            diff = max_rel_diff(ref(), fast())
+            ok &= diff <= 1e-12
+            t_ref = min(timeit.repeat(ref, number=1, repeat=repeat)) * 1e6
+            t_fast = min(timeit.repeat(fast, number=1, repeat=repeat)) * 1e6
+            print(f"{n:>7} {name:<8} {t_ref:>10.1f} {t_fast:>10.1f} {t_ref / t_fast:>5.1f}x {diff:>13.3g}")
+    print("paridade:", "OK" if ok else "FALHOU")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bars", type=int, nargs="+", default=[300, 25_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args.bars, args.repeat) else 1)
+
+
+if __name__ == "__main__":
+    main()
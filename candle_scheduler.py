@@ -0,0 +1,101 @@
+"""Agendamento da detecção de candles pelos limites M5/M15/H1 no horário do servidor."""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+@dataclass
+class SchedulerStats:
+    boundaries: int = 0
+    polls: int = 0
+    timeouts: int = 0
+    last_detection_delay: float = 0.0
+
+
+class CandleScheduler:
+    """Dorme até pouco antes do próximo limite de candle e então consulta em ritmo curto.
+
+    Os horários seguem a convenção de timestamps do MT5 (horário de parede do servidor
+    codificado como epoch). ``offset`` é a diferença estimada entre esse horário e
+    ``clock.time()``; é calibrada pelo tick do servidor e pelo instante em que cada candle
+    novo aparece, então acordamos ``lead`` segundos antes sem depender do relógio local.
+    Se o candle demora a surgir, as consultas são espaçadas até ``max_poll_interval``.
+    """
+
+    def __init__(
+        self,
+        clock,
+        base_period: int = 300,
+        lead: float = 0.3,
+        poll_interval: float = 0.05,
+        poll_timeout: float = 20.0,
+        max_poll_interval: float = 2.0,
+        max_sleep_chunk: float = 1.0,
+    ) -> None:
+        self.clock = clock
+        self.base_period = base_period
+        self.lead = lead
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+        self.max_poll_interval = max_poll_interval
+        self.max_sleep_chunk = max_sleep_chunk
+        self.offset = 0.0
+        self.stats = SchedulerStats()
+
+    def server_time(self) -> float:
+        return self.clock.time() + self.offset
+
+    def calibrate(self, server_epoch: Optional[float]) -> None:
+        """Ajusta o offset com um horário conhecido do servidor (ex.: tick mais recente).
+
+        O offset medido substitui o anterior, inclusive quando negativo (servidor atrás do
+        relógio local); a detecção de cada candle em ``wait_for_bar`` refina o valor depois.
+        """
+        if server_epoch is None:
+            return
+        self.offset = server_epoch - self.clock.time()
+
+    def next_boundary(self, period: Optional[int] = None) -> int:
+        period = period or self.base_period
+        return (int(self.server_time()) // period + 1) * period
+
+    def _sleep(self, seconds: float, stop_event: threading.Event) -> None:
+        while seconds > 0 and not stop_event.is_set():
+            step = min(seconds, self.max_sleep_chunk)
+            self.clock.sleep(step)
+            seconds -= step
+
+    def wait_for_bar(
+        self,
+        boundary: int,
+        last_bar_time: Callable[[], Optional[int]],
+        stop_event: threading.Event,
+    ) -> Optional[int]:
+        """Espera o candle com abertura ``boundary`` surgir; ``None`` em timeout/parada."""
+        self.stats.boundaries += 1
+        self._sleep(boundary - self.lead - self.server_time(), stop_event)
+
+        first_poll = True
+        interval = self.poll_interval
+        while not stop_event.is_set():
+            bar_time = last_bar_time()
+            self.stats.polls += 1
+            if bar_time is not None and bar_time >= boundary:
+                self.stats.last_detection_delay = self.server_time() - bar_time
+                if first_poll:
+                    # Acordamos tarde demais para medir o atraso: antecipa a próxima janela.
+                    self.offset -= self.lead
+                else:
+                    self.offset = bar_time - self.clock.time()
+                return bar_time
+            first_poll = False
+            if self.server_time() >= boundary + self.poll_timeout:
+                self.stats.timeouts += 1
+                return None
+            if self.server_time() > boundary + 1.0:
+                # Candle atrasado (leilão, mercado fechado): espaça as consultas.
+                interval = min(interval * 2, self.max_poll_interval)
+            self._sleep(interval, stop_event)
+        return None
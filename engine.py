@@ -1,21 +1,23 @@
 """Motor principal orientado a eventos de candle para o Sniper Adaptativo."""
 from __future__ import annotations
 
-import os
 import threading
-import time
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
+from pathlib import Path
 from typing import Callable, Optional
 
-import pandas as pd
-
+from candle_scheduler import CandleScheduler
 from equity_tracker import EquityTracker
 from execution_manager import ExecutionManager
-from mt5_connector import MT5Connector
+from intrabar import IntrabarResolver
+from mark_store import MarkStore
+from mt5_connector import MT5Connector, mt5
 from regime_detector import RegimeDetector, RegimeSignal
-from risk_manager import RiskManager
-from utils import TradingWindow, is_expiration_day, is_within_trading_window, now_b3, points_to_reais
+from risk_manager import ExitParams, RiskManager
+from trade_journal import TradeJournal
+from tracing import DEBUG, TRACER, Subscription, callback_sink
+from utils import SystemClock, TradingWindow, is_expiration_day, is_within_trading_window, points_to_reais, timeframe_seconds
 
 
 @dataclass
@@ -43,6 +45,19 @@ class SimulatedPosition:
     slope_rel: float
     rr_ratio: float
     breakeven_armed: bool = False
+    entry_bar_time: int = 0  # abertura (epoch do servidor) do candle M5 da entrada
+    mfe_points: float = 0.0  # maior excursão favorável vista (pontos, >= 0)
+    mae_points: float = 0.0  # maior excursão adversa vista (pontos, >= 0)
+
+    def move(self, price: float) -> float:
+        """Resultado não realizado (pontos) se a posição fosse fechada em ``price``."""
+        return price - self.entry_price if self.side == "BUY" else self.entry_price - price
+
+    def observe(self, price: float) -> None:
+        """Atualiza MFE/MAE com um preço visto pelo engine enquanto a posição está aberta."""
+        move = self.move(price)
+        self.mfe_points = max(self.mfe_points, move)
+        self.mae_points = max(self.mae_points, -move)
 
 
 class TradingEngine:
@@ -55,18 +70,37 @@ class TradingEngine:
         symbol: str = "WIN$",
         debug_mode: bool = False,
         debug_callback: Callable[[str], None] | None = None,
+        clock=None,
+        reports_dir: str = "reports",
+        exit_params: ExitParams | None = None,
+        intrabar: IntrabarResolver | None = None,
+        journal: TradeJournal | None = None,
+        marks: MarkStore | None = None,
     ) -> None:
         self.logger = logger
+        self.exit_params = exit_params or ExitParams()
+        self.intrabar = intrabar
+        self.reports_dir = reports_dir
+        self.journal = journal or TradeJournal(reports_dir, logger=logger)
+        self.journal.start()  # recupera o WAL aqui, não na thread do engine ao fechar o primeiro trade
+        # marcação a mercado: padrão só ao vivo; replay/backtest (relógio injetado) só se pedirem
+        self.marks = marks if marks is not None or clock is not None else MarkStore(Path(reports_dir) / "marks")
+        self.clock = clock or SystemClock()
+        # checkpoint do conector só ao vivo e com ``state_path``; replay/backtest injetam o relógio
+        self.checkpoint_state = connector.state_path is not None and clock is None
+        self.scheduler = CandleScheduler(self.clock)
         self.connector = connector
         self.execution = execution_manager
         self.symbol = symbol
         self.debug_mode = debug_mode
         self._debug_callback = debug_callback
+        self.tracer = TRACER
+        self._debug_subs: list[Subscription] = []
 
         self.window = TradingWindow()
         self.risk = RiskManager(capital)
         self.equity = EquityTracker()
-        self.regime_detector = RegimeDetector(debug_mode=debug_mode, debug_callback=debug_callback)
+        self.regime_detector = RegimeDetector()
         self.state = EngineState()
 
         self._thread: Optional[threading.Thread] = None
@@ -80,13 +114,21 @@ class TradingEngine:
 
         self.active_position: SimulatedPosition | None = None
 
-    def _debug(self, message: str) -> None:
-        if not self.debug_mode:
+    def _attach_debug(self) -> None:
+        """Assina o tracer com o debug legado: engine → logger + GUI, regime → só GUI."""
+        if not self.debug_mode or self._debug_subs:
             return
-        payload = f"[DEBUG] {message}"
-        self.logger.info(payload)
+        self._debug_subs.append(self.tracer.subscribe(callback_sink(self._debug_callback, self.logger), DEBUG, {"engine"}))
         if self._debug_callback:
-            self._debug_callback(payload)
+            self._debug_subs.append(self.tracer.subscribe(callback_sink(self._debug_callback), DEBUG, {"regime"}))
+
+    def _detach_debug(self) -> None:
+        for sub in self._debug_subs:
+            self.tracer.unsubscribe(sub)
+        self._debug_subs.clear()
+
+    def _debug(self, message: str, **fields) -> None:
+        self.tracer.emit("engine", DEBUG, message, **fields)
 
     def _signal(self, message: str) -> None:
         payload = f"[TRADE] {message}"
@@ -99,7 +141,7 @@ class TradingEngine:
         self.logger.info(
             "[STARTUP] %s | simbolo=%s | estrategia=Sniper Adaptativo | capital=%.2f | max_contratos=%s | "
             "timeframes=5m,15m,60m | mt5=%s | debug=%s",
-            now_b3().strftime("%Y-%m-%d %H:%M:%S"),
+            self.clock.now().strftime("%Y-%m-%d %H:%M:%S"),
             self.symbol,
             self.risk.capital,
             contracts_limit,
@@ -109,7 +151,7 @@ class TradingEngine:
 
     def _active_blocks(self) -> str:
         blocks = []
-        now = now_b3()
+        now = self.clock.now()
         if is_expiration_day(now.date()):
             blocks.append("vencimento")
         if not is_within_trading_window(now, self.window):
@@ -150,7 +192,7 @@ class TradingEngine:
         )
 
     def _can_trade_now(self) -> bool:
-        now = now_b3()
+        now = self.clock.now()
         if is_expiration_day(now.date()):
             self.state.blocked_reason = "Dia de vencimento"
             return False
@@ -188,9 +230,8 @@ class TradingEngine:
         return pullback_ok, "pullback"
 
     def _open_position(self, contracts: int, snapshot: dict, signal: RegimeSignal) -> None:
-        stop_points_base = 1.2 * snapshot["atr15"]
-        dist_mult = 2.5 if snapshot["ema_distance_atr"] > 1.5 else 2.0
-        take_points = dist_mult * stop_points_base
+        stop_points_base = self.exit_params.stop_atr * snapshot["atr15"]
+        take_points = self.exit_params.take_multiplier(snapshot["ema_distance_atr"]) * stop_points_base
         entry_price = snapshot["close_5m"]
 
         if signal.direction == "COMPRA":
@@ -215,7 +256,7 @@ class TradingEngine:
             take_price=take_price,
             stop_points=stop_points,
             take_points=take_points,
-            opened_at=now_b3(),
+            opened_at=self.clock.now(),
             regime=signal.regime,
             confidence=signal.confidence_score,
             atr15=snapshot["atr15"],
@@ -223,6 +264,7 @@ class TradingEngine:
             dist_rel=signal.dist_rel_15,
             slope_rel=slope_rel,
             rr_ratio=rr_ratio,
+            entry_bar_time=int(snapshot["last_candle_time_5m"].timestamp()),
         )
         self._signal(
             f"ABERTURA {('COMPRA' if side == 'BUY' else 'VENDA')} | Entrada={entry_price:.2f} | "
@@ -230,11 +272,6 @@ class TradingEngine:
         )
 
     def _persist_closed_trade(self, pos: SimulatedPosition, exit_price: float, reason: str, pnl_points: float, close_time) -> None:
-        year = close_time.year
-        month = close_time.month
-        folder = f"reports/{year}"
-        filename = f"{folder}/trades_{year}_{month:02d}.csv"
-
         duration_minutes = (close_time - pos.opened_at).total_seconds() / 60.0
         row = {
             "timestamp_open": pos.opened_at.isoformat(),
@@ -255,20 +292,12 @@ class TradingEngine:
             "slope_rel": pos.slope_rel,
             "rr_ratio": pos.rr_ratio,
             "duration_minutes": round(duration_minutes, 2),
+            "mfe_points": pos.mfe_points,
+            "mae_points": pos.mae_points,
         }
-
-        try:
-            os.makedirs(folder, exist_ok=True)
-            df = pd.DataFrame([row])
-            df.to_csv(
-                filename,
-                mode="a",
-                header=not os.path.exists(filename),
-                index=False,
-            )
-            self.logger.info("[REPORT] Trade salvo em %s", filename)
-        except Exception as exc:
-            self.logger.exception("[REPORT] Erro ao salvar trade em CSV mensal: %s", exc)
+        # gravação fora da thread do engine (WAL + CSV mensal no ``TradeJournal``)
+        path = self.journal.submit(row, close_time)
+        self.logger.info("[REPORT] Trade enfileirado para %s (fila=%d)", path, self.journal.queue_depth)
 
     def _close_position(self, reason: str, exit_price: float) -> None:
         if not self.active_position:
@@ -278,11 +307,11 @@ class TradingEngine:
             result_points = exit_price - pos.entry_price
         else:
             result_points = pos.entry_price - exit_price
-        close_time = now_b3()
+        close_time = self.clock.now()
         self.risk.register_trade_result(result_points)
         self._trade_count += 1
         total_reais = points_to_reais(self.risk.result_points)
-        self.equity.add(total_reais, self._trade_count, total_reais)
+        self.equity.add(total_reais, self._trade_count, total_reais, timestamp=close_time)
         self._persist_closed_trade(pos, exit_price=exit_price, reason=reason, pnl_points=result_points, close_time=close_time)
         self._signal(f"FECHAMENTO {reason} | Resultado={result_points:.2f} pts | Acumulado={self.risk.result_points:.2f} pts")
         self.active_position = None
@@ -293,6 +322,9 @@ class TradingEngine:
 
         pos = self.active_position
         price = snapshot["close_5m"]
+        pos.observe(price)
+        breakeven = self.exit_params.trailing != "none"
+        trail_ema = self.exit_params.trailing == "ema20"
 
         if pos.side == "BUY":
             if price <= pos.stop_price:
@@ -302,11 +334,12 @@ class TradingEngine:
             if price >= pos.take_price:
                 self._close_position("TP", exit_price=price)
                 return
-            if not pos.breakeven_armed and price - pos.entry_price >= pos.stop_points:
+            if breakeven and not pos.breakeven_armed and price - pos.entry_price >= pos.stop_points:
                 pos.stop_price = pos.entry_price
                 pos.breakeven_armed = True
             if pos.breakeven_armed:
-                pos.stop_price = max(pos.stop_price, snapshot["ema20_5"])
+                if trail_ema:
+                    pos.stop_price = max(pos.stop_price, snapshot["ema20_5"])
                 pos.stop_price = min(pos.stop_price, pos.take_price - 1.0)
         else:
             if price >= pos.stop_price:
@@ -316,13 +349,44 @@ class TradingEngine:
             if price <= pos.take_price:
                 self._close_position("TP", exit_price=price)
                 return
-            if not pos.breakeven_armed and pos.entry_price - price >= pos.stop_points:
+            if breakeven and not pos.breakeven_armed and pos.entry_price - price >= pos.stop_points:
                 pos.stop_price = pos.entry_price
                 pos.breakeven_armed = True
             if pos.breakeven_armed:
-                pos.stop_price = min(pos.stop_price, snapshot["ema20_5"])
+                if trail_ema:
+                    pos.stop_price = min(pos.stop_price, snapshot["ema20_5"])
                 pos.stop_price = max(pos.stop_price, pos.take_price + 1.0)
 
+    def _manage_intrabar(self, previous_5m, current_5m) -> None:
+        """Confere pela máxima/mínima os candles M5 fechados desde o último evento (``intrabar``)."""
+        pos = self.active_position
+        if pos is None or previous_5m is None:
+            return
+        timeframe = mt5.TIMEFRAME_M5  # mesmas constantes do conector (MetaTrader5 ou replay)
+        period = timeframe_seconds(timeframe)
+        lo = max(int(previous_5m.timestamp()), pos.entry_bar_time)
+        bars = self.intrabar.bars(self.symbol, timeframe, lo, int(current_5m.timestamp()) - 1)
+        for bar in bars:
+            touch = self.intrabar.touch(
+                self.symbol, int(bar["time"]), period, float(bar["open"]), float(bar["high"]), float(bar["low"]),
+                pos.side == "BUY", pos.stop_price, pos.take_price,
+            )
+            if touch is None:
+                pos.observe(float(bar["high"]))
+                pos.observe(float(bar["low"]))
+                continue
+            level, price = touch
+            pos.observe(price)  # o resto do candle acontece depois da saída
+            reason = "TP" if level == "take" else ("TRAILING" if pos.breakeven_armed else "SL")
+            self._close_position(reason, exit_price=price)
+            return
+
+    def _record_mark(self, snapshot: dict) -> None:
+        """Marca a mercado do evento: realizado acumulado e não realizado da posição em ``close_5m``."""
+        pos = self.active_position
+        unrealized = points_to_reais(pos.move(snapshot["close_5m"])) if pos else 0.0
+        self.marks.record(int(snapshot["last_candle_time_5m"].timestamp()), points_to_reais(self.risk.result_points), unrealized)
+
     def _maybe_open_position(self, max_contracts_allowed: int) -> None:
         if self.active_position is not None or not self._latest_snapshot or not self._latest_signal:
             return
@@ -333,7 +397,7 @@ class TradingEngine:
         if not qualified:
             return
 
-        stop_points = 1.2 * self._latest_snapshot["atr15"]
+        stop_points = self.exit_params.stop_atr * self._latest_snapshot["atr15"]
         size = self.risk.calculate_position_size(self.risk.capital, 0.0075, stop_points)
         contracts = min(size.contracts, max_contracts_allowed)
         if contracts <= 0:
@@ -358,10 +422,32 @@ class TradingEngine:
         snapshot = self.connector.build_market_snapshot(self.symbol)
         if not snapshot:
             return
+        previous_5m = self._last_5m_time
         self._latest_snapshot = snapshot
         self._last_5m_time = snapshot["last_candle_time_5m"]
+        if self.intrabar is not None:
+            self._manage_intrabar(previous_5m, self._last_5m_time)
         self._manage_open_position(snapshot)
         self._maybe_open_position(contracts)
+        if self.marks is not None:
+            self._record_mark(snapshot)
+        if self.checkpoint_state:
+            self.connector.checkpoint()
+
+    def process_new_bars(
+        self, contracts: int, status_callback: Callable[[str], None], regime_callback: Callable[[str], None] | None = None
+    ) -> None:
+        """Processa os eventos de 15m/5m cujo candle mudou desde a última chamada."""
+        last_15m = self.connector.get_last_candle_time_15m(self.symbol)
+        if last_15m is not None and last_15m != self._last_15m_time:
+            self._process_15m_event(contracts, tag="CANDLE15")
+            status_callback(f"Regime: {self.state.current_regime}")
+            if regime_callback:
+                regime_callback(self.state.current_regime)
+
+        last_5m = self.connector.get_last_candle_time_5m(self.symbol)
+        if last_5m is not None and last_5m != self._last_5m_time:
+            self._process_5m_event(contracts)
 
     def run_loop(self, contracts: int, status_callback: Callable[[str], None], regime_callback: Callable[[str], None] | None = None) -> None:
         self.state.running = True
@@ -372,32 +458,34 @@ class TradingEngine:
         if regime_callback:
             regime_callback(self.state.current_regime)
 
+        self.scheduler.calibrate(self.connector.server_time(self.symbol))
         while not self._stop_event.is_set():
             try:
                 if not self.connector.ensure_connection():
                     status_callback("DESCONECTADO")
-                    time.sleep(1)
+                    self.clock.sleep(1)
                     continue
 
                 if not self._can_trade_now() and self.state.blocked_reason.startswith("Fora do horário"):
                     status_callback("AGUARDANDO HORÁRIO")
 
-                last_15m = self.connector.get_last_candle_time_15m(self.symbol)
-                if last_15m is not None and last_15m != self._last_15m_time:
-                    self._process_15m_event(contracts, tag="CANDLE15")
-                    status_callback(f"Regime: {self.state.current_regime}")
-                    if regime_callback:
-                        regime_callback(self.state.current_regime)
-
-                last_5m = self.connector.get_last_candle_time_5m(self.symbol)
-                if last_5m is not None and last_5m != self._last_5m_time:
-                    self._process_5m_event(contracts)
+                boundary = self.scheduler.next_boundary()
+                bar_time = self.scheduler.wait_for_bar(boundary, lambda: self.connector.get_last_candle_epoch_5m(self.symbol), self._stop_event)
+                if self._stop_event.is_set():
+                    break
+                if bar_time is None:
+                    self.logger.warning(
+                        "[SCHED] Candle M5 de %s não surgiu em %.0fs; aguardando o próximo limite",
+                        datetime.fromtimestamp(boundary, tz=timezone.utc).strftime("%H:%M"),
+                        self.scheduler.poll_timeout,
+                    )
+                    continue
 
-                time.sleep(1)
+                self.process_new_bars(contracts, status_callback, regime_callback)
             except Exception as exc:
                 self.logger.exception("Erro no loop principal: %s", exc)
                 status_callback("ERRO NO LOOP")
-                time.sleep(1)
+                self.clock.sleep(1)
 
         self.state.running = False
         status_callback("ENGINE PARADA")
@@ -405,6 +493,8 @@ class TradingEngine:
     def start(self, contracts: int, status_callback: Callable[[str], None], regime_callback: Callable[[str], None] | None = None) -> None:
         if self.state.running:
             return
+        self._attach_debug()
+        self.journal.start()
         self._thread = threading.Thread(target=self.run_loop, args=(contracts, status_callback, regime_callback), daemon=True, name="win-engine-loop")
         self._thread.start()
         self._log_startup(contracts)
@@ -414,3 +504,13 @@ class TradingEngine:
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=3)
         self.state.running = False
+        self._detach_debug()
+        if self.marks is not None:
+            self.marks.close()
+        if not self.journal.close():
+            self.logger.warning("[JOURNAL] %d trade(s) ainda na fila ao parar; ficam no WAL", self.journal.queue_depth)
+        stats = self.journal.stats()
+        self.logger.info(
+            "[JOURNAL] gravados=%d lotes=%d overflow=%d spill=%d descartados=%d latência média=%.1fms máx=%.1fms",
+            stats.written, stats.batches, stats.overflowed, stats.spilled, stats.dropped, stats.mean_latency * 1e3, stats.max_latency * 1e3,
+        )
@@ -1,11 +1,25 @@
-"""Persistência de curva de equity e métricas acumuladas."""
+"""Persistência de curva de equity e métricas acumuladas.
+
+Tudo é atualizado a cada trade em O(1): saldo, pico, drawdown (valor e duração), acerto,
+profit factor e média/desvio do resultado por trade (Welford) para Sharpe/Sortino, além do
+acumulado do mês corrente. ``stats()`` só copia esses contadores, sem varrer o histórico.
+A curva fica num ring buffer NumPy de ``capacity`` trades e o resumo mensal guarda no máximo
+``max_months`` meses, então a memória não cresce com o tempo ligado.
+"""
 from __future__ import annotations
 
 import csv
-from collections import defaultdict
-from dataclasses import dataclass
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from utils import B3_TZ
 
 
 @dataclass
@@ -15,15 +29,176 @@ class EquityPoint:
     expectancy_reais: float
 
 
+@dataclass
+class EquityStats:
+    trades: int
+    equity: float  # resultado acumulado (R$)
+    peak: float
+    drawdown: float  # abaixo do pico agora
+    max_drawdown: float
+    drawdown_trades: int  # trades desde o último pico
+    max_drawdown_trades: int
+    drawdown_since: Optional[datetime]  # momento do último pico, se abaixo dele
+    win_rate: float
+    profit_factor: float
+    expectancy: float  # média por trade
+    stdev: float  # desvio-padrão amostral por trade
+    sharpe: float  # por trade (média / desvio), sem anualizar
+    sortino: float  # por trade (média / desvio das perdas)
+    updated_at: Optional[datetime]
+
+
+@dataclass
+class MonthStats:
+    month: str
+    equity_start: float  # saldo antes do primeiro trade do mês
+    equity_end: float
+    trades: int = 0
+    wins: int = 0
+    gross_profit: float = 0.0
+    gross_loss: float = 0.0
+    peak: float = field(default=0.0, repr=False)
+    max_drawdown: float = 0.0
+
+    @property
+    def change(self) -> float:
+        return self.equity_end - self.equity_start
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.trades if self.trades else 0.0
+
+    @property
+    def profit_factor(self) -> float:
+        return _profit_factor(self.gross_profit, self.gross_loss)
+
+
+def _profit_factor(gross_profit: float, gross_loss: float) -> float:
+    if gross_loss > 0:
+        return gross_profit / gross_loss
+    return math.inf if gross_profit > 0 else 0.0
+
+
 class EquityTracker:
     """Controla curva de equity e estatísticas mensais."""
 
-    def __init__(self) -> None:
-        self.history: list[EquityPoint] = []
+    def __init__(self, capacity: int = 10_000, max_months: int = 120) -> None:
+        self.capacity = capacity
+        self.max_months = max_months
+        self._times = np.zeros(capacity, dtype="float64")  # epoch
+        self._equity = np.zeros(capacity, dtype="float64")
+        self._expectancy = np.zeros(capacity, dtype="float64")
+        self._count = 0  # pontos já gravados (o ring guarda os últimos ``capacity``)
+        self.months: OrderedDict[str, MonthStats] = OrderedDict()
+
+        self._equity_now = 0.0
+        self._peak = 0.0
+        self._peak_at: Optional[datetime] = None
+        self._max_drawdown = 0.0
+        self._drawdown_trades = 0
+        self._max_drawdown_trades = 0
+        self._trades = 0
+        self._wins = 0
+        self._gross_profit = 0.0
+        self._gross_loss = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._downside_sq = 0.0
+        self._updated_at: Optional[datetime] = None
+        self._lock = threading.Lock()  # ``add`` na thread do engine, ``stats`` na da GUI
+
+    @property
+    def history(self) -> list[EquityPoint]:
+        """Pontos ainda no ring buffer, do mais antigo ao mais novo."""
+        start = max(0, self._count - self.capacity)
+        points = []
+        for i in range(start, self._count):
+            slot = i % self.capacity
+            when = datetime.fromtimestamp(self._times[slot], tz=B3_TZ)
+            points.append(EquityPoint(when, float(self._equity[slot]), float(self._expectancy[slot])))
+        return points
 
-    def add(self, equity_reais: float, total_trades: int, total_profit: float) -> None:
+    def add(self, equity_reais: float, total_trades: int, total_profit: float, timestamp: Optional[datetime] = None) -> None:
+        """Registra o saldo após um trade; o resultado do trade é a variação do saldo."""
+        when = timestamp or datetime.now(B3_TZ)
         expectancy = (total_profit / total_trades) if total_trades > 0 else 0.0
-        self.history.append(EquityPoint(datetime.now(), equity_reais, expectancy))
+        with self._lock:
+            self._add(when, equity_reais, expectancy)
+
+    def _add(self, when: datetime, equity_reais: float, expectancy: float) -> None:
+        pnl = equity_reais - self._equity_now
+
+        slot = self._count % self.capacity
+        self._times[slot] = when.timestamp()
+        self._equity[slot] = equity_reais
+        self._expectancy[slot] = expectancy
+        self._count += 1
+
+        self._trades += 1
+        delta = pnl - self._mean
+        self._mean += delta / self._trades
+        self._m2 += delta * (pnl - self._mean)
+        self._downside_sq += min(pnl, 0.0) ** 2
+        if pnl > 0:
+            self._wins += 1
+            self._gross_profit += pnl
+        elif pnl < 0:
+            self._gross_loss -= pnl
+
+        previous = self._equity_now
+        self._equity_now = equity_reais
+        if equity_reais >= self._peak:
+            self._peak = equity_reais
+            self._peak_at = when
+            self._drawdown_trades = 0
+        else:
+            self._drawdown_trades += 1
+            self._max_drawdown_trades = max(self._max_drawdown_trades, self._drawdown_trades)
+            self._max_drawdown = max(self._max_drawdown, self._peak - equity_reais)
+        self._updated_at = when
+        self._add_to_month(when.strftime("%Y-%m"), previous, equity_reais, pnl)
+
+    def _add_to_month(self, key: str, previous: float, equity_reais: float, pnl: float) -> None:
+        month = self.months.get(key)
+        if month is None:
+            month = self.months[key] = MonthStats(key, equity_start=previous, equity_end=previous, peak=previous)
+            while len(self.months) > self.max_months:
+                self.months.popitem(last=False)
+        month.equity_end = equity_reais
+        month.trades += 1
+        if pnl > 0:
+            month.wins += 1
+            month.gross_profit += pnl
+        elif pnl < 0:
+            month.gross_loss -= pnl
+        month.peak = max(month.peak, equity_reais)
+        month.max_drawdown = max(month.max_drawdown, month.peak - equity_reais)
+
+    def stats(self) -> EquityStats:
+        """Retrato das métricas correntes (O(1), seguro para a GUI chamar a todo instante)."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> EquityStats:
+        stdev = math.sqrt(self._m2 / (self._trades - 1)) if self._trades > 1 else 0.0
+        downside = math.sqrt(self._downside_sq / self._trades) if self._trades else 0.0
+        return EquityStats(
+            trades=self._trades,
+            equity=self._equity_now,
+            peak=self._peak,
+            drawdown=self._peak - self._equity_now,
+            max_drawdown=self._max_drawdown,
+            drawdown_trades=self._drawdown_trades,
+            max_drawdown_trades=self._max_drawdown_trades,
+            drawdown_since=self._peak_at if self._drawdown_trades else None,
+            win_rate=self._wins / self._trades if self._trades else 0.0,
+            profit_factor=_profit_factor(self._gross_profit, self._gross_loss),
+            expectancy=self._mean,
+            stdev=stdev,
+            sharpe=self._mean / stdev if stdev > 0 else 0.0,
+            sortino=self._mean / downside if downside > 0 else 0.0,
+            updated_at=self._updated_at,
+        )
 
     def export_csv(self, path: Path) -> None:
         path.parent.mkdir(parents=True, exist_ok=True)
@@ -33,17 +208,14 @@ class EquityTracker:
             for p in self.history:
                 writer.writerow([p.timestamp.isoformat(), f"{p.equity_reais:.2f}", f"{p.expectancy_reais:.2f}"])
 
-
     def export_monthly_stats(self, path: Path) -> None:
-        """Gera estatísticas mensais automáticas de performance."""
-        buckets = defaultdict(list)
-        for point in self.history:
-            key = point.timestamp.strftime("%Y-%m")
-            buckets[key].append(point.equity_reais)
-
+        """Gera estatísticas mensais automáticas de performance (do acumulado, sem varrer a curva)."""
         path.parent.mkdir(parents=True, exist_ok=True)
         with path.open("w", newline="", encoding="utf-8") as fp:
             writer = csv.writer(fp)
-            writer.writerow(["mes", "equity_inicio", "equity_fim", "variacao"])
-            for month, values in sorted(buckets.items()):
-                writer.writerow([month, f"{values[0]:.2f}", f"{values[-1]:.2f}", f"{(values[-1]-values[0]):.2f}"])
+            writer.writerow(["mes", "equity_inicio", "equity_fim", "variacao", "trades", "acerto", "profit_factor", "drawdown_max"])
+            for _, month in sorted(self.months.items()):
+                writer.writerow([
+                    month.month, f"{month.equity_start:.2f}", f"{month.equity_end:.2f}", f"{month.change:.2f}",
+                    month.trades, f"{month.win_rate:.4f}", f"{month.profit_factor:.4f}", f"{month.max_drawdown:.2f}",
+                ])
@@ -4,7 +4,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime
 
-import MetaTrader5 as mt5
+import MetaTrader5 as mt5  # offline (backtest/testes): ``mt5_replay.install()`` antes desta importação
 
 
 @dataclass
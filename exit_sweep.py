@@ -0,0 +1,292 @@
+"""Sensibilidade dos parâmetros de saída (stop/take/trailing) sobre um conjunto fixo de entradas.
+
+Features, regime e máscara de entradas (``entry_signals``, sem simular trades) são calculados
+uma única vez; para cada candidata guarda-se o caminho de preços/EMA20 do 5m dos ``horizon``
+eventos seguintes. Cada combinação de ``ExitParams`` resolve as saídas de todas as candidatas
+de uma vez sobre essas matrizes (posições que passam do horizonte caem no ``_exit_scan``
+escalar) e encadeia os trades como o engine. A saída é uma tabela longa, pronta para ``heatmap``.
+
+Uso: ``python exit_sweep.py replay/win_2024.npz --grid stop_atr=1.0,1.2,1.5 --heatmap stop_atr,take_r``
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import time
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from mt5_replay import Recording, server_epoch
+from regime_detector import RegimeDetector
+from regime_sweep import rank, trade_stats
+from risk_manager import TRAILING_RULES, ExitParams, RiskManager
+from vector_backtest import (
+    _exit_scan,
+    entry_levels,
+    entry_signals,
+    load_rates,
+    snapshot_columns,
+    tradable_mask,
+    trailing_inputs,
+)
+
+DEFAULT_GRID: dict[str, list] = {
+    "stop_atr": [0.8, 1.0, 1.2, 1.5],
+    "take_r": [1.5, 2.0, 2.5, 3.0],
+    "extended_distance": [1.0, 1.5, 2.0],
+    "trailing": list(TRAILING_RULES),
+}
+EXIT_REASONS = ("", "SL", "TP", "TRAILING")
+_LEVEL_KEYS = ("close_5m", "atr15", "ema_distance_atr", "low_15m", "high_15m", "ema20_15", "ema20_15_prev3")
+
+
+@dataclass
+class EntrySet:
+    """Candidatas a entrada (índices M5) com níveis de entrada e caminhos seguintes."""
+
+    candidates: np.ndarray
+    buy: np.ndarray
+    levels: dict[str, np.ndarray]  # colunas de ``entry_levels`` restritas às candidatas
+    price: np.ndarray  # close_5m (abertura M5) da série toda
+    ema: np.ndarray  # EMA20 do 5m da série toda
+    price_path: np.ndarray  # (candidatas, horizon), NaN após o fim da série
+    ema_path: np.ndarray
+
+    @property
+    def horizon(self) -> int:
+        return self.price_path.shape[1]
+
+
+def parameter_grid(grid: dict[str, Iterable], base: Optional[ExitParams] = None) -> list[ExitParams]:
+    """Produto cartesiano dos valores de ``grid`` aplicado sobre ``base``."""
+    base = base or ExitParams()
+    names = list(grid)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def build_entry_set(columns: dict[str, np.ndarray], entries: np.ndarray, buy: np.ndarray, horizon: int = 256) -> EntrySet:
+    """Recorta as candidatas e monta as matrizes de caminho (evento ``k + 1`` em diante)."""
+    candidates = np.flatnonzero(entries)
+    price = np.asarray(columns["close_5m"], dtype="float64")
+    ema = np.asarray(columns["ema20_5"], dtype="float64")
+    steps = candidates[:, None] + 1 + np.arange(horizon)
+    inside = steps < len(price)
+    steps = np.minimum(steps, len(price) - 1)
+    return EntrySet(
+        candidates=candidates,
+        buy=np.asarray(buy)[candidates],
+        levels={key: np.asarray(columns[key])[candidates] for key in _LEVEL_KEYS},
+        price=price,
+        ema=ema,
+        price_path=np.where(inside, price[steps], np.nan),
+        ema_path=np.where(inside, ema[steps], np.nan),
+    )
+
+
+def resolve_exits(entry_set: EntrySet, params: ExitParams) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Evento de saída (-1 = aberta no fim), código em ``EXIT_REASONS`` e stop vigente por candidata.
+
+    Mesmas fases de ``_exit_scan``, com as vendas negadas: antes do gatilho stop/take são
+    fixos; depois do gatilho o stop é ``min(max(s0, EMA20_5 acumulada), take - 1)``.
+    """
+    es = entry_set
+    count, horizon = es.price_path.shape
+    rows = np.arange(count)
+    sign = np.where(es.buy, 1.0, -1.0)
+    lv = entry_levels(es.levels, es.buy, params)
+    ema_path, trigger = trailing_inputs(es.ema_path, lv["stop_points"], params)
+    entry = es.levels["close_5m"] * sign
+    stop = lv["stop_price"] * sign
+    take = lv["take_price"] * sign
+    path = es.price_path * sign[:, None]
+    ema_path = ema_path * sign[:, None]
+
+    with np.errstate(invalid="ignore"):
+        hit = (path <= stop[:, None]) | (path >= take[:, None]) | (path - entry[:, None] >= trigger[:, None])
+    first = hit.argmax(axis=1)
+    found = hit[rows, first]
+    at_first = path[rows, first]
+    stopped = found & (at_first <= stop)
+    taken = found & ~stopped & (at_first >= take)
+    armed = found & ~stopped & ~taken
+
+    step = np.where(stopped | taken, first, -1)
+    reason = np.where(stopped, 1, np.where(taken, 2, 0))
+    final_stop = stop.copy()
+    if armed.any():
+        a = np.flatnonzero(armed)
+        start = first[a]
+        limit = take[a] - 1.0
+        s0 = np.minimum(np.fmax(entry[a], ema_path[a, start]), limit)
+        later = np.arange(horizon)[None, :] > start[:, None]
+        trail = np.minimum(np.fmax(s0[:, None], np.fmax.accumulate(np.where(later, ema_path[a], np.nan), axis=1)), limit[:, None])
+        before = np.empty_like(trail)
+        before[:, 0] = s0
+        before[:, 1:] = trail[:, :-1]
+        p = path[a]
+        with np.errstate(invalid="ignore"):
+            hit = later & ((p <= before) | (p >= take[a][:, None]))
+        j = hit.argmax(axis=1)
+        closed = hit[np.arange(len(a)), j]
+        at_exit = p[np.arange(len(a)), j]
+        stop_at_exit = before[np.arange(len(a)), j]
+        step[a] = np.where(closed, j, -1)
+        reason[a] = np.where(closed, np.where(at_exit <= stop_at_exit, 3, 2), 0)
+        final_stop[a] = np.where(closed, stop_at_exit, final_stop[a])
+
+    exit_index = np.where(step >= 0, es.candidates + 1 + step, -1)
+    n = len(es.price)
+    for i in np.flatnonzero((step < 0) & (es.candidates + 1 + horizon < n)):
+        # passou do horizonte sem sair: resolve no caminho escalar a partir da entrada
+        k = int(es.candidates[i])
+        ema = trailing_inputs(es.ema, 0.0, params)[0] * sign[i]
+        j, label, s, _ = _exit_scan(es.price * sign[i], ema, k + 1, entry[i], stop[i], take[i], float(trigger[i]))
+        exit_index[i], reason[i], final_stop[i] = j, EXIT_REASONS.index(label), s
+    return exit_index, reason, final_stop * sign
+
+
+def eligible_entries(entry_set: EntrySet, stop_atr: float, capital: float, contracts: int) -> np.ndarray:
+    """Candidatas com pelo menos um contrato no dimensionamento de ``_maybe_open_position``."""
+    return np.array(
+        [min(RiskManager.calculate_position_size(capital, 0.0075, stop_atr * atr).contracts, contracts) > 0
+         for atr in entry_set.levels["atr15"].tolist()],
+        dtype=bool,
+    )
+
+
+def chain_trades(candidates: np.ndarray, exit_index: np.ndarray, eligible: np.ndarray) -> np.ndarray:
+    """Posições (em ``candidates``) dos trades abertos: uma posição por vez, reabrindo no evento da saída."""
+    count = len(candidates)
+    positions = np.where(eligible, np.arange(count), count)
+    following = np.append(np.minimum.accumulate(positions[::-1])[::-1], count)
+    taken = []
+    i = int(following[0])
+    while i < count:
+        j = int(exit_index[i])
+        if j < 0:
+            break  # posição ainda aberta no fim da série
+        taken.append(i)
+        i = int(following[np.searchsorted(candidates, j)])
+    return np.array(taken, dtype="int64")
+
+
+def evaluate(entry_set: EntrySet, params: ExitParams, capital: float, contracts: int, eligible: Optional[np.ndarray] = None) -> dict:
+    """Estatísticas dos trades de uma combinação de ``ExitParams``."""
+    if eligible is None:
+        eligible = eligible_entries(entry_set, params.stop_atr, capital, contracts)
+    exit_index, reason, _ = resolve_exits(entry_set, params)
+    taken = chain_trades(entry_set.candidates, exit_index, eligible)
+    sign = np.where(entry_set.buy[taken], 1.0, -1.0)
+    pnl = (entry_set.price[exit_index[taken]] - entry_set.levels["close_5m"][taken]) * sign
+    counts = np.bincount(reason[taken], minlength=len(EXIT_REASONS))
+    return {
+        **asdict(params),
+        **trade_stats(pnl),
+        "sl": int(counts[1]),
+        "tp": int(counts[2]),
+        "trailing_exits": int(counts[3]),
+    }
+
+
+def run_exit_sweep(
+    source: Recording | Path | str,
+    grid: Optional[dict[str, Iterable]] = None,
+    start=None,
+    end=None,
+    symbol: str = "WIN$",
+    capital: float = 10000.0,
+    contracts: int = 5,
+    detector: Optional[RegimeDetector] = None,
+    horizon: int = 256,
+    sort_by: str = "expectancy",
+    min_trades: int = 1,
+) -> pd.DataFrame:
+    """Avalia todas as combinações de ``grid`` sobre as mesmas entradas; tabela ordenada por ``sort_by``.
+
+    Combinações com menos de ``min_trades`` trades vão para o fim da tabela.
+    """
+    r5, r15, r60 = load_rates(source, symbol)
+    times = r5["time"].astype("int64")
+    lo = server_epoch(start) if start is not None else int(times[0])
+    hi = server_epoch(end) if end is not None else int(times[-1])
+    in_range = (times >= lo) & (times <= hi)
+    if not in_range.any():
+        raise ValueError("Nenhum candle M5 no intervalo do backtest")
+    detector = detector or RegimeDetector()
+
+    columns = snapshot_columns(r5, r15, r60, detector.params.context15_lookback, detector.params.macro_lookback)
+    batch, _, signal_index, conditions = entry_signals(columns, in_range, detector)
+    buy = batch.direction[np.maximum(signal_index, 0)] == "COMPRA"
+    entry_set = build_entry_set(columns, conditions & tradable_mask(columns["time"]), buy, horizon)
+
+    sizing: dict[float, np.ndarray] = {}
+    rows = []
+    for params in parameter_grid(grid or DEFAULT_GRID):
+        if params.stop_atr not in sizing:
+            sizing[params.stop_atr] = eligible_entries(entry_set, params.stop_atr, capital, contracts)
+        rows.append(evaluate(entry_set, params, capital, contracts, sizing[params.stop_atr]))
+    return rank(pd.DataFrame(rows), sort_by, min_trades)
+
+
+def heatmap(table: pd.DataFrame, index: str, columns: str, value: str = "expectancy", aggfunc: str = "max") -> pd.DataFrame:
+    """Pivota a tabela longa em ``index`` x ``columns``; as demais dimensões são reduzidas por ``aggfunc``."""
+    return table.pivot_table(index=index, columns=columns, values=value, aggfunc=aggfunc)
+
+
+def _parse_grid(items: list[str]) -> dict[str, list]:
+    types = {f.name: type(f.default) for f in fields(ExitParams)}
+    grid: dict[str, list] = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        if name not in types:
+            raise SystemExit(f"Parâmetro desconhecido: {name} (opções: {', '.join(types)})")
+        grid[name] = [types[name](v) for v in values.split(",") if v]
+    return grid
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="arquivo .npz do mt5_replay")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--symbol", default="WIN$")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--contracts", type=int, default=5)
+    parser.add_argument("--grid", action="append", default=[], metavar="NOME=v1,v2", help="valores de um campo de ExitParams")
+    parser.add_argument("--horizon", type=int, default=256, help="eventos M5 resolvidos em lote por entrada")
+    parser.add_argument("--sort", default="expectancy")
+    parser.add_argument("--min-trades", type=int, default=1)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--heatmap", metavar="LINHA,COLUNA", help="imprime o pivot de --value por dois campos")
+    parser.add_argument("--value", default="expectancy")
+    parser.add_argument("--out", help="grava a tabela completa em CSV")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = run_exit_sweep(
+        args.recording,
+        _parse_grid(args.grid) or None,
+        args.start,
+        args.end,
+        symbol=args.symbol,
+        capital=args.capital,
+        contracts=args.contracts,
+        horizon=args.horizon,
+        sort_by=args.sort,
+        min_trades=args.min_trades,
+    )
+    if args.out:
+        table.to_csv(args.out, index=False)
+    print(table.head(args.top).to_string())
+    if args.heatmap:
+        index, _, column = args.heatmap.partition(",")
+        print(heatmap(table, index, column, args.value).to_string())
+    print(f"combinações={len(table)} tempo={time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
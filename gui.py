@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import tkinter as tk
+from pathlib import Path
 from tkinter import messagebox, ttk
 
 from engine import TradingEngine
@@ -17,7 +18,8 @@ class TradingBotGUI:
         self.root.title("WIN Trader Bot Pro - Sniper Adaptativo")
         self.root.geometry("980x680")
 
-        self.connector = MT5Connector(logger)
+        self.reports_dir = Path("reports")
+        self.connector = MT5Connector(logger, state_path=self.reports_dir / "state" / "connector_state.npz")
         self.engine: TradingEngine | None = None
         self.window = TradingWindow()
 
@@ -30,6 +32,8 @@ class TradingBotGUI:
         self.max_contracts_var = tk.StringVar(value="Máx contratos permitidos: 5")
         self.debug_var = tk.BooleanVar(value=DEBUG_MODE)
         self.regime_var = tk.StringVar(value="NEUTRO")
+        self.stats_var = tk.StringVar(value="")
+        self._stats_job: str | None = None
 
         self._build_layout()
         self.capital_var.trace_add("write", lambda *_: self._refresh_contract_limit())
@@ -69,6 +73,7 @@ class TradingBotGUI:
         ttk.Button(controls, text="Stop", command=self.stop_bot).pack(side="left", padx=4)
         ttk.Label(controls, text="Regime atual:").pack(side="left", padx=(30, 4))
         ttk.Label(controls, textvariable=self.regime_var).pack(side="left")
+        ttk.Label(controls, textvariable=self.stats_var).pack(side="left", padx=(30, 0))
 
         logs_frame = ttk.LabelFrame(frame, text="Logs em tempo real")
         logs_frame.pack(fill="both", expand=True)
@@ -89,6 +94,17 @@ class TradingBotGUI:
     def _update_regime(self, regime: str) -> None:
         self.root.after(0, lambda: self.regime_var.set(regime))
 
+    def _refresh_stats(self) -> None:
+        if self.engine is None:
+            return
+        stats = self.engine.equity.stats()
+        if stats.trades:
+            self.stats_var.set(
+                f"Trades: {stats.trades} | Resultado: R$ {stats.equity:.2f} | DD: R$ {stats.drawdown:.2f} "
+                f"(máx {stats.max_drawdown:.2f}) | Acerto: {stats.win_rate:.0%} | PF: {stats.profit_factor:.2f}"
+            )
+        self._stats_job = self.root.after(2000, self._refresh_stats)
+
     def _debug(self, message: str) -> None:
         if self.debug_var.get():
             self._log(f"[DEBUG] {message}")
@@ -154,6 +170,7 @@ class TradingBotGUI:
             capital,
             debug_mode=self.debug_var.get(),
             debug_callback=self._log if self.debug_var.get() else None,
+            reports_dir=str(self.reports_dir),
         )
 
         self.engine.start(
@@ -162,6 +179,9 @@ class TradingBotGUI:
             regime_callback=self._update_regime,
         )
         self._log("Robô iniciado no modo Sniper Adaptativo.")
+        if self._stats_job is not None:
+            self.root.after_cancel(self._stats_job)
+        self._refresh_stats()
 
     def stop_bot(self) -> None:
         self._debug("stop_bot() acionado")
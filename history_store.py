@@ -0,0 +1,210 @@
+"""Histórico local de candles por símbolo/timeframe, particionado por dia (arquivos ``.npy``).
+
+Cada dia é um array estruturado no formato de ``copy_rates_*`` do MT5, lido por memmap,
+então ler anos de candles custa só a concatenação das fatias. ``sync`` consulta o
+terminal apenas pelos intervalos ainda não cobertos::
+
+    store = HistoryStore("history")
+    store.sync("WIN$", mt5.TIMEFRAME_M5, "2023-01-02", "2024-06-28", mt5.copy_rates_range)
+    rates = store.read_range("WIN$", mt5.TIMEFRAME_M5, "2024-01-02", "2024-06-28")
+
+Os horários seguem a convenção do MT5 (horário do servidor codificado como epoch UTC), e
+o dia da partição é o dia do servidor.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from bar_cache import valid_rates
+from utils import RATES_DTYPE, to_epoch
+
+RangeFetcher = Callable[[str, int, datetime, datetime], Optional[np.ndarray]]
+
+_DAY = 86400
+
+
+def _as_datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _merge_intervals(intervals: list[list[int]]) -> list[list[int]]:
+    merged: list[list[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+@dataclass
+class SyncStats:
+    requests: int = 0
+    bars_received: int = 0
+    days_written: int = 0
+
+
+class HistoryStore:
+    """Candles em ``root/<símbolo>/<timeframe>/<AAAA-MM-DD>.npy`` + ``coverage.json``.
+
+    ``coverage.json`` guarda os intervalos (epoch, inclusivos) já consultados no terminal,
+    inclusive dias sem pregão, para que ``sync`` não os peça de novo. O último candle
+    recebido fica fora da cobertura: ele pode estar em formação e é regravado no próximo
+    ``sync``.
+    """
+
+    def __init__(self, root: str | Path = "history", chunk_days: int = 31) -> None:
+        self.root = Path(root)
+        self.chunk_days = chunk_days
+        self.stats = SyncStats()
+        self._maps: dict[Path, np.ndarray] = {}
+
+    def _dir(self, symbol: str, timeframe: int) -> Path:
+        return self.root / symbol / str(timeframe)
+
+    def _day_path(self, symbol: str, timeframe: int, day: int) -> Path:
+        return self._dir(symbol, timeframe) / f"{date(1970, 1, 1) + timedelta(days=day)}.npy"
+
+    def coverage(self, symbol: str, timeframe: int) -> list[list[int]]:
+        path = self._dir(symbol, timeframe) / "coverage.json"
+        if not path.exists():
+            return []
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _save_coverage(self, symbol: str, timeframe: int, intervals: list[list[int]]) -> None:
+        path = self._dir(symbol, timeframe) / "coverage.json"
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(_merge_intervals(intervals)), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def days(self, symbol: str, timeframe: int) -> list[date]:
+        folder = self._dir(symbol, timeframe)
+        if not folder.exists():
+            return []
+        return sorted(date.fromisoformat(p.stem) for p in folder.glob("*.npy"))
+
+    def _open_day(self, path: Path) -> Optional[np.ndarray]:
+        arr = self._maps.get(path)
+        if arr is None:
+            if not path.exists():
+                return None
+            arr = np.load(path, mmap_mode="r")
+            self._maps[path] = arr
+        return arr
+
+    @staticmethod
+    def _load_day(path: Path) -> Optional[np.ndarray]:
+        """Dia inteiro em memória, sem memmap: não prende o arquivo (no Windows um arquivo
+        mapeado não pode ser substituído por ``os.replace``)."""
+        if not path.exists():
+            return None
+        return np.load(path)
+
+    def _write_day(self, path: Path, rates: np.ndarray) -> None:
+        self._maps.pop(path, None)
+        existing = self._load_day(path)
+        if existing is not None and len(existing):
+            # Candles recebidos agora substituem os gravados com o mesmo horário.
+            keep = existing[~np.isin(existing["time"], rates["time"])]
+            rates = np.concatenate([keep, rates])
+            rates = rates[np.argsort(rates["time"], kind="stable")]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.save(fh, np.ascontiguousarray(rates))
+        os.replace(tmp, path)
+        self.stats.days_written += 1
+
+    def write(self, symbol: str, timeframe: int, rates: np.ndarray) -> None:
+        """Grava candles (de qualquer período) nas partições diárias correspondentes."""
+        rates = valid_rates(np.asarray(rates).astype(RATES_DTYPE, copy=False))
+        if len(rates) == 0:
+            return
+        rates = rates[np.argsort(rates["time"], kind="stable")]
+        day_of = rates["time"] // _DAY
+        starts = np.flatnonzero(np.r_[True, day_of[1:] != day_of[:-1]])
+        for lo, hi in zip(starts, np.r_[starts[1:], len(rates)]):
+            self._write_day(self._day_path(symbol, timeframe, int(day_of[lo])), rates[lo:hi])
+
+    def missing_ranges(self, symbol: str, timeframe: int, date_from, date_to) -> list[tuple[int, int]]:
+        """Intervalos (epoch, inclusivos) de ``[date_from, date_to]`` ainda não sincronizados."""
+        lo, hi = to_epoch(date_from), to_epoch(date_to)
+        gaps = []
+        for start, end in self.coverage(symbol, timeframe):
+            if end < lo:
+                continue
+            if start > hi:
+                break
+            if start > lo:
+                gaps.append((lo, start - 1))
+            lo = max(lo, end + 1)
+        if lo <= hi:
+            gaps.append((lo, hi))
+        return gaps
+
+    def sync(self, symbol: str, timeframe: int, date_from, date_to, fetch: RangeFetcher) -> int:
+        """Busca via ``fetch`` (``mt5.copy_rates_range``) só o que falta; devolve candles recebidos."""
+        covered = self.coverage(symbol, timeframe)
+        received = 0
+        for gap_lo, gap_hi in self.missing_ranges(symbol, timeframe, date_from, date_to):
+            chunk_lo = gap_lo
+            while chunk_lo <= gap_hi:
+                chunk_hi = min(gap_hi, chunk_lo + self.chunk_days * _DAY - 1)
+                rates = fetch(symbol, timeframe, _as_datetime(chunk_lo), _as_datetime(chunk_hi))
+                self.stats.requests += 1
+                if rates is None:
+                    break
+                rates = np.asarray(rates)
+                received += len(rates)
+                self.write(symbol, timeframe, rates)
+                last = self.last_time(symbol, timeframe)
+                if chunk_hi >= gap_hi and (last is None or last <= chunk_hi):
+                    # Fim da série: o último candle pode estar em formação e fica descoberto.
+                    if last is not None and last > chunk_lo:
+                        covered.append([chunk_lo, last - 1])
+                    break
+                covered.append([chunk_lo, chunk_hi])
+                chunk_lo = chunk_hi + 1
+        self.stats.bars_received += received
+        if covered:
+            self._dir(symbol, timeframe).mkdir(parents=True, exist_ok=True)
+            self._save_coverage(symbol, timeframe, covered)
+        return received
+
+    def read_range(self, symbol: str, timeframe: int, date_from, date_to) -> np.ndarray:
+        """Candles com abertura em ``[date_from, date_to]`` (view do memmap se couber num dia)."""
+        lo, hi = to_epoch(date_from), to_epoch(date_to)
+        parts = []
+        for day in range(lo // _DAY, hi // _DAY + 1):
+            arr = self._open_day(self._day_path(symbol, timeframe, day))
+            if arr is None or len(arr) == 0:
+                continue
+            times = arr["time"]
+            a = int(np.searchsorted(times, lo, side="left")) if day == lo // _DAY else 0
+            b = int(np.searchsorted(times, hi, side="right")) if day == hi // _DAY else len(arr)
+            if b > a:
+                parts.append(arr[a:b])
+        if not parts:
+            return np.empty(0, dtype=RATES_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def last_time(self, symbol: str, timeframe: int) -> Optional[int]:
+        days = self.days(symbol, timeframe)
+        for day in reversed(days):
+            path = self._day_path(symbol, timeframe, (day - date(1970, 1, 1)).days)
+            # o último dia é o regravado a cada ``sync``: lido sem memmap para não prendê-lo
+            arr = self._maps.get(path)
+            if arr is None:
+                arr = self._load_day(path)
+            if arr is not None and len(arr):
+                return int(arr["time"][-1])
+        return None
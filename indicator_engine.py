@@ -0,0 +1,244 @@
+"""Motor incremental de indicadores (EMA, ATR e ADX de Wilder) por símbolo/timeframe."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from math import isnan, nan
+from typing import Hashable, Sequence
+
+import numpy as np
+
+from indicators import ewm_alpha
+
+
+def _ewm_advance(value: float, old_wt: float, started: bool, sample: float, alpha: float) -> tuple[float, float]:
+    """Um passo de ``ewm(adjust=False).mean()``, inclusive o tratamento de NaN do pandas."""
+    if not started:
+        return sample, 1.0
+    if value == value:
+        old_wt *= 1.0 - alpha
+        if sample == sample:
+            if value != sample:
+                value = old_wt * value + alpha * sample
+                value /= old_wt + alpha
+            old_wt = 1.0
+    elif sample == sample:
+        value = sample
+    return value, old_wt
+
+
+@dataclass
+class EwmState:
+    """Recorrência EWM com pesos idênticos a ``Series.ewm(adjust=False).mean()``."""
+
+    alpha: float
+    value: float = nan
+    old_wt: float = 1.0
+    started: bool = False
+
+    def step(self, sample: float) -> float:
+        self.value, self.old_wt = _ewm_advance(self.value, self.old_wt, self.started, sample, self.alpha)
+        self.started = True
+        return self.value
+
+    def peek(self, sample: float) -> float:
+        return _ewm_advance(self.value, self.old_wt, self.started, sample, self.alpha)[0]
+
+
+@dataclass
+class IndicatorValues:
+    """Valores do candle mais recente (em formação) de um timeframe."""
+
+    ema20: float
+    ema20_prev3: float
+    ema50: float
+    atr14: float
+    atr14_prev: float
+    atr14_mean30: float
+    adx14: float
+
+
+def _true_range(high: float, low: float, prev_close: float) -> float:
+    if isnan(prev_close):
+        return high - low
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+@dataclass
+class TimeframeIndicators:
+    """Estado EMA20/EMA50/ATR14/ADX14 de um par símbolo/timeframe.
+
+    Candles fechados são incorporados uma única vez (``commit``); o candle em formação
+    é avaliado sem alterar o estado (``peek``), mantendo O(1) por evento.
+    """
+
+    period: int = 14
+    history: int = 30
+    ema20: EwmState = field(init=False)
+    ema50: EwmState = field(init=False)
+    atr: EwmState = field(init=False)
+    plus_dm: EwmState = field(init=False)
+    minus_dm: EwmState = field(init=False)
+    dx: EwmState = field(init=False)
+    last_time: object = None
+    prev_high: float = nan
+    prev_low: float = nan
+    prev_close: float = nan
+    ema20_hist: deque = field(init=False)
+    atr_hist: deque = field(init=False)
+
+    def __post_init__(self) -> None:
+        wilder = ewm_alpha(alpha=1 / self.period)
+        self.ema20 = EwmState(ewm_alpha(span=20))
+        self.ema50 = EwmState(ewm_alpha(span=50))
+        self.atr = EwmState(wilder)
+        self.plus_dm = EwmState(wilder)
+        self.minus_dm = EwmState(wilder)
+        self.dx = EwmState(wilder)
+        self.ema20_hist = deque(maxlen=3)
+        self.atr_hist = deque(maxlen=self.history - 1)
+
+    def _samples(self, high: float, low: float, close: float) -> tuple[float, float, float]:
+        up_move = high - self.prev_high
+        down_move = -(low - self.prev_low)
+        plus_dm = up_move if (up_move > down_move and up_move > 0) else nan
+        minus_dm = down_move if (down_move > up_move and down_move > 0) else nan
+        return _true_range(high, low, self.prev_close), plus_dm, minus_dm
+
+    @staticmethod
+    def _dx(plus_dm_ewm: float, minus_dm_ewm: float, atr_ewm: float) -> float:
+        atr = nan if atr_ewm == 0 else atr_ewm
+        plus_di = 100 * plus_dm_ewm / atr
+        minus_di = 100 * minus_dm_ewm / atr
+        total = plus_di + minus_di
+        return 100 * abs(plus_di - minus_di) / (nan if total == 0 else total)
+
+    @staticmethod
+    def _fill(value: float) -> float:
+        return 0.0 if isnan(value) else value
+
+    def commit(self, time, high: float, low: float, close: float) -> None:
+        tr, plus_dm, minus_dm = self._samples(high, low, close)
+        ema20 = self.ema20.step(close)
+        self.ema50.step(close)
+        atr = self.atr.step(tr)
+        dx = self._dx(self.plus_dm.step(plus_dm), self.minus_dm.step(minus_dm), atr)
+        self.dx.step(dx)
+
+        self.ema20_hist.append(ema20)
+        self.atr_hist.append(self._fill(atr))
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        self.last_time = time
+
+    def _ewm_states(self) -> tuple[EwmState, ...]:
+        return (self.ema20, self.ema50, self.atr, self.plus_dm, self.minus_dm, self.dx)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Estado das recorrências para checkpoint (ver ``from_arrays``)."""
+        scalars = [self.period, self.history, nan if self.last_time is None else float(self.last_time), self.prev_high, self.prev_low, self.prev_close]
+        for ewm in self._ewm_states():
+            scalars.extend((ewm.value, ewm.old_wt, float(ewm.started)))
+        return {
+            "scalars": np.array(scalars, dtype="float64"),
+            "ema20_hist": np.array(self.ema20_hist, dtype="float64"),
+            "atr_hist": np.array(self.atr_hist, dtype="float64"),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "TimeframeIndicators":
+        scalars = arrays["scalars"].tolist()
+        state = cls(int(scalars[0]), int(scalars[1]))
+        state.last_time = None if isnan(scalars[2]) else int(scalars[2])
+        state.prev_high, state.prev_low, state.prev_close = scalars[3:6]
+        for i, ewm in enumerate(state._ewm_states()):
+            ewm.value, ewm.old_wt, started = scalars[6 + 3 * i:9 + 3 * i]
+            ewm.started = bool(started)
+        state.ema20_hist.extend(arrays["ema20_hist"].tolist())
+        state.atr_hist.extend(arrays["atr_hist"].tolist())
+        return state
+
+    def peek(self, high: float, low: float, close: float) -> IndicatorValues:
+        tr, plus_dm, minus_dm = self._samples(high, low, close)
+        atr = self.atr.peek(tr)
+        dx = self._dx(self.plus_dm.peek(plus_dm), self.minus_dm.peek(minus_dm), atr)
+        atr_now = self._fill(atr)
+        atr_window = np.fromiter((*self.atr_hist, atr_now), dtype="float64")
+        return IndicatorValues(
+            ema20=self.ema20.peek(close),
+            ema20_prev3=self.ema20_hist[0] if len(self.ema20_hist) == 3 else nan,
+            ema50=self.ema50.peek(close),
+            atr14=atr_now,
+            atr14_prev=self.atr_hist[-1] if self.atr_hist else nan,
+            atr14_mean30=float(atr_window.sum() / len(atr_window)),
+            adx14=self._fill(self.dx.peek(dx)),
+        )
+
+
+class IndicatorEngine:
+    """Mantém ``TimeframeIndicators`` por (símbolo, timeframe) e incorpora só candles novos.
+
+    Na primeira chamada (ou após lacuna maior que a janela recebida) o estado é semeado
+    com a própria janela, reproduzindo exatamente ``MT5Connector._atr``/``_adx``; depois
+    disso cada evento custa O(novos candles) e os valores são os de ``Series.ewm(adjust=False)``
+    sobre todos os candles incorporados desde a semente (rtol 1e-9 nos testes). A diferença
+    para o recálculo sobre a janela de 300 candles vem só do peso residual do início da
+    janela (ordem de 1e-2 no ADX e 1e-3 ponto na EMA50).
+    """
+
+    def __init__(self, period: int = 14, history: int = 30) -> None:
+        self.period = period
+        self.history = history
+        self._states: dict[tuple[str, Hashable], TimeframeIndicators] = {}
+
+    def state(self, symbol: str, timeframe: Hashable) -> TimeframeIndicators | None:
+        return self._states.get((symbol, timeframe))
+
+    def reset(self, symbol: str | None = None) -> None:
+        if symbol is None:
+            self._states.clear()
+            return
+        for key in [k for k in self._states if k[0] == symbol]:
+            del self._states[key]
+
+    def export_state(self) -> dict[str, np.ndarray]:
+        return {
+            f"{symbol}|{timeframe}|{name}": arr
+            for (symbol, timeframe), state in self._states.items()
+            for name, arr in state.to_arrays().items()
+        }
+
+    def restore_state(self, arrays: dict[str, np.ndarray]) -> None:
+        grouped: dict[tuple[str, int], dict[str, np.ndarray]] = {}
+        for key, arr in arrays.items():
+            symbol, timeframe, name = key.rsplit("|", 2)
+            grouped.setdefault((symbol, int(timeframe)), {})[name] = arr
+        for key, parts in grouped.items():
+            self._states[key] = TimeframeIndicators.from_arrays(parts)
+
+    def update(
+        self,
+        symbol: str,
+        timeframe: Hashable,
+        times: Sequence,
+        highs: Sequence[float],
+        lows: Sequence[float],
+        closes: Sequence[float],
+    ) -> IndicatorValues:
+        """Incorpora os candles fechados ainda não vistos e avalia o último (em formação)."""
+        key = (symbol, timeframe)
+        state = self._states.get(key)
+        last = len(times) - 1
+        start = 0
+        if state is not None and state.last_time is not None:
+            start = int(np.searchsorted(times, state.last_time, side="right"))
+            stale = start == 0 or start > last or times[start - 1] != state.last_time
+            if stale:
+                state = None
+                start = 0
+        if state is None:
+            state = TimeframeIndicators(self.period, self.history)
+            self._states[key] = state
+
+        for i in range(start, last):
+            state.commit(times[i], float(highs[i]), float(lows[i]), float(closes[i]))
+        return state.peek(float(highs[last]), float(lows[last]), float(closes[last]))
@@ -0,0 +1,113 @@
+"""Saídas intrabar: toques de stop/take pela máxima/mínima do candle, com drill-down lazy.
+
+O engine compara só ``close_5m`` (abertura do candle M5) com stop/take. Com um
+``IntrabarResolver`` cada candle M5 fechado com posição aberta é conferido pela máxima/mínima
+com os níveis vigentes; quando o range cruza stop e take no mesmo candle, os candles M1 daquele
+intervalo (e, se o M1 ainda for ambíguo, os ticks do minuto) são buscados só para esse candle
+para decidir qual nível foi tocado primeiro. Sem dados finos o desempate é conservador (stop).
+
+O stop sai no nível, ou na abertura do candle se ela já estava além dele; o take sai no nível.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional
+
+import numpy as np
+
+from utils import RATES_DTYPE, TIMEFRAME_M1
+
+if TYPE_CHECKING:  # o engine ao vivo não importa o mt5_replay
+    from mt5_replay import Recording
+
+# (símbolo, timeframe, de, até) e (símbolo, de, até), epochs do servidor inclusivos
+RatesFetcher = Callable[[str, int, int, int], Optional[np.ndarray]]
+TicksFetcher = Callable[[str, int, int], Optional[np.ndarray]]
+
+
+@dataclass
+class DrillDownStats:
+    touches: int = 0  # candles com saída intrabar
+    drilled: int = 0  # candles que cruzaram stop e take e precisaram de dados finos
+    resolved_m1: int = 0
+    resolved_ticks: int = 0
+    unresolved: int = 0  # sem M1/ticks que desempatassem: stop primeiro
+
+
+def _slice(arr: Optional[np.ndarray], lo: int, hi: int) -> Optional[np.ndarray]:
+    if arr is None:
+        return None
+    times = arr["time"]
+    return arr[np.searchsorted(times, lo, side="left"):np.searchsorted(times, hi, side="right")]
+
+
+class IntrabarResolver:
+    """Decide o primeiro nível tocado dentro de um candle, buscando M1/ticks só se preciso."""
+
+    def __init__(self, rates: RatesFetcher, ticks: Optional[TicksFetcher] = None) -> None:
+        self._rates = rates
+        self._ticks = ticks
+        self.stats = DrillDownStats()
+
+    @classmethod
+    def from_recording(cls, recording: Recording) -> "IntrabarResolver":
+        """Lê direto da gravação inteira (backtest vetorizado)."""
+        return cls(
+            lambda symbol, timeframe, lo, hi: _slice(recording.rates.get((symbol, timeframe)), lo, hi),
+            lambda symbol, lo, hi: _slice(recording.ticks.get(symbol), lo, hi),
+        )
+
+    @classmethod
+    def from_mt5(cls, mt5) -> "IntrabarResolver":
+        """Usa ``copy_rates_range``/``copy_ticks_range`` do módulo (MetaTrader5 ou ``mt5_replay``)."""
+        return cls(
+            lambda symbol, timeframe, lo, hi: mt5.copy_rates_range(symbol, timeframe, lo, hi),
+            lambda symbol, lo, hi: mt5.copy_ticks_range(symbol, lo, hi, mt5.COPY_TICKS_ALL),
+        )
+
+    def bars(self, symbol: str, timeframe: int, date_from: int, date_to: int) -> np.ndarray:
+        """Candles com abertura em ``[date_from, date_to]`` (vazio se a fonte não tiver)."""
+        rates = self._rates(symbol, timeframe, date_from, date_to)
+        return np.empty(0, dtype=RATES_DTYPE) if rates is None else rates
+
+    def touch(
+        self, symbol: str, bar_time: int, period: int, open_: float, high: float, low: float,
+        buy: bool, stop: float, take: float,
+    ) -> Optional[tuple[str, float]]:
+        """``("stop" | "take", preço de saída)`` do candle, ou ``None`` se nenhum nível foi cruzado."""
+        sign = 1.0 if buy else -1.0
+        s, t, o = stop * sign, take * sign, open_ * sign
+        lo, hi = (low, high) if buy else (-high, -low)
+        stop_hit, take_hit = lo <= s, hi >= t
+        if not stop_hit and not take_hit:
+            return None
+        self.stats.touches += 1
+        if stop_hit and take_hit:
+            self.stats.drilled += 1
+            stop_hit = self._stop_first(symbol, bar_time, period, sign, s, t)
+        if stop_hit:
+            return "stop", min(s, o) * sign
+        return "take", take
+
+    def _stop_first(self, symbol: str, bar_time: int, period: int, sign: float, stop: float, take: float) -> bool:
+        """Drill-down: M1 do candle e, se o minuto tocar os dois níveis, os ticks desse minuto."""
+        span = (bar_time, bar_time + period - 1)
+        m1 = self.bars(symbol, TIMEFRAME_M1, *span) if period > 60 else np.empty(0, dtype=RATES_DTYPE)
+        if len(m1):
+            lo, hi = (m1["low"], m1["high"]) if sign > 0 else (-m1["high"], -m1["low"])
+            crossed = (lo <= stop) | (hi >= take)
+            if crossed.any():
+                i = int(crossed.argmax())
+                if not (lo[i] <= stop and hi[i] >= take):
+                    self.stats.resolved_m1 += 1
+                    return bool(lo[i] <= stop)
+                span = (int(m1["time"][i]), int(m1["time"][i]) + 59)
+        ticks = self._ticks(symbol, *span) if self._ticks is not None else None
+        if ticks is not None and len(ticks):
+            prices = np.where(ticks["last"] > 0, ticks["last"], ticks["bid"]) * sign
+            crossed = (prices <= stop) | (prices >= take)
+            if crossed.any():
+                self.stats.resolved_ticks += 1
+                return bool(prices[int(crossed.argmax())] <= stop)
+        self.stats.unresolved += 1
+        return True
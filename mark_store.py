@@ -0,0 +1,159 @@
+"""Marcação a mercado da equity a cada evento de 5m, em colunas binárias compactas.
+
+Cada marca é ``(time int64, realized float32, unrealized float32)`` = 16 bytes: o resultado
+realizado acumulado e o não realizado da posição aberta (R$, mesma convenção por contrato
+do ``EquityTracker``). As marcas vão para buffers NumPy pré-alocados e são acrescentadas a
+``root/<AAAA-MM>/{time.i64,realized.f32,unrealized.f32}`` a cada ``flush_every`` marcas ou
+``flush_interval`` segundos; um ano de M5 cabe em poucos MB. A leitura é só NumPy
+(``np.fromfile``), com ``read_downsampled`` devolvendo mínimo/máximo/último por faixa para
+gráficos sem perder os vales de drawdown. Com ``overwrite`` (backtest: uma execução por
+diretório) cada mês é truncado no primeiro flush, então repetir o período não duplica marcas.
+
+Os horários seguem a convenção do MT5 (horário do servidor codificado como epoch UTC).
+"""
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from utils import to_epoch
+
+_COLUMNS = (("time", "int64", "i64"), ("realized", "float32", "f32"), ("unrealized", "float32", "f32"))
+
+
+class Marks(NamedTuple):
+    time: np.ndarray  # int64
+    realized: np.ndarray  # float32
+    unrealized: np.ndarray  # float32
+
+    @property
+    def equity(self) -> np.ndarray:
+        return self.realized.astype("float64") + self.unrealized
+
+
+class DownsampledMarks(NamedTuple):
+    time: np.ndarray  # início de cada faixa
+    low: np.ndarray  # menor equity da faixa
+    high: np.ndarray
+    last: np.ndarray
+    count: np.ndarray  # marcas na faixa
+
+
+def _month_key(epoch: int) -> str:
+    return str(np.datetime64(int(epoch), "s").astype("datetime64[M]"))
+
+
+class MarkStore:
+    """Buffer pré-alocado de marcas com flush periódico para colunas por mês."""
+
+    def __init__(
+        self,
+        root: str | Path = "reports/marks",
+        flush_every: int = 288,
+        flush_interval: float = 60.0,
+        overwrite: bool = False,
+    ) -> None:
+        self.root = Path(root)
+        self.overwrite = overwrite
+        self._touched: set[str] = set()  # meses já gravados nesta execução
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._time = np.empty(flush_every, dtype="int64")
+        self._realized = np.empty(flush_every, dtype="float32")
+        self._unrealized = np.empty(flush_every, dtype="float32")
+        self._size = 0
+        self._last_flush = time.monotonic()
+        self.written = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def record(self, epoch: int, realized: float, unrealized: float) -> None:
+        """Acrescenta uma marca; grava em disco quando o buffer enche ou o intervalo vence."""
+        i = self._size
+        self._time[i] = epoch
+        self._realized[i] = realized
+        self._unrealized[i] = unrealized
+        self._size = i + 1
+        if self._size == self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """Acrescenta o buffer aos arquivos do mês de cada marca; devolve quantas foram gravadas."""
+        size = self._size
+        self._last_flush = time.monotonic()
+        if size == 0:
+            return 0
+        buffers = {"time": self._time[:size], "realized": self._realized[:size], "unrealized": self._unrealized[:size]}
+        months = buffers["time"].astype("datetime64[s]").astype("datetime64[M]")
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        for lo, hi in zip(starts, np.r_[starts[1:], size]):
+            month = str(months[lo])
+            folder = self.root / month
+            folder.mkdir(parents=True, exist_ok=True)
+            mode = "wb" if self.overwrite and month not in self._touched else "ab"
+            self._touched.add(month)
+            for name, _, suffix in _COLUMNS:
+                with open(folder / f"{name}.{suffix}", mode) as fh:
+                    buffers[name][lo:hi].tofile(fh)
+        self._size = 0
+        self.written += size
+        return size
+
+    def close(self) -> None:
+        self.flush()
+
+    # ---------------------------------------------------------------- leitura
+    def months(self) -> list[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / "time.i64").exists())
+
+    def _read_month(self, month: str) -> Marks:
+        folder = self.root / month
+        columns = [np.fromfile(folder / f"{name}.{suffix}", dtype=dtype) for name, dtype, suffix in _COLUMNS]
+        size = min(len(column) for column in columns)  # queda no meio de um flush
+        return Marks(*(column[:size] for column in columns))
+
+    def read(self, date_from=None, date_to=None) -> Marks:
+        """Marcas com horário em ``[date_from, date_to]`` (inclusive as ainda no buffer), em ordem.
+
+        Marcas repetidas no mesmo horário (reprocessamento do mesmo período) ficam com a última.
+        """
+        lo = -(2**62) if date_from is None else to_epoch(date_from)
+        hi = 2**62 if date_to is None else to_epoch(date_to)
+        first, last = (_month_key(lo) if date_from is not None else ""), (_month_key(hi) if date_to is not None else "~")
+        parts = [self._read_month(month) for month in self.months() if first <= month <= last]
+        parts.append(Marks(self._time[:self._size].copy(), self._realized[:self._size].copy(), self._unrealized[:self._size].copy()))
+        marks = Marks(*(np.concatenate(column) for column in zip(*parts)))
+        times = marks.time
+        if len(times) > 1 and not (times[1:] > times[:-1]).all():
+            # último registro de cada horário: ``unique`` sobre a série invertida
+            _, keep = np.unique(times[::-1], return_index=True)
+            order = len(times) - 1 - keep
+            marks = Marks(*(column[order] for column in marks))
+        inside = (marks.time >= lo) & (marks.time <= hi)
+        return Marks(*(column[inside] for column in marks))
+
+    def read_downsampled(self, date_from=None, date_to=None, points: int = 1000) -> DownsampledMarks:
+        """Até ``points`` faixas de tempo iguais com mínimo/máximo/último da equity (para gráficos)."""
+        marks = self.read(date_from, date_to)
+        equity = marks.equity
+        if len(equity) == 0:
+            empty = np.empty(0)
+            return DownsampledMarks(marks.time, empty, empty, empty, np.empty(0, dtype="int64"))
+        t0, t1 = int(marks.time[0]), int(marks.time[-1])
+        width = max(1, -(-(t1 - t0 + 1) // points))
+        bucket = (marks.time - t0) // width
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], len(equity)]
+        return DownsampledMarks(
+            time=t0 + bucket[starts] * width,
+            low=np.minimum.reduceat(equity, starts),
+            high=np.maximum.reduceat(equity, starts),
+            last=equity[ends - 1],
+            count=ends - starts,
+        )
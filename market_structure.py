@@ -0,0 +1,290 @@
+"""Pivôs fractais e estrutura de mercado (HH_HL / LH_LL).
+
+As funções vetorizadas reproduzem ``RegimeDetector._detect_fractal_pivots``/
+``_structure_from_pivots`` aplicados, a cada candle ``i``, à janela que termina em ``i``
+(como os ``high_series_*`` do snapshot), mas em uma única passada NumPy.
+``StructureTracker`` faz o mesmo ao vivo, confirmando pivôs conforme os candles fecham.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Hashable, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+STRUCTURE_CODES = {"NEUTRA": 0, "HH_HL": 1, "LH_LL": -1}
+_STRUCTURE_NAMES = np.array(["NEUTRA", "HH_HL", "LH_LL"])  # índice -1 → LH_LL
+
+
+class StructureSeries(NamedTuple):
+    structure: np.ndarray  # int8 em STRUCTURE_CODES
+    pivot_count: np.ndarray
+    pivot_highs: np.ndarray  # (n, count), mais recente na última coluna, NaN à esquerda
+    pivot_lows: np.ndarray
+    high_count: np.ndarray
+    low_count: np.ndarray
+
+
+def structure_names(codes: np.ndarray) -> np.ndarray:
+    """Códigos int8 → nomes usados por ``RegimeSignal.structure15/structure60``."""
+    return _STRUCTURE_NAMES[np.asarray(codes, dtype=np.intp)]
+
+
+def fractal_pivots(highs: np.ndarray, lows: np.ndarray, width: int = 2) -> tuple[np.ndarray, np.ndarray]:
+    """Máscaras de pivô de alta/baixa: extremo estrito contra ``width`` candles de cada lado."""
+    highs = np.asarray(highs, dtype="float64")
+    lows = np.asarray(lows, dtype="float64")
+    n = len(highs)
+    high_mask = np.zeros(n, dtype=bool)
+    low_mask = np.zeros(n, dtype=bool)
+    if n <= 2 * width:
+        return high_mask, low_mask
+
+    core = slice(width, n - width)
+    h, lo = highs[core], lows[core]
+    is_high = high_mask[core]
+    is_low = low_mask[core]
+    is_high[:] = True
+    is_low[:] = True
+    for k in range(1, width + 1):
+        for shifted in (slice(width - k, n - width - k), slice(width + k, n - width + k)):
+            is_high &= h > highs[shifted]
+            is_low &= lo < lows[shifted]
+    return high_mask, low_mask
+
+
+def candidate_bounds(n: int, lookback: int, width: int = 2, window: Optional[int] = 120) -> tuple[np.ndarray, np.ndarray]:
+    """Faixa ``[lo, hi]`` (inclusiva) de candidatos a pivô vista pelo candle ``i``.
+
+    Equivale a ``range(max(width, m - lookback), m - width)`` na janela de ``m`` candles que
+    termina em ``i`` (``window=None`` usa todo o histórico até ``i``).
+    """
+    i = np.arange(n)
+    start = np.zeros(n, dtype=np.int64) if window is None else np.maximum(0, i + 1 - window)
+    lo = np.maximum(start + width, i + 1 - lookback)
+    hi = i - width
+    return lo, hi
+
+
+def last_pivots(values: np.ndarray, mask: np.ndarray, lo: np.ndarray, hi: np.ndarray, count: int = 3) -> tuple[np.ndarray, np.ndarray]:
+    """Últimos ``count`` valores com ``mask`` em ``[lo[i], hi[i]]`` para cada ``i``."""
+    values = np.asarray(values, dtype="float64")
+    n = len(values)
+    out = np.full((n, count), np.nan)
+    if n == 0:
+        return out, np.zeros(0, dtype=np.int64)
+
+    positions = np.flatnonzero(mask)
+    cum = np.cumsum(mask, dtype=np.int64)
+    upto_hi = np.where(hi >= 0, cum[np.clip(hi, 0, n - 1)], 0)
+    before_lo = np.where(lo >= 1, cum[np.clip(lo - 1, 0, n - 1)], 0)
+    taken = np.minimum(np.maximum(upto_hi - before_lo, 0), count)
+    for k in range(count):
+        ok = taken > k
+        out[ok, count - 1 - k] = values[positions[upto_hi[ok] - 1 - k]]
+    return out, taken
+
+
+def structure_from_last(pivot_highs: np.ndarray, pivot_lows: np.ndarray, high_count: np.ndarray, low_count: np.ndarray) -> np.ndarray:
+    """Versão vetorizada de ``RegimeDetector._structure_from_pivots``."""
+    both = (high_count >= 2) & (low_count >= 2)
+    h1, h2 = pivot_highs[:, -1], pivot_highs[:, -2]
+    l1, l2 = pivot_lows[:, -1], pivot_lows[:, -2]
+    up = both & (h1 > h2) & (l1 > l2)
+    down = both & (h1 < h2) & (l1 < l2)
+    return np.where(up, 1, np.where(down, -1, 0)).astype(np.int8)
+
+
+def structure_series(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    lookback: int,
+    width: int = 2,
+    count: int = 3,
+    window: Optional[int] = 120,
+) -> StructureSeries:
+    """Estrutura, contagem e últimos pivôs "como vistos no candle i" para todo ``i``."""
+    high_mask, low_mask = fractal_pivots(highs, lows, width)
+    lo, hi = candidate_bounds(len(high_mask), lookback, width, window)
+    pivot_highs, high_count = last_pivots(highs, high_mask, lo, hi, count)
+    pivot_lows, low_count = last_pivots(lows, low_mask, lo, hi, count)
+    structure = structure_from_last(pivot_highs, pivot_lows, high_count, low_count)
+    return StructureSeries(structure, high_count + low_count, pivot_highs, pivot_lows, high_count, low_count)
+
+
+def structure_label(pivot_highs: Sequence[float], pivot_lows: Sequence[float]) -> str:
+    """Estrutura a partir dos dois últimos pivôs de alta e de baixa."""
+    if len(pivot_highs) >= 2 and len(pivot_lows) >= 2:
+        if pivot_highs[-1] > pivot_highs[-2] and pivot_lows[-1] > pivot_lows[-2]:
+            return "HH_HL"
+        if pivot_highs[-1] < pivot_highs[-2] and pivot_lows[-1] < pivot_lows[-2]:
+            return "LH_LL"
+    return "NEUTRA"
+
+
+class Pivot(NamedTuple):
+    seq: int  # posição do candle na sequência vista pelo tracker
+    time: int
+    price: float
+
+
+class StructureView(NamedTuple):
+    structure: str
+    pivot_count: int
+    pivot_highs: list[float]
+    pivot_lows: list[float]
+    lookback: int  # recorte em que os pivôs foram buscados
+
+
+class StructureTracker:
+    """Pivôs fractais confirmados incrementalmente, um candle fechado por vez.
+
+    Um pivô é confirmado quando fecham os ``width`` candles à sua direita e entra num deque
+    de ``history`` pivôs (a linha do tempo de pivôs). ``peek`` avalia também o candidato que
+    depende do candle em formação, como faz o recorte ``high_series_*`` do snapshot, então
+    o resultado é idêntico ao de ``_detect_fractal_pivots`` sobre a mesma janela.
+    """
+
+    def __init__(self, width: int = 2, history: int = 64) -> None:
+        self.width = width
+        self.history = history
+        self.seq = -1
+        self.last_time: Optional[int] = None
+        self._times: deque[int] = deque(maxlen=2 * width)
+        self._highs: deque[float] = deque(maxlen=2 * width)
+        self._lows: deque[float] = deque(maxlen=2 * width)
+        self.pivot_highs: deque[Pivot] = deque(maxlen=history)
+        self.pivot_lows: deque[Pivot] = deque(maxlen=history)
+
+    def _confirm(self, high: float, low: float) -> tuple[Optional[Pivot], Optional[Pivot]]:
+        """Testa o candle central de ``width`` fechados + ``(high, low)`` à direita."""
+        if len(self._highs) < 2 * self.width:
+            return None, None
+        highs = (*self._highs, high)
+        lows = (*self._lows, low)
+        w = self.width
+        center_high, center_low = highs[w], lows[w]
+        sides = range(-w, w + 1)
+        is_high = all(center_high > highs[w + k] for k in sides if k)
+        is_low = all(center_low < lows[w + k] for k in sides if k)
+        seq, center_time = self.seq + 1 - w, self._times[w]
+        return (
+            Pivot(seq, center_time, center_high) if is_high else None,
+            Pivot(seq, center_time, center_low) if is_low else None,
+        )
+
+    def commit(self, time, high: float, low: float) -> None:
+        pivot_high, pivot_low = self._confirm(high, low)
+        if pivot_high is not None:
+            self.pivot_highs.append(pivot_high)
+        if pivot_low is not None:
+            self.pivot_lows.append(pivot_low)
+        self.seq += 1
+        self._times.append(int(time))
+        self._highs.append(high)
+        self._lows.append(low)
+        self.last_time = int(time)
+
+    @staticmethod
+    def _recent(pivots: deque[Pivot], tentative: Optional[Pivot], first_seq: int, count: int) -> list[float]:
+        out = [tentative.price] if tentative is not None else []
+        for pivot in reversed(pivots):
+            if len(out) >= count or pivot.seq < first_seq:
+                break
+            out.append(pivot.price)
+        out.reverse()
+        return out
+
+    def peek(self, high: float, low: float, lookback: int, count: int = 3) -> StructureView:
+        """Estrutura vista com o candle em formação ``(high, low)`` no fim da janela."""
+        tentative_high, tentative_low = self._confirm(high, low)
+        first_seq = self.seq + 2 - lookback
+        highs = self._recent(self.pivot_highs, tentative_high, first_seq, count)
+        lows = self._recent(self.pivot_lows, tentative_low, first_seq, count)
+        return StructureView(structure_label(highs, lows), len(highs) + len(lows), highs, lows, lookback)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Estado para checkpoint (ver ``from_arrays``)."""
+        last_time = -1 if self.last_time is None else self.last_time
+        return {
+            "scalars": np.array([self.width, self.history, self.seq, last_time], dtype="int64"),
+            "window": np.array([list(self._times), list(self._highs), list(self._lows)], dtype="float64").reshape(3, -1),
+            "pivot_highs": np.array(self.pivot_highs, dtype="float64").reshape(-1, 3),
+            "pivot_lows": np.array(self.pivot_lows, dtype="float64").reshape(-1, 3),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "StructureTracker":
+        width, history, seq, last_time = (int(v) for v in arrays["scalars"].tolist())
+        tracker = cls(width, history)
+        tracker.seq = seq
+        tracker.last_time = None if last_time < 0 else last_time
+        times, highs, lows = arrays["window"].tolist()
+        tracker._times.extend(int(t) for t in times)
+        tracker._highs.extend(highs)
+        tracker._lows.extend(lows)
+        for name in ("pivot_highs", "pivot_lows"):
+            getattr(tracker, name).extend(Pivot(int(s), int(t), p) for s, t, p in arrays[name].tolist())
+        return tracker
+
+
+class StructureEngine:
+    """Mantém ``StructureTracker`` por (símbolo, timeframe), no mesmo esquema do ``IndicatorEngine``."""
+
+    def __init__(self, width: int = 2, history: int = 64) -> None:
+        self.width = width
+        self.history = history
+        self._trackers: dict[tuple[str, Hashable], StructureTracker] = {}
+
+    def tracker(self, symbol: str, timeframe: Hashable) -> StructureTracker | None:
+        return self._trackers.get((symbol, timeframe))
+
+    def reset(self, symbol: str | None = None) -> None:
+        if symbol is None:
+            self._trackers.clear()
+            return
+        for key in [k for k in self._trackers if k[0] == symbol]:
+            del self._trackers[key]
+
+    def export_state(self) -> dict[str, np.ndarray]:
+        return {
+            f"{symbol}|{timeframe}|{name}": arr
+            for (symbol, timeframe), tracker in self._trackers.items()
+            for name, arr in tracker.to_arrays().items()
+        }
+
+    def restore_state(self, arrays: dict[str, np.ndarray]) -> None:
+        grouped: dict[tuple[str, int], dict[str, np.ndarray]] = {}
+        for key, arr in arrays.items():
+            symbol, timeframe, name = key.rsplit("|", 2)
+            grouped.setdefault((symbol, int(timeframe)), {})[name] = arr
+        for key, parts in grouped.items():
+            self._trackers[key] = StructureTracker.from_arrays(parts)
+
+    def update(
+        self,
+        symbol: str,
+        timeframe: Hashable,
+        times: Sequence,
+        highs: Sequence[float],
+        lows: Sequence[float],
+        lookback: int,
+        count: int = 3,
+    ) -> StructureView:
+        """Confirma pivôs dos candles fechados ainda não vistos e avalia o último (em formação)."""
+        key = (symbol, timeframe)
+        tracker = self._trackers.get(key)
+        last = len(times) - 1
+        start = 0
+        if tracker is not None and tracker.last_time is not None:
+            start = int(np.searchsorted(times, tracker.last_time, side="right"))
+            if start == 0 or start > last or times[start - 1] != tracker.last_time:
+                tracker = None
+                start = 0
+        if tracker is None:
+            tracker = StructureTracker(self.width, self.history)
+            self._trackers[key] = tracker
+
+        for i in range(start, last):
+            tracker.commit(times[i], float(highs[i]), float(lows[i]))
+        return tracker.peek(float(highs[last]), float(lows[last]), lookback, count)
@@ -0,0 +1,230 @@
+"""Monte Carlo de drawdown e risco de ruína sobre os CSVs mensais de trades.
+
+Os trades gravados por ``_persist_closed_trade`` (``<reports>/<ano>/trades_<ano>_<mês>.csv``)
+são reamostrados com reposição (``bootstrap``) ou embaralhados (``permutation``) em uma
+matriz caminhos x trades, processada em blocos de caminhos. Cada trade vale ``pnl_reais``
+por contrato, com os contratos dados por ``sizing``:
+
+- ``capital``: regra do engine, ``calculate_position_size`` sobre o capital inicial (0,75%
+  de risco, stop de ``stop_atr`` x ATR15 do trade, teto de ``max_contracts``);
+- ``equity``: a mesma regra sobre o saldo corrente (juros compostos; um passo vetorizado por trade);
+- ``fixed``: ``contracts`` contratos em todo trade.
+
+Ruína é o saldo ficar abaixo de ``ruin_equity`` (padrão R$ 2000, onde ``max_contracts`` zera).
+
+Uso: ``python monte_carlo.py reports --capital 10000 --paths 100000 --method permutation``
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from risk_manager import ExitParams
+from utils import WIN_POINT_VALUE
+
+PERCENTILES = (50, 75, 90, 95, 99)
+METHODS = ("bootstrap", "permutation")
+SIZINGS = ("capital", "equity", "fixed")
+
+
+@dataclass
+class MonteCarloResult:
+    paths: int
+    trades: int  # trades por caminho
+    method: str
+    sizing: str
+    capital: float
+    ruin_equity: float
+    max_drawdown: np.ndarray  # R$, por caminho
+    max_drawdown_pct: np.ndarray  # maior queda como fração do pico vigente, por caminho
+    recovery_trades: np.ndarray  # maior sequência de trades abaixo do pico, por caminho
+    final_equity: np.ndarray
+    ended_underwater: np.ndarray  # terminou abaixo do pico
+    ruined: np.ndarray
+    trades_per_day: float
+    elapsed: float
+
+    @property
+    def ruin_probability(self) -> float:
+        return float(self.ruined.mean())
+
+    @property
+    def underwater_at_end(self) -> float:
+        return float(self.ended_underwater.mean())
+
+    def percentiles(self, q: tuple[int, ...] = PERCENTILES) -> pd.DataFrame:
+        """Percentis de drawdown, recuperação (trades e pregões) e saldo final."""
+        return pd.DataFrame(
+            {
+                "max_drawdown": np.percentile(self.max_drawdown, q),
+                "max_drawdown_pct": np.percentile(self.max_drawdown_pct, q) * 100.0,
+                "recovery_trades": np.percentile(self.recovery_trades, q),
+                "recovery_days": np.percentile(self.recovery_trades, q) / self.trades_per_day,
+                "final_equity": np.percentile(self.final_equity, q),
+            },
+            index=[f"p{p}" for p in q],
+        )
+
+
+def load_trades(reports_dir: str | Path) -> pd.DataFrame:
+    """Todos os ``trades_*.csv`` de ``reports_dir`` em ordem de fechamento."""
+    files = sorted(Path(reports_dir).glob("*/trades_*.csv"))
+    if not files:
+        raise FileNotFoundError(f"Nenhum CSV de trades em {reports_dir}")
+    trades = pd.concat([pd.read_csv(path) for path in files], ignore_index=True)
+    return trades.sort_values("timestamp_close", kind="stable").reset_index(drop=True)
+
+
+def trade_contracts(atr15: np.ndarray, balance: np.ndarray | float, stop_atr: float, contracts: int) -> np.ndarray:
+    """``min(calculate_position_size(balance, 0.0075, stop_atr * atr15).contracts, contracts)`` em lote."""
+    risk_per_contract = stop_atr * np.asarray(atr15, dtype="float64") * WIN_POINT_VALUE
+    return _contracts(np.asarray(balance, dtype="float64"), risk_per_contract, contracts)
+
+
+def _contracts(balance: np.ndarray, risk_per_contract: np.ndarray, contracts: int) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        size = np.where(risk_per_contract > 0, np.floor_divide(balance * 0.0075, risk_per_contract), 0.0)
+    cap = np.floor(np.maximum(balance, 0.0) / 2000.0)  # max_contracts
+    size = np.where(balance > 0, np.clip(size, 0.0, cap), 0.0)
+    return np.minimum(size, contracts)
+
+
+def _sample(rng: np.random.Generator, method: str, count: int, trades: int, horizon: int) -> np.ndarray:
+    if method == "bootstrap":
+        return rng.integers(0, trades, size=(count, horizon))
+    return rng.permuted(np.tile(np.arange(trades), (count, 1)), axis=1)
+
+
+def _path_stats(equity: np.ndarray, ruin_equity: float) -> tuple[np.ndarray, ...]:
+    """Drawdown, maior sequência abaixo do pico, saldo final, fim abaixo do pico e ruína por linha."""
+    peak = np.maximum.accumulate(equity, axis=1)
+    drawdown = peak - equity
+    worst = drawdown.argmax(axis=1)
+    rows = np.arange(len(equity))
+    steps = np.arange(equity.shape[1])
+    last_peak = np.maximum.accumulate(np.where(drawdown <= 0, steps, 0), axis=1)
+    underwater = steps - last_peak
+    return (
+        drawdown[rows, worst],
+        (drawdown / peak).max(axis=1),  # não é a do pior R$: uma queda menor de um pico menor pode pesar mais
+        underwater.max(axis=1),
+        equity[:, -1],
+        underwater[:, -1] > 0,
+        equity.min(axis=1) < ruin_equity,
+    )
+
+
+def run_monte_carlo(
+    trades: pd.DataFrame,
+    capital: float = 10000.0,
+    paths: int = 100_000,
+    method: str = "bootstrap",
+    sizing: str = "capital",
+    contracts: int = 5,
+    horizon: Optional[int] = None,
+    ruin_equity: float = 2000.0,
+    stop_atr: float = ExitParams.stop_atr,
+    chunk: int = 8192,
+    seed: Optional[int] = None,
+) -> MonteCarloResult:
+    """Simula ``paths`` sequências de ``horizon`` trades (padrão: o tamanho do ledger).
+
+    O custo cresce com ``paths x horizon``; ``sizing="equity"`` percorre o horizonte trade a
+    trade (~1,2 s para 100k caminhos x 156 trades, contra ~0,7 s de ``capital``).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method inválido: {method!r} (opções: {', '.join(METHODS)})")
+    if sizing not in SIZINGS:
+        raise ValueError(f"sizing inválido: {sizing!r} (opções: {', '.join(SIZINGS)})")
+    if capital <= ruin_equity:
+        raise ValueError(f"capital ({capital:.2f}) deve ser maior que ruin_equity ({ruin_equity:.2f})")
+    count = len(trades)
+    if count == 0:
+        raise ValueError("Ledger sem trades")
+    horizon = count if method == "permutation" or horizon is None else horizon
+    pnl = trades["pnl_reais"].to_numpy(dtype="float64")
+    atr15 = trades["atr15"].to_numpy(dtype="float64")
+    risk_per_contract = stop_atr * atr15 * WIN_POINT_VALUE
+    per_trade = pnl * (contracts if sizing == "fixed" else trade_contracts(atr15, capital, stop_atr, contracts))
+
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    parts = []
+    for first in range(0, paths, chunk):
+        size = min(chunk, paths - first)
+        index = _sample(rng, method, size, count, horizon)
+        equity = np.empty((size, horizon + 1))
+        equity[:, 0] = capital
+        if sizing == "equity":
+            # o tamanho depende do saldo anterior: um passo NumPy por trade (vetorizado só entre
+            # caminhos), ~2x o custo de ``capital``
+            path_pnl = pnl[index]
+            path_risk = risk_per_contract[index]
+            for t in range(horizon):
+                balance = equity[:, t]
+                equity[:, t + 1] = balance + path_pnl[:, t] * _contracts(balance, path_risk[:, t], contracts)
+        else:
+            np.cumsum(per_trade[index], axis=1, out=equity[:, 1:])
+            equity[:, 1:] += capital
+        parts.append(_path_stats(equity, ruin_equity))
+    stats = [np.concatenate(column) for column in zip(*parts)]
+    elapsed = time.perf_counter() - started
+
+    days = pd.to_datetime(trades["timestamp_close"].str[:10]).nunique()
+    return MonteCarloResult(
+        paths=paths,
+        trades=horizon,
+        method=method,
+        sizing=sizing,
+        capital=capital,
+        ruin_equity=ruin_equity,
+        max_drawdown=stats[0],
+        max_drawdown_pct=stats[1],
+        recovery_trades=stats[2],
+        final_equity=stats[3],
+        ended_underwater=stats[4],
+        ruined=stats[5],
+        trades_per_day=count / max(days, 1),
+        elapsed=elapsed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("reports", help="diretório dos CSVs mensais (reports/ ou saída de backtest)")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--method", choices=METHODS, default="bootstrap")
+    parser.add_argument("--sizing", choices=SIZINGS, default="capital")
+    parser.add_argument("--contracts", type=int, default=5, help="teto de contratos (ou contratos fixos)")
+    parser.add_argument("--horizon", type=int, help="trades por caminho no bootstrap (padrão: tamanho do ledger)")
+    parser.add_argument("--ruin", type=float, default=2000.0, help="saldo de ruína em R$")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    result = run_monte_carlo(
+        load_trades(args.reports),
+        capital=args.capital,
+        paths=args.paths,
+        method=args.method,
+        sizing=args.sizing,
+        contracts=args.contracts,
+        horizon=args.horizon,
+        ruin_equity=args.ruin,
+        seed=args.seed,
+    )
+    print(result.percentiles().round(2).to_string())
+    print(
+        f"caminhos={result.paths} trades/caminho={result.trades} ruína(< {result.ruin_equity:.2f})="
+        f"{result.ruin_probability:.2%} abaixo_do_pico_no_fim={result.underwater_at_end:.2%} tempo={result.elapsed:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 """Conector de sessão MT5 e construção de snapshots de mercado."""
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
 from typing import Callable, Optional
 
-import MetaTrader5 as mt5
+import MetaTrader5 as mt5  # offline (backtest/testes): ``mt5_replay.install()`` antes desta importação
 import numpy as np
 import pandas as pd
 
+import indicators
+from bar_cache import BarCache, valid_rates
+from indicator_engine import IndicatorEngine, IndicatorValues
+from market_structure import StructureEngine, StructureView
+from regime_detector import RegimeDetector
+from resampler import SessionResampler
+from state_store import load_checkpoint, save_checkpoint
+from tracing import DEBUG, TRACER, Subscription, callback_sink
+from utils import timeframe_seconds
+
 
 @dataclass
 class ConnectionStatus:
@@ -18,36 +30,103 @@ class ConnectionStatus:
     server: str = ""
 
 
+@dataclass
+class SnapshotCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class SnapshotCache:
+    """Memoiza snapshots por (símbolo, último M5, último M15, último H1).
+
+    O mesmo estado de mercado (mesmos candles de abertura nos três timeframes) é calculado
+    no máximo uma vez; o candle em formação não entra na chave, então quem precisa de
+    preço intrabar atualizado deve invalidar explicitamente.
+    """
+
+    def __init__(self, maxsize: int = 8) -> None:
+        self.maxsize = maxsize
+        self.stats = SnapshotCacheStats()
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[dict]:
+        snapshot = self._entries.get(key)
+        if snapshot is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._entries.move_to_end(key)
+        return snapshot
+
+    def put(self, key: tuple, snapshot: dict) -> None:
+        self._entries[key] = snapshot
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        if symbol is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == symbol]:
+            del self._entries[key]
+
+
 class MT5Connector:
-    def __init__(self, logger) -> None:
+    """Sessão MT5 e snapshots de mercado.
+
+    Com ``derive_from`` (ex.: ``mt5.TIMEFRAME_M5`` ou ``TIMEFRAME_M1``) só o timeframe base é
+    buscado a cada evento; os demais são semeados uma vez no MT5 e depois derivados
+    localmente por ``SessionResampler``, então todos os timeframes vêm do mesmo stream.
+
+    Com ``state_path`` os buffers de candles e o estado dos indicadores são gravados em
+    ``checkpoint()`` e recarregados na primeira conexão; os candles que faltam são então
+    reconciliados pelos deltas normais do ``BarCache``/``IndicatorEngine``.
+    """
+
+    def __init__(self, logger, derive_from: Optional[int] = None, state_path: str | Path | None = None) -> None:
         self.logger = logger
+        self.derive_from = derive_from
+        self.state_path = Path(state_path) if state_path else None
+        self._state_loaded = False
         self._status = ConnectionStatus(False)
         self._offline_since: Optional[datetime] = None
         self._offline_periods: list[tuple[datetime, datetime]] = []
         self.debug_mode = False
-        self._debug_callback: Callable[[str], None] | None = None
+        self.tracer = TRACER
+        self._debug_sub: Optional[Subscription] = None
+        self._bar_cache = BarCache(mt5.copy_rates_from_pos, capacity=300)
+        self._indicator_engine = IndicatorEngine()
+        self._structure_engine = StructureEngine()
+        self._snapshot_cache = SnapshotCache()
+        self._resamplers: dict[tuple[str, int], SessionResampler] = {}
 
     @property
     def status(self) -> ConnectionStatus:
         return self._status
 
+    @property
+    def snapshot_cache_stats(self) -> SnapshotCacheStats:
+        return self._snapshot_cache.stats
+
+    def invalidate_snapshots(self, symbol: Optional[str] = None) -> None:
+        """Descarta snapshots memoizados (todos ou só de ``symbol``)."""
+        self._snapshot_cache.invalidate(symbol)
+
     @property
     def offline_periods(self) -> list[tuple[datetime, datetime]]:
         return self._offline_periods
 
     def set_debug(self, enabled: bool, callback: Callable[[str], None] | None = None) -> None:
         self.debug_mode = enabled
-        self._debug_callback = callback
+        self.tracer.unsubscribe(self._debug_sub)
+        self._debug_sub = None
         if enabled:
+            self._debug_sub = self.tracer.subscribe(callback_sink(callback, self.logger), DEBUG, {"connector"})
             self._debug("Modo Debug do conector ativado")
 
-    def _debug(self, message: str) -> None:
-        if not self.debug_mode:
-            return
-        payload = f"[DEBUG] {message}"
-        self.logger.info(payload)
-        if self._debug_callback:
-            self._debug_callback(payload)
+    def _debug(self, message: str, **fields) -> None:
+        self.tracer.emit("connector", DEBUG, message, **fields)
 
     def connect(self, login: int, password: str, server: str) -> bool:
         try:
@@ -66,10 +145,11 @@ class MT5Connector:
             account_type = "Real" if getattr(account, "trade_mode", 0) == 2 else "Demo"
             self._status = ConnectionStatus(True, account_type, account.login, account.server)
             self.logger.info("Conectado ao MT5. Conta: %s | Tipo: %s", account.login, account_type)
-            self._debug(f"Conectado MT5 status.connected={self._status.connected}")
+            self._debug("Conectado MT5 status.connected=%(connected)s", connected=self._status.connected)
             if self._offline_since:
                 self._offline_periods.append((self._offline_since, datetime.now()))
                 self._offline_since = None
+            self._restore_state()
             return True
         except Exception as exc:
             self.logger.exception("Erro inesperado na conexão MT5: %s", exc)
@@ -81,6 +161,7 @@ class MT5Connector:
             mt5.shutdown()
         finally:
             self._status = ConnectionStatus(False)
+            self._snapshot_cache.invalidate()
             self.logger.info("Desconectado do MT5")
 
     def ensure_connection(self) -> bool:
@@ -92,17 +173,77 @@ class MT5Connector:
             self._status.connected = False
         elif connected and not self._status.connected:
             self._status.connected = True
+            self._snapshot_cache.invalidate()
             self.logger.info("Reconexão MT5 detectada")
             if self._offline_since:
                 self._offline_periods.append((self._offline_since, datetime.now()))
                 self._offline_since = None
         return connected
 
-    def _last_candle_time(self, symbol: str, timeframe: int) -> Optional[pd.Timestamp]:
+    def _state_meta(self) -> dict:
+        return {"capacity": self._bar_cache.capacity, "derive_from": self.derive_from}
+
+    def checkpoint(self) -> bool:
+        """Grava candles e recorrências dos indicadores em ``state_path`` (no-op sem caminho)."""
+        if self.state_path is None:
+            return False
+        resamplers = {
+            f"{symbol}|{timeframe}|{name}": arr
+            for (symbol, timeframe), resampler in self._resamplers.items()
+            for name, arr in resampler.to_arrays().items()
+        }
+        sections = {
+            "bars": self._bar_cache.export_state(),
+            "indicators": self._indicator_engine.export_state(),
+            "structure": self._structure_engine.export_state(),
+            "resamplers": resamplers,
+        }
+        try:
+            save_checkpoint(self.state_path, sections, self._state_meta())
+        except OSError as exc:
+            self.logger.warning("Falha ao gravar checkpoint %s: %s", self.state_path, exc)
+            return False
+        return True
+
+    def _restore_state(self) -> None:
+        if self.state_path is None or self._state_loaded:
+            return
+        self._state_loaded = True
+        loaded = load_checkpoint(self.state_path)
+        if loaded is None:
+            return
+        sections, meta = loaded
+        if meta != self._state_meta():
+            self.logger.info("Checkpoint %s ignorado: configuração diferente (%s)", self.state_path, meta)
+            return
+        self._bar_cache.restore_state(sections.get("bars", {}))
+        self._indicator_engine.restore_state(sections.get("indicators", {}))
+        self._structure_engine.restore_state(sections.get("structure", {}))
+        grouped: dict[tuple[str, int], dict[str, np.ndarray]] = {}
+        for key, arr in sections.get("resamplers", {}).items():
+            symbol, timeframe, name = key.rsplit("|", 2)
+            grouped.setdefault((symbol, int(timeframe)), {})[name] = arr
+        for (symbol, timeframe), arrays in grouped.items():
+            resampler = SessionResampler(timeframe_seconds(timeframe), capacity=self._bar_cache.capacity)
+            resampler.restore(arrays)
+            self._resamplers[(symbol, timeframe)] = resampler
+        self._snapshot_cache.invalidate()
+        self.logger.info("Estado restaurado de %s (%d séries de candles)", self.state_path, len(sections.get("bars", {})))
+
+    def get_last_candle_epoch(self, symbol: str, timeframe: int) -> Optional[int]:
         rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, 1)
         if rates is None or len(rates) == 0:
             return None
-        return pd.to_datetime(rates[0]["time"], unit="s")
+        return int(rates[0]["time"])
+
+    def _last_candle_time(self, symbol: str, timeframe: int) -> Optional[pd.Timestamp]:
+        epoch = self.get_last_candle_epoch(symbol, timeframe)
+        return None if epoch is None else pd.Timestamp(epoch, unit="s")
+
+    def server_time(self, symbol: str) -> Optional[int]:
+        """Horário do último tick no servidor (epoch MT5) ou ``None`` sem cotação."""
+        tick = mt5.symbol_info_tick(symbol)
+        return int(tick.time) if tick is not None else None
 
     def get_last_candle_time_15m(self, symbol: str) -> Optional[pd.Timestamp]:
         return self._last_candle_time(symbol, mt5.TIMEFRAME_M15)
@@ -110,99 +251,125 @@ class MT5Connector:
     def get_last_candle_time_5m(self, symbol: str) -> Optional[pd.Timestamp]:
         return self._last_candle_time(symbol, mt5.TIMEFRAME_M5)
 
+    def get_last_candle_epoch_5m(self, symbol: str) -> Optional[int]:
+        return self.get_last_candle_epoch(symbol, mt5.TIMEFRAME_M5)
+
     def get_rates_dataframe(self, symbol: str, timeframe: int, bars: int = 300) -> Optional[pd.DataFrame]:
+        """DataFrame dos candles para uso fora do caminho quente (snapshots usam o cache)."""
         rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, bars)
         if rates is None or len(rates) < 60:
-            self._debug(f"Candles insuficientes em {symbol}/{timeframe}")
+            self._debug("Candles insuficientes em %(symbol)s/%(timeframe)s", symbol=symbol, timeframe=timeframe)
             return None
 
-        df = pd.DataFrame(rates)
-        if df.empty:
+        rates = valid_rates(rates)
+        if len(rates) < 60:
+            self._debug("Dados inválidos após normalização em %(symbol)s/%(timeframe)s", symbol=symbol, timeframe=timeframe)
             return None
-        df["time"] = pd.to_datetime(df["time"], unit="s")
 
-        numeric_cols = ["open", "high", "low", "close", "tick_volume"]
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
-
-        df = df.dropna(subset=numeric_cols).copy()
-        if len(df) < 60:
-            self._debug(f"Dados inválidos após normalização em {symbol}/{timeframe}")
-            return None
+        df = pd.DataFrame(rates)
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+        df["tick_volume"] = df["tick_volume"].astype("float64")
 
-        if self.debug_mode:
-            self._debug(f"{symbol}/{timeframe} dtypes: {df.dtypes.to_dict()}")
-            self._debug(f"{symbol}/{timeframe} shape: {df.shape}")
+        if self.tracer.enabled("connector"):
+            self._debug("%(symbol)s/%(timeframe)s dtypes: %(dtypes)s", symbol=symbol, timeframe=timeframe, dtypes=df.dtypes.to_dict())
+            self._debug("%(symbol)s/%(timeframe)s shape: %(shape)s", symbol=symbol, timeframe=timeframe, shape=df.shape)
         return df
 
     @staticmethod
     def _atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
-        tr1 = df["high"] - df["low"]
-        tr2 = (df["high"] - df["close"].shift()).abs()
-        tr3 = (df["low"] - df["close"].shift()).abs()
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        return tr.ewm(alpha=1 / period, adjust=False).mean().fillna(0).astype("float64")
+        atr = indicators.wilder_atr(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), period)
+        return pd.Series(atr, index=df.index, dtype="float64")
 
     @staticmethod
     def _adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
-        high = df["high"].astype("float64")
-        low = df["low"].astype("float64")
-        close = df["close"].astype("float64")
-
-        up_move = high.diff()
-        down_move = -low.diff()
+        adx = indicators.adx(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), period)
+        return pd.Series(adx, index=df.index, dtype="float64")
 
-        plus_dm = pd.Series(np.where((up_move > down_move) & (up_move > 0), up_move, np.nan), index=df.index, dtype="float64")
-        minus_dm = pd.Series(np.where((down_move > up_move) & (down_move > 0), down_move, np.nan), index=df.index, dtype="float64")
+    def _cached_rates(self, symbol: str, timeframe: int) -> Optional[np.ndarray]:
+        rates = self._bar_cache.refresh(symbol, timeframe)
+        if rates is None or len(rates) < 60:
+            self._debug("Candles insuficientes em %(symbol)s/%(timeframe)s", symbol=symbol, timeframe=timeframe)
+            return None
+        return rates
+
+    def _derived_rates(self, symbol: str, timeframe: int, base: np.ndarray) -> Optional[np.ndarray]:
+        key = (symbol, timeframe)
+        resampler = self._resamplers.get(key)
+        if resampler is None:
+            resampler = SessionResampler(timeframe_seconds(timeframe), capacity=self._bar_cache.capacity)
+            self._resamplers[key] = resampler
+        # ``update`` pode perder a sequência do base (lacuna/reinício): semeia de novo na mesma
+        # chamada em vez de devolver (e o ``SnapshotCache`` guardar) a view antiga
+        for _ in range(2):
+            if resampler.needs_seed:
+                history = mt5.copy_rates_from_pos(symbol, timeframe, 0, self._bar_cache.capacity)
+                if history is None or len(history) == 0:
+                    return None
+                resampler.seed(valid_rates(history))
+                self._debug("Resampler %(symbol)s/%(timeframe)s semeado com %(bars)d candles", symbol=symbol, timeframe=timeframe, bars=len(history))
+            rates = resampler.update(base)
+            if not resampler.needs_seed:
+                break
+        else:
+            return None
+        if rates is None or len(rates) < 60:
+            self._debug("Candles insuficientes em %(symbol)s/%(timeframe)s", symbol=symbol, timeframe=timeframe)
+            return None
+        return rates
+
+    def _snapshot_rates(self, symbol: str) -> tuple[Optional[np.ndarray], ...]:
+        timeframes = (mt5.TIMEFRAME_M5, mt5.TIMEFRAME_M15, mt5.TIMEFRAME_H1)
+        if self.derive_from is None:
+            return tuple(self._cached_rates(symbol, tf) for tf in timeframes)
+        base = self._bar_cache.refresh(symbol, self.derive_from)
+        if base is None or len(base) == 0:
+            return (None,) * len(timeframes)
+        return tuple(
+            (base if len(base) >= 60 else None) if tf == self.derive_from else self._derived_rates(symbol, tf, base)
+            for tf in timeframes
+        )
 
-        tr = pd.concat([(high - low), (high - close.shift()).abs(), (low - close.shift()).abs()], axis=1).max(axis=1).astype("float64")
-        atr = tr.ewm(alpha=1 / period, adjust=False).mean().replace(0, np.nan).astype("float64")
+    def _indicators(self, symbol: str, timeframe: int, rates: np.ndarray) -> IndicatorValues:
+        return self._indicator_engine.update(symbol, timeframe, rates["time"], rates["high"], rates["low"], rates["close"])
 
-        plus_di = (100 * plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr).astype("float64")
-        minus_di = (100 * minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr).astype("float64")
-        dx = (100 * (plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)).astype("float64")
-        return dx.ewm(alpha=1 / period, adjust=False).mean().fillna(0).astype("float64")
+    def _structure(self, symbol: str, timeframe: int, rates: np.ndarray, lookback: int) -> StructureView:
+        return self._structure_engine.update(symbol, timeframe, rates["time"], rates["high"], rates["low"], lookback)
 
     def build_market_snapshot(self, symbol: str) -> Optional[dict]:
-        df5 = self.get_rates_dataframe(symbol, mt5.TIMEFRAME_M5)
-        df15 = self.get_rates_dataframe(symbol, mt5.TIMEFRAME_M15)
-        df60 = self.get_rates_dataframe(symbol, mt5.TIMEFRAME_H1)
-        if df5 is None or df15 is None or df60 is None:
-            return None
+        """Snapshot 5m/15m/60m lido direto das views do cache de candles.
 
-        df15 = df15.copy()
-        df60 = df60.copy()
-
-        df5["ema20"] = df5["close"].ewm(span=20, adjust=False).mean()
-        df15["ema20"] = df15["close"].ewm(span=20, adjust=False).mean()
-        df15["ema50"] = df15["close"].ewm(span=50, adjust=False).mean()
-        df15["atr14"] = self._atr(df15, 14)
-        df15["adx14"] = self._adx(df15, 14)
+        As séries ``*_series_*`` são views NumPy (sem cópia) sobre o ring buffer e só
+        devem ser lidas até a próxima atualização do mesmo timeframe.
+        """
+        r5, r15, r60 = self._snapshot_rates(symbol)
+        if r5 is None or r15 is None or r60 is None:
+            return None
 
-        df60["ema20"] = df60["close"].ewm(span=20, adjust=False).mean()
-        df60["ema50"] = df60["close"].ewm(span=50, adjust=False).mean()
-        df60["atr14"] = self._atr(df60, 14)
-        df60["adx14"] = self._adx(df60, 14)
+        key = (symbol, int(r5["time"][-1]), int(r15["time"][-1]), int(r60["time"][-1]))
+        cached = self._snapshot_cache.get(key)
+        if cached is not None:
+            return cached
+        snapshot = self._compute_snapshot(symbol, r5, r15, r60)
+        self._snapshot_cache.put(key, snapshot)
+        return snapshot
 
-        df15 = df15.dropna(subset=["ema20", "ema50", "atr14", "adx14"]).copy()
-        df60 = df60.dropna(subset=["ema20", "ema50", "atr14", "adx14"]).copy()
-        if len(df5) < 30 or len(df15) < 30 or len(df60) < 30:
-            return None
+    def _compute_snapshot(self, symbol: str, r5: np.ndarray, r15: np.ndarray, r60: np.ndarray) -> dict:
+        ind5 = self._indicators(symbol, mt5.TIMEFRAME_M5, r5)
+        ind15 = self._indicators(symbol, mt5.TIMEFRAME_M15, r15)
+        ind60 = self._indicators(symbol, mt5.TIMEFRAME_H1, r60)
 
-        latest5 = df5.iloc[-1]
-        prev5 = df5.iloc[-2]
-        latest15 = df15.iloc[-1]
-        prev15 = df15.iloc[-2]
-        latest60 = df60.iloc[-1]
+        latest5 = r5[-1]
+        prev5 = r5[-2]
+        latest15 = r15[-1]
 
         pullback_to_ema = (
-            latest15["low"] <= latest15["ema20"] <= latest15["high"]
-            or latest15["low"] <= latest15["ema50"] <= latest15["high"]
+            latest15["low"] <= ind15.ema20 <= latest15["high"]
+            or latest15["low"] <= ind15.ema50 <= latest15["high"]
         )
 
         return {
-            "last_candle_time_5m": latest5["time"],
-            "last_candle_time_15m": latest15["time"],
+            "last_candle_time_5m": pd.Timestamp(int(latest5["time"]), unit="s"),
+            "last_candle_time_15m": pd.Timestamp(int(latest15["time"]), unit="s"),
             "close_5m": float(latest5["close"]),
             "high_5m": float(latest5["high"]),
             "low_5m": float(latest5["low"]),
@@ -212,31 +379,33 @@ class MT5Connector:
             "close_15m": float(latest15["close"]),
             "high_15m": float(latest15["high"]),
             "low_15m": float(latest15["low"]),
-            "ema20": float(latest15["ema20"]),
-            "ema50": float(latest15["ema50"]),
-            "ema20_15": float(latest15["ema20"]),
-            "ema50_15": float(latest15["ema50"]),
-            "ema20_5": float(df5["ema20"].iloc[-1]),
-            "ema20_15_prev3": float(df15["ema20"].iloc[-4]),
-            "atr15": float(latest15["atr14"]),
-            "atr15_prev": float(prev15["atr14"]),
-            "atr15_mean30": float(df15["atr14"].tail(30).mean()),
-            "adx15": float(latest15["adx14"]),
-            "ema20_60": float(latest60["ema20"]),
-            "ema50_60": float(latest60["ema50"]),
-            "ema20_60_prev3": float(df60["ema20"].iloc[-4]),
-            "atr60": float(latest60["atr14"]),
-            "adx60": float(latest60["adx14"]),
-            "breakout_high_5": float(df15["high"].iloc[-6:-1].max()),
-            "breakout_low_5": float(df15["low"].iloc[-6:-1].min()),
+            "ema20": ind15.ema20,
+            "ema50": ind15.ema50,
+            "ema20_15": ind15.ema20,
+            "ema50_15": ind15.ema50,
+            "ema20_5": ind5.ema20,
+            "ema20_15_prev3": ind15.ema20_prev3,
+            "atr15": ind15.atr14,
+            "atr15_prev": ind15.atr14_prev,
+            "atr15_mean30": ind15.atr14_mean30,
+            "adx15": ind15.adx14,
+            "ema20_60": ind60.ema20,
+            "ema50_60": ind60.ema50,
+            "ema20_60_prev3": ind60.ema20_prev3,
+            "atr60": ind60.atr14,
+            "adx60": ind60.adx14,
+            "breakout_high_5": float(r15["high"][-6:-1].max()),
+            "breakout_low_5": float(r15["low"][-6:-1].min()),
             "volume_15m": float(latest15["tick_volume"]),
-            "volume_avg20": float(df15["tick_volume"].tail(20).mean()),
+            "volume_avg20": float(r15["tick_volume"][-20:].mean()),
             "pullback_to_ema": bool(pullback_to_ema),
-            "ema_distance_atr": abs(float(latest15["ema20"] - latest15["ema50"])) / max(float(latest15["atr14"]), 1e-9),
-            "macro_aligned": bool((latest60["ema20"] > latest60["ema50"] and latest15["ema20"] > latest15["ema50"]) or (latest60["ema20"] < latest60["ema50"] and latest15["ema20"] < latest15["ema50"])),
+            "ema_distance_atr": abs(ind15.ema20 - ind15.ema50) / max(ind15.atr14, 1e-9),
+            "macro_aligned": bool((ind60.ema20 > ind60.ema50 and ind15.ema20 > ind15.ema50) or (ind60.ema20 < ind60.ema50 and ind15.ema20 < ind15.ema50)),
             "rejection_5m": bool((latest5["close"] > latest5["open"] and latest5["low"] < min(latest5["open"], latest5["close"])) or (latest5["close"] < latest5["open"] and latest5["high"] > max(latest5["open"], latest5["close"]))),
-            "high_series_15": df15["high"].tail(120).astype("float64").tolist(),
-            "low_series_15": df15["low"].tail(120).astype("float64").tolist(),
-            "high_series_60": df60["high"].tail(120).astype("float64").tolist(),
-            "low_series_60": df60["low"].tail(120).astype("float64").tolist(),
+            "high_series_15": r15["high"][-120:],
+            "low_series_15": r15["low"][-120:],
+            "high_series_60": r60["high"][-120:],
+            "low_series_60": r60["low"][-120:],
+            "pivots15": self._structure(symbol, mt5.TIMEFRAME_M15, r15, RegimeDetector.CONTEXT15_LOOKBACK),
+            "pivots60": self._structure(symbol, mt5.TIMEFRAME_H1, r60, RegimeDetector.MACRO_LOOKBACK),
         }
@@ -0,0 +1,460 @@
+"""Substituto offline do pacote ``MetaTrader5`` que reproduz candles e ticks gravados.
+
+Expõe as mesmas funções/constantes usadas por ``mt5_connector`` e ``execution_manager``,
+servindo dados de uma ``Recording`` (arquivo ``.npz``) sob um ``ReplayClock`` controlável.
+Em ``max_speed`` o ``sleep`` do relógio apenas avança o tempo virtual, então uma sessão
+inteira roda pelo ``TradingEngine`` tão rápido quanto a CPU permitir::
+
+    import mt5_replay
+    mt5_replay.install()                      # antes de importar mt5_connector
+    session = mt5_replay.load("replay/win_2024-05-02.npz", start="2024-05-02 09:00")
+    engine = TradingEngine(logger, connector, execution, 10000, clock=session.clock)
+
+Candles de um timeframe só ficam visíveis a partir do seu horário de abertura; o candle em
+formação é montado a partir dos ticks (se gravados) ou dos candles fechados do menor
+timeframe gravado, sem olhar o futuro.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time as _time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from utils import B3_TZ, RATES_DTYPE, timeframe_seconds
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+COPY_TICKS_ALL = -1
+COPY_TICKS_INFO = 1
+COPY_TICKS_TRADE = 2
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_PENDING = 5
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TIME_GTC = 0
+ORDER_FILLING_IOC = 1
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_NO_QUOTES = 10021
+
+RES_S_OK = 1
+RES_E_INTERNAL_FAIL_INIT = -10003
+RES_E_NO_IPC_CONNECTION = -10004  # o que o MetaTrader5 devolve em chamadas sem ``initialize``
+
+TICKS_DTYPE = np.dtype(
+    [
+        ("time", "<i8"),
+        ("bid", "<f8"),
+        ("ask", "<f8"),
+        ("last", "<f8"),
+        ("volume", "<u8"),
+        ("time_msc", "<i8"),
+        ("flags", "<u4"),
+        ("volume_real", "<f8"),
+    ]
+)
+
+TerminalInfo = namedtuple("TerminalInfo", "connected trade_allowed name company path")
+AccountInfo = namedtuple("AccountInfo", "login trade_mode balance equity currency server name")
+SymbolInfo = namedtuple("SymbolInfo", "name point digits trade_tick_size trade_tick_value volume_min volume_step")
+Tick = namedtuple("Tick", "time bid ask last volume time_msc flags volume_real")
+OrderSendResult = namedtuple("OrderSendResult", "retcode deal order volume price bid ask comment request_id request")
+
+
+def server_epoch(value) -> int:
+    """Converte datetime/str/int para epoch do servidor (horário local codificado como UTC)."""
+    if isinstance(value, (int, np.integer, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+@dataclass(frozen=True)
+class SymbolSpec:
+    point: float = 1.0
+    digits: int = 0
+    trade_tick_size: float = 5.0
+    trade_tick_value: float = 1.0
+    volume_min: float = 1.0
+    volume_step: float = 1.0
+
+
+@dataclass
+class Recording:
+    """Candles por (símbolo, timeframe) e ticks por símbolo, ordenados por tempo."""
+
+    rates: dict[tuple[str, int], np.ndarray] = field(default_factory=dict)
+    ticks: dict[str, np.ndarray] = field(default_factory=dict)
+    symbols: dict[str, SymbolSpec] = field(default_factory=dict)
+
+    def save(self, path: Path | str) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {f"rates__{sym}__{tf}": arr for (sym, tf), arr in self.rates.items()}
+        arrays.update({f"ticks__{sym}": arr for sym, arr in self.ticks.items()})
+        for sym, spec in self.symbols.items():
+            arrays[f"spec__{sym}"] = np.array(
+                [spec.point, spec.digits, spec.trade_tick_size, spec.trade_tick_value, spec.volume_min, spec.volume_step]
+            )
+        np.savez(path, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: Path | str) -> "Recording":
+        recording = cls()
+        with np.load(path) as data:
+            for key in data.files:
+                kind, _, rest = key.partition("__")
+                if kind == "rates":
+                    sym, _, tf = rest.rpartition("__")
+                    recording.rates[(sym, int(tf))] = data[key].astype(RATES_DTYPE, copy=False)
+                elif kind == "ticks":
+                    recording.ticks[rest] = data[key].astype(TICKS_DTYPE, copy=False)
+                elif kind == "spec":
+                    v = data[key]
+                    recording.symbols[rest] = SymbolSpec(float(v[0]), int(v[1]), float(v[2]), float(v[3]), float(v[4]), float(v[5]))
+        return recording
+
+    def span(self) -> tuple[int, int]:
+        starts = [int(a["time"][0]) for a in self.rates.values() if len(a)]
+        ends = [int(a["time"][-1]) + timeframe_seconds(tf) for (_, tf), a in self.rates.items() if len(a)]
+        if not starts:
+            raise ValueError("Gravação sem candles")
+        return min(starts), max(ends)
+
+
+class ReplayClock:
+    """Relógio virtual no horário do servidor; ``max_speed`` transforma ``sleep`` em salto."""
+
+    def __init__(self, start, max_speed: bool = True, speed: float = 1.0) -> None:
+        self.max_speed = max_speed
+        self.speed = speed
+        self._now = float(server_epoch(start))
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        with self._lock:
+            return self._now
+
+    def now(self) -> datetime:
+        """Horário atual da replay no fuso B3 (mesmo contrato de ``utils.now_b3``)."""
+        return datetime.fromtimestamp(self.time(), tz=timezone.utc).replace(tzinfo=B3_TZ)
+
+    def set(self, moment) -> None:
+        with self._lock:
+            self._now = float(server_epoch(moment))
+
+    def advance(self, seconds: float) -> None:
+        with self._lock:
+            self._now += seconds
+
+    def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        if not self.max_speed:
+            _time.sleep(seconds / self.speed)
+        self.advance(seconds)
+
+
+class ReplaySession:
+    """Estado de uma replay: gravação, relógio, conta simulada e ordens recebidas."""
+
+    def __init__(self, recording: Recording, clock: ReplayClock, login: int = 0, server: str = "Replay", balance: float = 10000.0) -> None:
+        self.recording = recording
+        self.clock = clock
+        self.login = login
+        self.server = server
+        self.balance = balance
+        self.initialized = False
+        self.orders: list[dict] = []
+        self.last_error: tuple[int, str] = (RES_S_OK, "Success")
+        self._order_seq = 0
+        self._end = recording.span()[1]
+        self._finest_cache: dict[str, Optional[tuple[int, int, np.ndarray]]] = {}
+
+    @property
+    def exhausted(self) -> bool:
+        return self.clock.time() >= self._end
+
+    def _finest(self, symbol: str) -> Optional[tuple[int, int, np.ndarray]]:
+        """(timeframe, segundos, candles) do menor timeframe gravado para ``symbol``."""
+        if symbol not in self._finest_cache:
+            frames = [(tf, timeframe_seconds(tf), arr) for (sym, tf), arr in self.recording.rates.items() if sym == symbol and len(arr)]
+            self._finest_cache[symbol] = min(frames, key=lambda item: item[1]) if frames else None
+        return self._finest_cache[symbol]
+
+    def _forming(self, symbol: str, bar: np.void, period: int, now: int) -> np.void:
+        """Candle em formação até ``now``, sem usar dados posteriores."""
+        bar = bar.copy()
+        start = int(bar["time"])
+        ticks = self.recording.ticks.get(symbol)
+        if ticks is not None and len(ticks):
+            lo = np.searchsorted(ticks["time"], start, side="left")
+            hi = np.searchsorted(ticks["time"], now, side="right")
+            if hi > lo:
+                prices = np.where(ticks["last"][lo:hi] > 0, ticks["last"][lo:hi], ticks["bid"][lo:hi])
+                bar["open"], bar["high"], bar["low"], bar["close"] = prices[0], prices.max(), prices.min(), prices[-1]
+                bar["tick_volume"] = hi - lo
+                return bar
+
+        finest = self._finest(symbol)
+        price = float(bar["open"])
+        high = low = price
+        volume = 0
+        if finest is not None and finest[1] < period:
+            _, fp, arr = finest
+            lo = np.searchsorted(arr["time"], start, side="left")
+            closed = np.searchsorted(arr["time"], now - fp, side="right")
+            if closed > lo:
+                part = arr[lo:closed]
+                high = max(high, float(part["high"].max()))
+                low = min(low, float(part["low"].min()))
+                price = float(part["close"][-1])
+                volume = int(part["tick_volume"].sum())
+            current = np.searchsorted(arr["time"], now, side="right") - 1
+            if current >= closed and current >= lo:
+                price = float(arr["open"][current])
+                high, low = max(high, price), min(low, price)
+        bar["high"], bar["low"], bar["close"] = high, low, price
+        bar["tick_volume"] = volume
+        bar["real_volume"] = 0
+        return bar
+
+    def visible_rates(self, symbol: str, timeframe: int) -> np.ndarray:
+        """Candles com abertura até o instante atual; o último é o parcial em formação."""
+        arr = self.recording.rates.get((symbol, timeframe))
+        if arr is None:
+            return np.empty(0, dtype=RATES_DTYPE)
+        now = int(self.clock.time())
+        end = int(np.searchsorted(arr["time"], now, side="right"))
+        if end == 0:
+            return arr[:0]
+        period = timeframe_seconds(timeframe)
+        out = arr[:end]
+        if int(out["time"][-1]) + period > now:
+            out = out.copy()
+            out[-1] = self._forming(symbol, out[-1], period, now)
+        return out
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int) -> Optional[np.ndarray]:
+        arr = self.recording.rates.get((symbol, timeframe))
+        if arr is None:
+            self.last_error = (-2, f"Símbolo/timeframe sem gravação: {symbol}/{timeframe}")
+            return None
+        now = int(self.clock.time())
+        end = int(np.searchsorted(arr["time"], now, side="right")) - start_pos
+        if end <= 0:
+            return np.empty(0, dtype=RATES_DTYPE)
+        out = arr[max(0, end - count):end].copy()
+        period = timeframe_seconds(timeframe)
+        if start_pos == 0 and int(out["time"][-1]) + period > now:
+            out[-1] = self._forming(symbol, out[-1], period, now)
+        return out
+
+    def copy_rates_from(self, symbol: str, timeframe: int, date_from, count: int) -> Optional[np.ndarray]:
+        rates = self.visible_rates(symbol, timeframe)
+        end = int(np.searchsorted(rates["time"], server_epoch(date_from), side="right"))
+        return rates[max(0, end - count):end].copy()
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from, date_to) -> Optional[np.ndarray]:
+        rates = self.visible_rates(symbol, timeframe)
+        lo = int(np.searchsorted(rates["time"], server_epoch(date_from), side="left"))
+        hi = int(np.searchsorted(rates["time"], server_epoch(date_to), side="right"))
+        return rates[lo:hi].copy()
+
+    def copy_ticks_from(self, symbol: str, date_from, count: int, flags: int = COPY_TICKS_ALL) -> Optional[np.ndarray]:
+        ticks = self.recording.ticks.get(symbol)
+        if ticks is None:
+            return np.empty(0, dtype=TICKS_DTYPE)
+        lo = int(np.searchsorted(ticks["time"], server_epoch(date_from), side="left"))
+        hi = int(np.searchsorted(ticks["time"], int(self.clock.time()), side="right"))
+        return ticks[lo:min(hi, lo + count)].copy()
+
+    def copy_ticks_range(self, symbol: str, date_from, date_to, flags: int = COPY_TICKS_ALL) -> Optional[np.ndarray]:
+        ticks = self.recording.ticks.get(symbol)
+        if ticks is None:
+            return np.empty(0, dtype=TICKS_DTYPE)
+        lo = int(np.searchsorted(ticks["time"], server_epoch(date_from), side="left"))
+        hi = int(np.searchsorted(ticks["time"], min(server_epoch(date_to), int(self.clock.time())), side="right"))
+        return ticks[lo:hi].copy()
+
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        if symbol not in self.recording.symbols and not any(sym == symbol for sym, _ in self.recording.rates):
+            return None
+        spec = self.recording.symbols.get(symbol, SymbolSpec())
+        return SymbolInfo(symbol, spec.point, spec.digits, spec.trade_tick_size, spec.trade_tick_value, spec.volume_min, spec.volume_step)
+
+    def symbol_info_tick(self, symbol: str) -> Optional[Tick]:
+        now = int(self.clock.time())
+        ticks = self.recording.ticks.get(symbol)
+        if ticks is not None and len(ticks):
+            idx = int(np.searchsorted(ticks["time"], now, side="right")) - 1
+            if idx >= 0:
+                return Tick(*ticks[idx].tolist())
+        finest = self._finest(symbol)
+        if finest is None:
+            return None
+        rates = self.copy_rates_from_pos(symbol, finest[0], 0, 1)
+        if rates is None or len(rates) == 0:
+            return None
+        price = float(rates[-1]["close"])
+        return Tick(now, price, price, price, 0, now * 1000, 0, 0.0)
+
+    def order_send(self, request: dict) -> Optional[OrderSendResult]:
+        tick = self.symbol_info_tick(request.get("symbol", ""))
+        if tick is None:
+            self.last_error = (TRADE_RETCODE_NO_QUOTES, "Sem cotação na replay")
+            return OrderSendResult(TRADE_RETCODE_NO_QUOTES, 0, 0, 0.0, 0.0, 0.0, 0.0, "no quotes", 0, request)
+        self._order_seq += 1
+        price = tick.ask if request.get("type") == ORDER_TYPE_BUY else tick.bid
+        self.orders.append({**request, "fill_price": price, "fill_time": int(self.clock.time()), "ticket": self._order_seq})
+        return OrderSendResult(TRADE_RETCODE_DONE, self._order_seq, self._order_seq, request.get("volume", 0.0), price, tick.bid, tick.ask, "replay", 0, request)
+
+
+_session: Optional[ReplaySession] = None
+
+
+def load(source: Recording | Path | str, start=None, max_speed: bool = True, speed: float = 1.0, **account) -> ReplaySession:
+    """Carrega a gravação e torna a sessão ativa para as funções de módulo."""
+    global _session
+    recording = source if isinstance(source, Recording) else Recording.load(source)
+    clock = ReplayClock(start if start is not None else recording.span()[0], max_speed=max_speed, speed=speed)
+    _session = ReplaySession(recording, clock, **account)
+    return _session
+
+
+def session() -> Optional[ReplaySession]:
+    return _session
+
+
+def install() -> None:
+    """Registra este módulo como ``MetaTrader5`` (chamar antes de importar o conector)."""
+    sys.modules["MetaTrader5"] = sys.modules[__name__]
+
+
+def record(symbol: str, timeframes: list[int], date_from, date_to, path: Path | str, with_ticks: bool = False) -> Path:
+    """Grava candles (e opcionalmente ticks) do terminal MT5 real num arquivo de replay."""
+    import MetaTrader5 as real_mt5
+
+    recording = Recording()
+    for tf in timeframes:
+        rates = real_mt5.copy_rates_range(symbol, tf, date_from, date_to)
+        if rates is not None:
+            recording.rates[(symbol, tf)] = np.asarray(rates).astype(RATES_DTYPE)
+    if with_ticks:
+        ticks = real_mt5.copy_ticks_range(symbol, date_from, date_to, real_mt5.COPY_TICKS_ALL)
+        if ticks is not None:
+            recording.ticks[symbol] = np.asarray(ticks).astype(TICKS_DTYPE)
+    info = real_mt5.symbol_info(symbol)
+    if info is not None:
+        recording.symbols[symbol] = SymbolSpec(
+            info.point, info.digits, info.trade_tick_size, info.trade_tick_value, info.volume_min, info.volume_step
+        )
+    return recording.save(path)
+
+
+# --- API compatível com o pacote MetaTrader5 -------------------------------------------
+
+def initialize(*args, login: int | None = None, password: str | None = None, server: str | None = None, **kwargs) -> bool:
+    if _session is None:
+        return False
+    if login is not None:
+        _session.login = login
+    if server:
+        _session.server = server
+    _session.initialized = True
+    _session.last_error = (RES_S_OK, "Success")
+    return True
+
+
+def shutdown() -> None:
+    if _session is not None:
+        _session.initialized = False
+
+
+def last_error() -> tuple[int, str]:
+    if _session is None:
+        return (RES_E_INTERNAL_FAIL_INIT, "Nenhuma gravação carregada (mt5_replay.load)")
+    return _session.last_error
+
+
+def version() -> tuple[int, int, str]:
+    return (500, 0, "replay")
+
+
+def terminal_info() -> Optional[TerminalInfo]:
+    if _session is None or not _session.initialized:
+        return None
+    return TerminalInfo(True, True, "mt5_replay", "offline", "")
+
+
+def account_info() -> Optional[AccountInfo]:
+    if _session is None or not _session.initialized:
+        return None
+    return AccountInfo(_session.login, 0, _session.balance, _session.balance, "BRL", _session.server, "replay")
+
+
+def _active() -> Optional[ReplaySession]:
+    """Sessão inicializada ou ``None``; como no MetaTrader5, o motivo fica em ``last_error``."""
+    if _session is None:
+        return None
+    if not _session.initialized:
+        _session.last_error = (RES_E_NO_IPC_CONNECTION, "No IPC connection")
+        return None
+    return _session
+
+
+def copy_rates_from_pos(symbol: str, timeframe: int, start_pos: int, count: int):
+    active = _active()
+    return None if active is None else active.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+
+
+def copy_rates_from(symbol: str, timeframe: int, date_from, count: int):
+    active = _active()
+    return None if active is None else active.copy_rates_from(symbol, timeframe, date_from, count)
+
+
+def copy_rates_range(symbol: str, timeframe: int, date_from, date_to):
+    active = _active()
+    return None if active is None else active.copy_rates_range(symbol, timeframe, date_from, date_to)
+
+
+def copy_ticks_from(symbol: str, date_from, count: int, flags: int = COPY_TICKS_ALL):
+    active = _active()
+    return None if active is None else active.copy_ticks_from(symbol, date_from, count, flags)
+
+
+def copy_ticks_range(symbol: str, date_from, date_to, flags: int = COPY_TICKS_ALL):
+    active = _active()
+    return None if active is None else active.copy_ticks_range(symbol, date_from, date_to, flags)
+
+
+def symbol_info(symbol: str):
+    active = _active()
+    return None if active is None else active.symbol_info(symbol)
+
+
+def symbol_info_tick(symbol: str):
+    active = _active()
+    return None if active is None else active.symbol_info_tick(symbol)
+
+
+def order_send(request: dict):
+    active = _active()
+    return None if active is None else active.order_send(request)
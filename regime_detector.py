@@ -1,8 +1,13 @@
 """Classificação hierárquica de regime (60m + 15m) para o Sniper Adaptativo."""
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Callable
+from dataclasses import dataclass, fields
+from typing import Callable, Mapping, Optional, Sequence
+
+import numpy as np
+
+from market_structure import STRUCTURE_CODES, StructureSeries, structure_label, structure_names, structure_series
+from tracing import DEBUG, TRACER, Subscription, callback_sink
 
 
 @dataclass
@@ -19,14 +24,101 @@ class RegimeSignal:
     dist_rel_15: float
 
 
+@dataclass(frozen=True)
+class RegimeParams:
+    """Limiares da classificação de regime (padrões = regras originais do Sniper Adaptativo)."""
+
+    adx_trend: float = 20.0  # macro em tendência / início da tendência fraca no 15m
+    adx_strong: float = 25.0  # tendência forte no 15m
+    adx_quiet: float = 18.0  # lateral sem expansão de ATR
+    adx_full: float = 40.0  # ADX a partir do qual a confiança de tendência satura
+    dist_rel_strong: float = 0.2
+    dist_rel_weak: float = 0.12
+    slope_strong: float = 0.15
+    atr_expansion: float = 1.10
+    macro_lookback: int = 8
+    context15_lookback: int = 12
+
+
+@dataclass
+class RegimeBatch:
+    """``RegimeSignal`` em colunas (um elemento por candle) produzido por ``classify_batch``."""
+
+    macro: np.ndarray
+    context15: np.ndarray
+    regime: np.ndarray
+    direction: np.ndarray
+    confidence_score: np.ndarray
+    structure15: np.ndarray
+    structure60: np.ndarray
+    pivot_count15: np.ndarray
+    pivot_count60: np.ndarray
+    dist_rel_15: np.ndarray
+    atr_expansion: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.regime)
+
+    def signal(self, index: int) -> RegimeSignal:
+        values = {f.name: getattr(self, f.name)[index] for f in fields(RegimeSignal)}
+        return RegimeSignal(**{k: v.item() if isinstance(v, np.generic) else v for k, v in values.items()})
+
+
+def _py_max(a, b):
+    """``max(a, b)`` do Python elemento a elemento (NaN em ``b`` nunca vence)."""
+    return np.where(b > a, b, a)
+
+
+def _py_min(a, b):
+    return np.where(b < a, b, a)
+
+
+def _py_round(values: np.ndarray, digits: int) -> np.ndarray:
+    """``round`` do Python (arredondamento decimal exato); ``np.round`` só diverge perto do empate."""
+    scale = 10.0**digits
+    scaled = values * scale
+    out = np.round(scaled) / scale
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        out[near_tie] = [round(v, digits) for v in values[near_tie].tolist()]
+    return out
+
+
+def _structure_codes(values) -> np.ndarray:
+    values = np.asarray(values)
+    if values.dtype.kind in "US":
+        codes = np.zeros(len(values), dtype=np.int8)
+        for name, code in STRUCTURE_CODES.items():
+            codes[values == name] = code
+        return codes
+    return values.astype(np.int8, copy=False)
+
+
 class RegimeDetector:
-    def __init__(self, debug_mode: bool = False, debug_callback: Callable[[str], None] | None = None) -> None:
+    # lookbacks da estrutura incremental do snapshot (``pivots15``/``pivots60``)
+    MACRO_LOOKBACK = RegimeParams.macro_lookback
+    CONTEXT15_LOOKBACK = RegimeParams.context15_lookback
+
+    def __init__(
+        self,
+        debug_mode: bool = False,
+        debug_callback: Callable[[str], None] | None = None,
+        params: Optional[RegimeParams] = None,
+    ) -> None:
+        self.params = params or RegimeParams()
         self.debug_mode = debug_mode
-        self._debug_callback = debug_callback
+        self.tracer = TRACER
+        self._debug_sub: Optional[Subscription] = None
+        if debug_mode and debug_callback:
+            self._debug_sub = self.tracer.subscribe(callback_sink(debug_callback), DEBUG, {"regime"})
+
+    def close(self) -> None:
+        """Remove o sink de debug legado (``debug_callback``) do tracer."""
+        self.tracer.unsubscribe(self._debug_sub)
+        self._debug_sub = None
 
-    def _debug(self, message: str) -> None:
-        if self.debug_mode and self._debug_callback:
-            self._debug_callback(f"[DEBUG] {message}")
+    def _debug(self, message: str, **fields) -> None:
+        self.tracer.emit("regime", DEBUG, message, **fields)
 
     @staticmethod
     def ema_distance_relative_atr(ema_fast: float, ema_slow: float, atr: float) -> float:
@@ -37,9 +129,9 @@ class RegimeDetector:
         return (ema_now - ema_prev_n) / atr if atr > 0 else 0.0
 
     @staticmethod
-    def _detect_fractal_pivots(highs: list[float], lows: list[float], lookback: int) -> tuple[list[float], list[float]]:
+    def _detect_fractal_pivots(highs: Sequence[float], lows: Sequence[float], lookback: int) -> tuple[list[float], list[float]]:
         """Detecta pivôs fractais simples (2 candles antes/depois) no recorte de lookback."""
-        if not highs or not lows:
+        if len(highs) == 0 or len(lows) == 0:
             return [], []
 
         start = max(2, len(highs) - lookback)
@@ -68,37 +160,51 @@ class RegimeDetector:
 
         return pivot_highs[-3:], pivot_lows[-3:]
 
+    @staticmethod
+    def structure_history(
+        highs: Sequence[float], lows: Sequence[float], lookback: int, width: int = 2, window: Optional[int] = 120
+    ) -> StructureSeries:
+        """Estrutura/pivôs como vistos em cada candle de um histórico inteiro (ver ``market_structure``)."""
+        return structure_series(highs, lows, lookback, width=width, window=window)
+
     @staticmethod
     def _structure_from_pivots(pivot_highs: list[float], pivot_lows: list[float]) -> str:
-        if len(pivot_highs) >= 2 and len(pivot_lows) >= 2:
-            if pivot_highs[-1] > pivot_highs[-2] and pivot_lows[-1] > pivot_lows[-2]:
-                return "HH_HL"
-            if pivot_highs[-1] < pivot_highs[-2] and pivot_lows[-1] < pivot_lows[-2]:
-                return "LH_LL"
-        return "NEUTRA"
+        return structure_label(pivot_highs, pivot_lows)
+
+    def _structure(self, data: dict, suffix: str, lookback: int) -> tuple[str, int]:
+        """Usa a estrutura incremental do snapshot (``pivots15``/``pivots60``) ou reprocessa a janela.
+
+        A do snapshot só vale se foi calculada com o mesmo ``lookback`` (``StructureView.lookback``);
+        com outro (ex.: ``RegimeParams`` ajustados) a janela ``high_series_*`` é reprocessada em O(n).
+        """
+        view = data.get(f"pivots{suffix}")
+        if view is not None and view.lookback == lookback:
+            return view.structure, view.pivot_count
+        pivot_highs, pivot_lows = self._detect_fractal_pivots(
+            data[f"high_series_{suffix}"],
+            data[f"low_series_{suffix}"],
+            lookback=lookback,
+        )
+        return self._structure_from_pivots(pivot_highs, pivot_lows), len(pivot_highs) + len(pivot_lows)
 
     def classify_macro(self, data: dict) -> tuple[str, str, int]:
         adx60 = data["adx60"]
         atr60 = data["atr60"]
         dist_rel = self.ema_distance_relative_atr(data["ema20_60"], data["ema50_60"], atr60)
 
-        pivot_highs, pivot_lows = self._detect_fractal_pivots(
-            data["high_series_60"],
-            data["low_series_60"],
-            lookback=8,
-        )
-        structure60 = self._structure_from_pivots(pivot_highs, pivot_lows)
-        pivot_count60 = len(pivot_highs) + len(pivot_lows)
+        p = self.params
+        structure60, pivot_count60 = self._structure(data, "60", p.macro_lookback)
         ema_aligned_60 = (data["ema20_60"] > data["ema50_60"]) or (data["ema20_60"] < data["ema50_60"])
 
         self._debug(
-            f"Macro60 | ADX60={adx60:.2f} ATR60={atr60:.2f} dist_rel={dist_rel:.4f} "
-            f"structure={structure60} pivots={pivot_count60}"
+            "Macro60 | ADX60=%(adx60).2f ATR60=%(atr60).2f dist_rel=%(dist_rel).4f "
+            "structure=%(structure)s pivots=%(pivots)s",
+            adx60=adx60, atr60=atr60, dist_rel=dist_rel, structure=structure60, pivots=pivot_count60,
         )
 
-        if adx60 > 20 and structure60 in {"HH_HL", "LH_LL"} and ema_aligned_60:
+        if adx60 > p.adx_trend and structure60 in {"HH_HL", "LH_LL"} and ema_aligned_60:
             return "MACRO_TENDENCIA", structure60, pivot_count60
-        if adx60 < 20 or structure60 == "NEUTRA":
+        if adx60 < p.adx_trend or structure60 == "NEUTRA":
             return "MACRO_LATERAL", structure60, pivot_count60
         return "MACRO_TRANSICAO", structure60, pivot_count60
 
@@ -107,39 +213,39 @@ class RegimeDetector:
         atr15 = data["atr15"]
         dist_rel = self.ema_distance_relative_atr(data["ema20"], data["ema50"], atr15)
         slope_rel = self.ema_slope_relative_atr(data["ema20"], data["ema20_15_prev3"], atr15)
-        atr_expansion = data["atr15"] > (data["atr15_mean30"] * 1.10)
+        p = self.params
+        atr_expansion = data["atr15"] > (data["atr15_mean30"] * p.atr_expansion)
 
-        pivot_highs, pivot_lows = self._detect_fractal_pivots(
-            data["high_series_15"],
-            data["low_series_15"],
-            lookback=12,
-        )
-        structure15 = self._structure_from_pivots(pivot_highs, pivot_lows)
-        pivot_count15 = len(pivot_highs) + len(pivot_lows)
+        structure15, pivot_count15 = self._structure(data, "15", p.context15_lookback)
 
         self._debug(
             "Ctx15 | "
-            f"ADX15={adx15:.2f} ATR15={atr15:.2f} ATR15_mean30={data['atr15_mean30']:.2f} "
-            f"dist_rel={dist_rel:.4f} slope_rel={slope_rel:.4f} atr_expansion={atr_expansion} "
-            f"structure={structure15} pivots={pivot_count15}"
+            "ADX15=%(adx15).2f ATR15=%(atr15).2f ATR15_mean30=%(atr15_mean30).2f "
+            "dist_rel=%(dist_rel).4f slope_rel=%(slope_rel).4f atr_expansion=%(atr_expansion)s "
+            "structure=%(structure)s pivots=%(pivots)s",
+            adx15=adx15, atr15=atr15, atr15_mean30=data["atr15_mean30"], dist_rel=dist_rel, slope_rel=slope_rel,
+            atr_expansion=atr_expansion, structure=structure15, pivots=pivot_count15,
         )
 
-        if structure15 in {"HH_HL", "LH_LL"} and adx15 > 25 and dist_rel > 0.2 and abs(slope_rel) > 0.15:
+        if structure15 in {"HH_HL", "LH_LL"} and adx15 > p.adx_strong and dist_rel > p.dist_rel_strong and abs(slope_rel) > p.slope_strong:
             return "TENDENCIA_FORTE", atr_expansion, structure15, pivot_count15, dist_rel
-        if structure15 in {"HH_HL", "LH_LL"} and 20 < adx15 <= 25 and dist_rel > 0.12:
+        if structure15 in {"HH_HL", "LH_LL"} and p.adx_trend < adx15 <= p.adx_strong and dist_rel > p.dist_rel_weak:
             return "TENDENCIA_FRACA", atr_expansion, structure15, pivot_count15, dist_rel
-        if adx15 < 20 and atr_expansion:
+        if adx15 < p.adx_trend and atr_expansion:
             return "LATERAL", atr_expansion, structure15, pivot_count15, dist_rel
-        if adx15 < 18 and data["atr15"] < data["atr15_mean30"]:
+        if adx15 < p.adx_quiet and data["atr15"] < data["atr15_mean30"]:
             return "LATERAL", atr_expansion, structure15, pivot_count15, dist_rel
         return "TRANSICAO", atr_expansion, structure15, pivot_count15, dist_rel
 
-    @staticmethod
-    def _confidence(adx15: float, adx60: float, dist_rel_15: float, dist_rel_60: float, regime: str) -> float:
+    def _confidence(self, adx15: float, adx60: float, dist_rel_15: float, dist_rel_60: float, regime: str) -> float:
+        p = self.params
         if regime == "LATERAL":
-            base = max(0.0, (20 - adx15) / 20)
+            base = max(0.0, (p.adx_trend - adx15) / p.adx_trend)
             return round(min(1.0, 0.5 + base / 2), 3)
-        raw = (min(adx15, 40) / 40) * 0.5 + (min(adx60, 40) / 40) * 0.3 + min(dist_rel_15 + dist_rel_60, 2.0) * 0.1
+        raw = (
+            (min(adx15, p.adx_full) / p.adx_full) * 0.5 + (min(adx60, p.adx_full) / p.adx_full) * 0.3
+            + min(dist_rel_15 + dist_rel_60, 2.0) * 0.1
+        )
         return round(max(0.0, min(1.0, raw)), 3)
 
     def combine(self, macro: str, context15: str) -> str:
@@ -153,6 +259,89 @@ class RegimeDetector:
             return "TENDENCIA_FRACA"
         return "LATERAL"
 
+    @staticmethod
+    def _relative_atr(diff: np.ndarray, atr: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(atr > 0, diff / np.where(atr > 0, atr, 1.0), 0.0)
+
+    def classify_batch(self, columns: Mapping[str, Sequence]) -> RegimeBatch:
+        """Versão vetorizada de ``classify`` sobre colunas (mesmas chaves do snapshot).
+
+        Além dos indicadores (``adx15``, ``adx60``, ``ema20``, ``ema50``, ``ema20_15_prev3``,
+        ``atr15``, ``atr15_mean30``, ``ema20_60``, ``ema50_60``, ``atr60``) espera
+        ``structure15``/``structure60`` (códigos de ``STRUCTURE_CODES`` ou nomes) e
+        ``pivot_count15``/``pivot_count60``, como os de ``structure_history`` (calculados com os
+        lookbacks de ``params``). O resultado é idêntico, candle a candle, ao de ``classify``.
+        """
+        p = self.params
+        col = {k: np.asarray(columns[k], dtype="float64") for k in (
+            "adx15", "adx60", "ema20", "ema50", "ema20_15_prev3", "atr15", "atr15_mean30", "ema20_60", "ema50_60", "atr60"
+        )}
+        adx15, adx60 = col["adx15"], col["adx60"]
+        structure15 = _structure_codes(columns["structure15"])
+        structure60 = _structure_codes(columns["structure60"])
+        trending15 = structure15 != 0
+
+        dist_rel_60 = self._relative_atr(np.abs(col["ema20_60"] - col["ema50_60"]), col["atr60"])
+        aligned60 = (col["ema20_60"] > col["ema50_60"]) | (col["ema20_60"] < col["ema50_60"])
+        macro = np.select(
+            [(adx60 > p.adx_trend) & (structure60 != 0) & aligned60, (adx60 < p.adx_trend) | (structure60 == 0)],
+            ["MACRO_TENDENCIA", "MACRO_LATERAL"],
+            "MACRO_TRANSICAO",
+        )
+
+        dist_rel_15 = self._relative_atr(np.abs(col["ema20"] - col["ema50"]), col["atr15"])
+        slope_rel = self._relative_atr(col["ema20"] - col["ema20_15_prev3"], col["atr15"])
+        atr_expansion = col["atr15"] > (col["atr15_mean30"] * p.atr_expansion)
+        context15 = np.select(
+            [
+                trending15 & (adx15 > p.adx_strong) & (dist_rel_15 > p.dist_rel_strong) & (np.abs(slope_rel) > p.slope_strong),
+                trending15 & (p.adx_trend < adx15) & (adx15 <= p.adx_strong) & (dist_rel_15 > p.dist_rel_weak),
+                (adx15 < p.adx_trend) & atr_expansion,
+                (adx15 < p.adx_quiet) & (col["atr15"] < col["atr15_mean30"]),
+            ],
+            ["TENDENCIA_FORTE", "TENDENCIA_FRACA", "LATERAL", "LATERAL"],
+            "TRANSICAO",
+        )
+
+        regime = np.select(
+            [
+                context15 == "LATERAL",
+                (macro == "MACRO_TRANSICAO") | (context15 == "TRANSICAO"),
+                (macro == "MACRO_TENDENCIA") & (context15 == "TENDENCIA_FORTE"),
+                (context15 == "TENDENCIA_FORTE") | (context15 == "TENDENCIA_FRACA"),
+            ],
+            ["LATERAL", "TRANSICAO", "TENDENCIA_FORTE", "TENDENCIA_FRACA"],
+            "LATERAL",
+        )
+        direction = np.select([col["ema20"] > col["ema50"], col["ema20"] < col["ema50"]], ["COMPRA", "VENDA"], "NEUTRO")
+
+        lateral = _py_min(1.0, 0.5 + _py_max(0.0, (p.adx_trend - adx15) / p.adx_trend) / 2)
+        raw = (
+            (_py_min(adx15, p.adx_full) / p.adx_full) * 0.5 + (_py_min(adx60, p.adx_full) / p.adx_full) * 0.3
+            + _py_min(dist_rel_15 + dist_rel_60, 2.0) * 0.1
+        )
+        confidence = _py_round(np.where(regime == "LATERAL", lateral, _py_max(0.0, _py_min(1.0, raw))), 3)
+
+        damped = (p.adx_trend <= adx15) & (adx15 <= p.adx_strong)
+        if damped.any():
+            confidence[damped] = _py_round(confidence[damped] * 0.9, 3)
+            regime = np.where(damped & ~atr_expansion, "TRANSICAO", regime)
+
+        return RegimeBatch(
+            macro=macro,
+            context15=context15,
+            regime=regime,
+            direction=direction,
+            confidence_score=confidence,
+            structure15=structure_names(structure15),
+            structure60=structure_names(structure60),
+            pivot_count15=np.asarray(columns["pivot_count15"]),
+            pivot_count60=np.asarray(columns["pivot_count60"]),
+            dist_rel_15=dist_rel_15,
+            atr_expansion=atr_expansion,
+        )
+
     def classify(self, data: dict) -> RegimeSignal:
         macro, structure60, pivot_count60 = self.classify_macro(data)
         context15, atr_expansion, structure15, pivot_count15, dist_rel_15 = self.classify_context15(data)
@@ -167,14 +356,16 @@ class RegimeDetector:
         dist_rel_60 = self.ema_distance_relative_atr(data["ema20_60"], data["ema50_60"], data["atr60"])
         confidence_score = self._confidence(data["adx15"], data["adx60"], dist_rel_15, dist_rel_60, regime)
 
-        if 20 <= data["adx15"] <= 25:
+        if self.params.adx_trend <= data["adx15"] <= self.params.adx_strong:
             confidence_score = round(confidence_score * 0.9, 3)
             if not atr_expansion:
                 regime = "TRANSICAO"
 
         self._debug(
-            f"Regime final | macro={macro} context15={context15} regime={regime} direction={direction} "
-            f"confidence={confidence_score:.3f} structure15={structure15} structure60={structure60}"
+            "Regime final | macro=%(macro)s context15=%(context15)s regime=%(regime)s direction=%(direction)s "
+            "confidence=%(confidence).3f structure15=%(structure15)s structure60=%(structure60)s",
+            macro=macro, context15=context15, regime=regime, direction=direction,
+            confidence=confidence_score, structure15=structure15, structure60=structure60,
         )
 
         return RegimeSignal(
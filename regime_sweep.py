@@ -0,0 +1,195 @@
+"""Grid search dos limiares de ``RegimeParams`` em paralelo (``ProcessPoolExecutor``).
+
+As colunas do ``vector_backtest`` (candles parciais, indicadores e buckets) são calculadas
+uma única vez e gravadas como ``.npy`` num diretório de cache; cada worker as abre por
+memmap na inicialização e só refaz, por combinação, a estrutura (se os lookbacks mudarem),
+a classificação, a máscara de entrada e as saídas. O resultado é uma tabela ranqueada
+por expectativa com trades, resultado e drawdown de cada conjunto de parâmetros.
+
+Uso: ``python regime_sweep.py replay/win_2024.npz --grid adx_trend=18,20,22 --grid macro_lookback=8,16``
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields, replace
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from equity_tracker import _profit_factor
+from mt5_replay import Recording, server_epoch
+from regime_detector import RegimeDetector, RegimeParams
+from vector_backtest import load_rates, simulate, snapshot_columns, with_structure
+
+DEFAULT_GRID: dict[str, list] = {
+    "adx_trend": [18.0, 20.0, 22.0],
+    "adx_strong": [23.0, 25.0, 27.0],
+    "slope_strong": [0.10, 0.15, 0.20],
+    "macro_lookback": [8, 16, 24],
+}
+
+_worker: dict = {}
+
+
+def parameter_grid(grid: dict[str, Iterable], base: Optional[RegimeParams] = None) -> list[RegimeParams]:
+    """Produto cartesiano dos valores de ``grid`` aplicado sobre ``base``."""
+    base = base or RegimeParams()
+    names = list(grid)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def trade_stats(pnl_points: np.ndarray) -> dict[str, float]:
+    """Trades, acerto, expectativa, resultado e drawdown máximo (pontos, curva realizada)."""
+    pnl = np.asarray(pnl_points, dtype="float64")
+    if len(pnl) == 0:
+        return {"trades": 0, "win_rate": 0.0, "expectancy": 0.0, "result_points": 0.0, "max_drawdown": 0.0, "profit_factor": 0.0}
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0.0)) - equity
+    gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    return {
+        "trades": len(pnl),
+        "win_rate": float((pnl > 0).mean()),
+        "expectancy": float(pnl.mean()),
+        "result_points": float(equity[-1]),
+        "max_drawdown": float(drawdown.max()),
+        "profit_factor": _profit_factor(float(gains), float(losses)),
+    }
+
+
+def rank(table: pd.DataFrame, sort_by: str = "expectancy", min_trades: int = 1) -> pd.DataFrame:
+    """Ordena por ``sort_by`` (desempate por trades); menos de ``min_trades`` trades vão para o fim."""
+    table = table.assign(_eligible=table["trades"] >= min_trades)
+    table = table.sort_values(["_eligible", sort_by, "trades"], ascending=False, kind="stable")
+    return table.drop(columns="_eligible").reset_index(drop=True)
+
+
+def write_cache(source: Recording | Path | str, cache_dir: str | Path, start=None, end=None, symbol: str = "WIN$") -> Path:
+    """Calcula as colunas uma vez e grava cada uma como ``.npy`` (lidas por memmap nos workers)."""
+    cache = Path(cache_dir)
+    cache.mkdir(parents=True, exist_ok=True)
+    r5, r15, r60 = load_rates(source, symbol)
+    columns = snapshot_columns(r5, r15, r60)
+    times = columns["time"]
+    lo = server_epoch(start) if start is not None else int(times[0])
+    hi = server_epoch(end) if end is not None else int(times[-1])
+    columns["in_range"] = (times >= lo) & (times <= hi)
+    for name, values in columns.items():
+        np.save(cache / f"{name}.npy", values)
+    np.save(cache / "rates15.npy", r15)
+    np.save(cache / "rates60.npy", r60)
+    meta = {
+        "columns": list(columns),
+        "context15_lookback": RegimeDetector.CONTEXT15_LOOKBACK,
+        "macro_lookback": RegimeDetector.MACRO_LOOKBACK,
+    }
+    (cache / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    return cache
+
+
+def _init_worker(cache_dir: str, capital: float, contracts: int) -> None:
+    cache = Path(cache_dir)
+    meta = json.loads((cache / "meta.json").read_text(encoding="utf-8"))
+    columns = {name: np.load(cache / f"{name}.npy", mmap_mode="r") for name in meta["columns"]}
+    _worker.update(
+        columns=columns,
+        in_range=np.asarray(columns.pop("in_range")),
+        r15=np.load(cache / "rates15.npy", mmap_mode="r"),
+        r60=np.load(cache / "rates60.npy", mmap_mode="r"),
+        lookbacks=(meta["context15_lookback"], meta["macro_lookback"]),
+        capital=capital,
+        contracts=contracts,
+    )
+
+
+def _evaluate(params: RegimeParams) -> dict:
+    columns = _worker["columns"]
+    if (params.context15_lookback, params.macro_lookback) != _worker["lookbacks"]:
+        columns = with_structure(columns, _worker["r15"], _worker["r60"], params.context15_lookback, params.macro_lookback)
+    sim = simulate(columns, _worker["in_range"], _worker["capital"], _worker["contracts"], RegimeDetector(params=params))
+    return {**asdict(params), **trade_stats(sim.trades["pnl_points"].to_numpy())}
+
+
+def run_sweep(
+    source: Recording | Path | str,
+    grid: Optional[dict[str, Iterable]] = None,
+    start=None,
+    end=None,
+    symbol: str = "WIN$",
+    capital: float = 10000.0,
+    contracts: int = 5,
+    workers: Optional[int] = None,
+    cache_dir: str | Path | None = None,
+    sort_by: str = "expectancy",
+    min_trades: int = 1,
+) -> pd.DataFrame:
+    """Avalia todas as combinações de ``grid`` e devolve a tabela ordenada por ``sort_by``.
+
+    Conjuntos com menos de ``min_trades`` trades vão para o fim da tabela.
+    """
+    combos = parameter_grid(grid or DEFAULT_GRID)
+    with tempfile.TemporaryDirectory(prefix="regime_sweep_") as scratch:
+        cache = write_cache(source, cache_dir or scratch, start, end, symbol)
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(str(cache), capital, contracts)) as pool:
+            rows = list(pool.map(_evaluate, combos, chunksize=max(1, len(combos) // (4 * workers))))
+    return rank(pd.DataFrame(rows), sort_by, min_trades)
+
+
+def _parse_grid(items: list[str]) -> dict[str, list]:
+    types = {f.name: type(f.default) for f in fields(RegimeParams)}
+    grid: dict[str, list] = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        if name not in types:
+            raise SystemExit(f"Parâmetro desconhecido: {name} (opções: {', '.join(types)})")
+        grid[name] = [types[name](v) for v in values.split(",") if v]
+    return grid
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="arquivo .npz do mt5_replay")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--symbol", default="WIN$")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--contracts", type=int, default=5)
+    parser.add_argument("--grid", action="append", default=[], metavar="NOME=v1,v2", help="valores de um campo de RegimeParams")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--cache", help="diretório das colunas em .npy (padrão: temporário)")
+    parser.add_argument("--sort", default="expectancy")
+    parser.add_argument("--min-trades", type=int, default=1)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="grava a tabela completa em CSV")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = run_sweep(
+        args.recording,
+        _parse_grid(args.grid) or None,
+        args.start,
+        args.end,
+        symbol=args.symbol,
+        capital=args.capital,
+        contracts=args.contracts,
+        workers=args.workers,
+        cache_dir=args.cache,
+        sort_by=args.sort,
+        min_trades=args.min_trades,
+    )
+    if args.out:
+        table.to_csv(args.out, index=False)
+    print(table.head(args.top).to_string())
+    print(f"combinações={len(table)} tempo={time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
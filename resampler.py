@@ -0,0 +1,146 @@
+"""Agregação incremental de candles (M1/M5 → timeframes maiores) alinhada à sessão B3."""
+from __future__ import annotations
+
+from datetime import time
+from typing import Optional
+
+import numpy as np
+
+from bar_cache import BarRingBuffer
+from utils import B3_SESSION_OPEN
+
+
+def _seconds(moment: time) -> int:
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def bucket_start(times, period: int, session_open: time = B3_SESSION_OPEN):
+    """Abertura do candle de ``period`` segundos que contém ``times`` (epoch MT5).
+
+    Os candles são ancorados na abertura da sessão de cada dia, então períodos que não
+    dividem a hora (ex.: 45 min, 2 h) começam no pregão e não à meia-noite.
+    """
+    anchor = times // 86400 * 86400 + _seconds(session_open)
+    return anchor + (times - anchor) // period * period
+
+
+def resample(rates: np.ndarray, period: int, session_open: time = B3_SESSION_OPEN) -> np.ndarray:
+    """Versão em lote (vetorizada) de ``SessionResampler`` para pesquisa/backtest."""
+    if len(rates) == 0:
+        return rates[:0].copy()
+    buckets = bucket_start(rates["time"], period, session_open)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rates)] - 1
+
+    out = np.zeros(len(starts), dtype=rates.dtype)
+    out["time"] = buckets[starts]
+    out["open"] = rates["open"][starts]
+    out["high"] = np.maximum.reduceat(rates["high"], starts)
+    out["low"] = np.minimum.reduceat(rates["low"], starts)
+    out["close"] = rates["close"][ends]
+    for name in ("tick_volume", "real_volume"):
+        if name in rates.dtype.names:
+            out[name] = np.add.reduceat(rates[name], starts)
+    if "spread" in rates.dtype.names:
+        out["spread"] = rates["spread"][ends]
+    return out
+
+
+class SessionResampler:
+    """Mantém os candles de um timeframe derivado a partir do stream do timeframe base.
+
+    Candles base fechados são incorporados uma única vez; o candle base em formação entra
+    apenas no último candle derivado, que é regravado a cada ``update``. ``needs_seed``
+    sinaliza que o histórico base recebido não cobre mais o estado e é preciso semear de novo.
+    """
+
+    def __init__(self, period: int, capacity: int = 300, session_open: time = B3_SESSION_OPEN) -> None:
+        self.period = period
+        self.capacity = capacity
+        self.session_open = session_open
+        self._buffer: Optional[BarRingBuffer] = None
+        self._partial: Optional[np.ndarray] = None
+        self._last_base_time: Optional[int] = None
+        self._first_bucket: Optional[int] = None
+        self.needs_seed = True
+
+    def seed(self, history: np.ndarray) -> None:
+        """Semeia com candles do próprio timeframe; o último (em formação) é rederivado do base."""
+        self._buffer = BarRingBuffer(self.capacity, history.dtype)
+        self._buffer.merge(history[:-1])
+        self._first_bucket = int(history["time"][-1]) if len(history) else None
+        self._partial = None
+        self._last_base_time = None
+        self.needs_seed = False
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        if self._buffer is None or self.needs_seed:
+            return {}
+        marks = [self._last_base_time, self._first_bucket]
+        return {
+            "bars": self._buffer.view().copy(),
+            "partial": self._partial if self._partial is not None else self._buffer.view()[:0].copy(),
+            "marks": np.array([-1 if m is None else m for m in marks], dtype="int64"),
+        }
+
+    def restore(self, arrays: dict[str, np.ndarray]) -> None:
+        bars = arrays["bars"]
+        self._buffer = BarRingBuffer(self.capacity, bars.dtype)
+        self._buffer.merge(bars[-self.capacity:])
+        self._partial = arrays["partial"].copy() if len(arrays["partial"]) else None
+        last_base, first_bucket = (None if m < 0 else int(m) for m in arrays["marks"].tolist())
+        self._last_base_time, self._first_bucket = last_base, first_bucket
+        self.needs_seed = False
+
+    def _bucket(self, epoch: int) -> int:
+        return int(bucket_start(epoch, self.period, self.session_open))
+
+    def _open_row(self, bar: np.void, bucket: int) -> np.ndarray:
+        row = np.zeros(1, dtype=self._buffer.dtype)
+        for name in row.dtype.names:
+            row[name] = bar[name]
+        row["time"] = bucket
+        return row
+
+    def _combine(self, partial: Optional[np.ndarray], bar: np.void) -> np.ndarray:
+        bucket = self._bucket(int(bar["time"]))
+        if partial is None or int(partial["time"][0]) != bucket:
+            return self._open_row(bar, bucket)
+        row = partial.copy()
+        row["high"] = max(float(row["high"][0]), float(bar["high"]))
+        row["low"] = min(float(row["low"][0]), float(bar["low"]))
+        row["close"] = bar["close"]
+        for name in ("tick_volume", "real_volume"):
+            if name in row.dtype.names:
+                row[name] += bar[name]
+        if "spread" in row.dtype.names:
+            row["spread"] = bar["spread"]
+        return row
+
+    def update(self, base: np.ndarray) -> Optional[np.ndarray]:
+        """Incorpora o delta do timeframe base e devolve a view dos candles derivados."""
+        if self._buffer is None or len(base) == 0:
+            return None if self._buffer is None else self._buffer.view()
+
+        times = base["time"]
+        start = 0
+        if self._last_base_time is not None:
+            start = int(np.searchsorted(times, self._last_base_time, side="right"))
+            if start == 0:
+                self.needs_seed = True
+                return self._buffer.view()
+        elif self._first_bucket is not None and int(times[0]) > self._first_bucket:
+            # nenhum candle fechado incorporado desde a semente e o base já começa depois dela
+            self.needs_seed = True
+            return self._buffer.view()
+
+        for i in range(start, len(base) - 1):
+            bar = base[i]
+            if self._first_bucket is not None and self._bucket(int(bar["time"])) < self._first_bucket:
+                continue
+            self._partial = self._combine(self._partial, bar)
+            self._buffer.merge(self._partial)
+            self._last_base_time = int(bar["time"])
+
+        self._buffer.merge(self._combine(self._partial, base[-1]))
+        return self._buffer.view()
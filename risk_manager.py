@@ -21,6 +21,27 @@ REGIME_RISK_MAP = {
 }
 
 
+TRAILING_RULES = ("ema20", "breakeven", "none")
+
+
+@dataclass(frozen=True)
+class ExitParams:
+    """Stop/take/trailing da posição simulada (padrões = regras originais do engine)."""
+
+    stop_atr: float = 1.2  # stop base em múltiplos do ATR15
+    take_r: float = 2.0  # take em múltiplos do stop base
+    take_r_extended: float = 2.5  # take quando as EMAs estão afastadas
+    extended_distance: float = 1.5  # ``ema_distance_atr`` acima do qual vale ``take_r_extended``
+    trailing: str = "ema20"  # breakeven em 1R + EMA20 do 5m | só breakeven | nenhum
+
+    def __post_init__(self) -> None:
+        if self.trailing not in TRAILING_RULES:
+            raise ValueError(f"trailing inválido: {self.trailing!r} (opções: {', '.join(TRAILING_RULES)})")
+
+    def take_multiplier(self, ema_distance_atr: float) -> float:
+        return self.take_r_extended if ema_distance_atr > self.extended_distance else self.take_r
+
+
 @dataclass
 class TradeLevels:
     stop_points: float
@@ -0,0 +1,58 @@
+"""Checkpoint local (npz) do estado de candles/indicadores para retomada rápida."""
+from __future__ import annotations
+
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+STATE_VERSION = 1
+
+Sections = dict[str, dict[str, np.ndarray]]
+
+
+def save_checkpoint(path: str | Path, sections: Sections, meta: Optional[dict] = None) -> None:
+    """Grava ``sections`` (componente → nome → array) de forma atômica (tmp + ``os.replace``).
+
+    Os nomes dos arrays ficam num índice JSON embutido, então chaves com qualquer caractere
+    (símbolos como ``WIN$N``) não dependem das regras de nomes do npz.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays: dict[str, np.ndarray] = {}
+    index = []
+    for section, items in sections.items():
+        for name, arr in items.items():
+            key = f"a{len(index)}"
+            arrays[key] = arr
+            index.append([section, name, key])
+    header = {"version": STATE_VERSION, "meta": meta or {}, "index": index}
+    arrays["__header__"] = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.savez(fh, **arrays)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str | Path) -> Optional[tuple[Sections, dict]]:
+    """Lê um checkpoint; ``None`` se não existir, estiver corrompido ou for de outra versão."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(data["__header__"].tobytes().decode("utf-8"))
+            if header.get("version") != STATE_VERSION:
+                return None
+            sections: Sections = {}
+            for section, name, key in header["index"]:
+                sections.setdefault(section, {})[name] = data[key]
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    return sections, header.get("meta", {})
@@ -0,0 +1,56 @@
+"""Configuração do pytest: os módulos do robô ficam na raiz do repositório."""
+from __future__ import annotations
+
+import sys
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@lru_cache(maxsize=None)
+def _recording(days: int, seed: int, trend: float, symbol: str):
+    import mt5_replay
+    from resampler import resample
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    price, bias, drift = 125_000.0, 0.0, 0.0
+    day = datetime(2024, 5, 6, tzinfo=timezone.utc)
+    while days:
+        if day.weekday() < 5:
+            days -= 1
+            bias = 0.6 * bias + rng.normal(0, trend)
+            for i in range(9 * 12, 18 * 12 + 3):  # 09:00 a 18:10 em M5
+                if i % 24 == 0:
+                    drift = rng.normal(bias, 15)
+                close = round((price + drift + rng.normal(0, 60)) / 5) * 5
+                high = max(price, close) + rng.integers(0, 20) * 5
+                low = min(price, close) - rng.integers(0, 20) * 5
+                rows.append((int(day.timestamp()) + i * 300, price, high, low, close, rng.integers(100, 3000), 5, 0))
+                price = close
+        day += timedelta(days=1)
+    m5 = np.array(rows, dtype=mt5_replay.RATES_DTYPE)
+    recording = mt5_replay.Recording()
+    recording.rates[(symbol, mt5_replay.TIMEFRAME_M5)] = m5
+    recording.rates[(symbol, mt5_replay.TIMEFRAME_M15)] = resample(m5, 900)
+    recording.rates[(symbol, mt5_replay.TIMEFRAME_H1)] = resample(m5, 3600)
+    return recording
+
+
+@pytest.fixture(scope="session")
+def synthetic_recording():
+    """Fábrica de gravações M5/M15/H1 sintéticas (pregões de 09:00 a 18:10 a partir de 06/05/2024).
+
+    ``trend`` controla a persistência do viés diário; com 0 o mercado é um passeio aleatório.
+    """
+    def make(days: int = 10, seed: int = 0, trend: float = 0.0, symbol: str = "WIN$"):
+        return _recording(days, seed, trend, symbol)
+
+    return make
@@ -0,0 +1,117 @@
+"""Backtests sobre gravações: replay pelo ``TradingEngine`` real e paridade do vetorizado com ele."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest  # instala o mt5_replay antes do conector
+import vector_backtest
+from engine import TradingEngine
+from mark_store import MarkStore
+from regime_detector import RegimeDetector, RegimeParams
+from risk_manager import ExitParams
+from trade_journal import TRADE_COLUMNS
+
+ENTRY_MINUTES = (0, 35)
+
+
+@pytest.fixture
+def forced_entries(monkeypatch):
+    """Entradas em horários fixos (com direção definida) nos dois backtests, para exercitar as saídas.
+
+    As condições reais quase não disparam em dados sintéticos; a paridade delas é conferida
+    pelo ``cross_check`` em ``test_cross_check_agrees_with_scalar_path``.
+    """
+    def engine_conditions(self, snapshot, signal):
+        met = signal.direction != "NEUTRO" and snapshot["last_candle_time_5m"].minute in ENTRY_MINUTES
+        return met, "teste"
+
+    def vector_conditions(columns, batch, signal_index):
+        direction = batch.direction[np.maximum(signal_index, 0)]
+        minute = columns["time"] % 3600 // 60
+        return (signal_index >= 0) & (direction != "NEUTRO") & np.isin(minute, ENTRY_MINUTES)
+
+    monkeypatch.setattr(TradingEngine, "_entry_conditions_met", engine_conditions)
+    monkeypatch.setattr(vector_backtest, "entry_conditions", vector_conditions)
+
+
+def replay_trades(reports_dir) -> pd.DataFrame:
+    files = sorted(reports_dir.glob("*/trades_*.csv"))
+    if not files:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+    return pd.concat([pd.read_csv(path) for path in files], ignore_index=True)
+
+
+def test_replay_reports_match_result(synthetic_recording, tmp_path, forced_entries):
+    recording = synthetic_recording(days=10, seed=5, trend=60)
+    result = backtest.run_backtest(recording, start="2024-05-08 09:00", reports_dir=tmp_path, marks=True)
+    trades = replay_trades(tmp_path)
+
+    m5 = recording.rates[("WIN$", 5)]["time"]
+    assert result.bars == int((m5 >= backtest.server_epoch("2024-05-08 09:00")).sum())
+    assert result.trades == len(trades) > 5
+    assert result.result_points == pytest.approx(trades["pnl_points"].sum())
+    assert (trades["timestamp_open"] >= "2024-05-08").all()
+    assert (trades["timestamp_close"] >= trades["timestamp_open"]).all()
+
+    marks = MarkStore(tmp_path / "marks").read()
+    assert 0 < len(marks.time) < result.bars  # uma por abertura M5 com snapshot completo
+    assert (np.diff(marks.time) > 0).all()
+    np.testing.assert_allclose(marks.realized[-1], trades["pnl_reais"].sum(), rtol=1e-6)
+
+
+def test_replay_is_repeatable(synthetic_recording, tmp_path, forced_entries):
+    recording = synthetic_recording(days=9, seed=3, trend=60)
+    first = backtest.run_backtest(recording, reports_dir=tmp_path / "a")
+    second = backtest.run_backtest(recording, reports_dir=tmp_path / "b")
+    assert first.trades > 0
+    assert (first.trades, first.result_points) == (second.trades, second.result_points)
+    pd.testing.assert_frame_equal(replay_trades(tmp_path / "a"), replay_trades(tmp_path / "b"))
+
+
+def test_replay_rejects_empty_range(synthetic_recording, tmp_path):
+    with pytest.raises(ValueError):
+        backtest.run_backtest(synthetic_recording(days=2), start="2025-01-01", reports_dir=tmp_path)
+
+
+@pytest.mark.parametrize(
+    "exit_params",
+    [
+        ExitParams(),
+        ExitParams(stop_atr=0.8, take_r=3.0, take_r_extended=3.0, trailing="breakeven"),
+        ExitParams(stop_atr=1.0, take_r=1.5, extended_distance=0.5, trailing="none"),
+    ],
+    ids=["padrao", "breakeven", "sem-trailing"],
+)
+def test_vector_matches_replay(synthetic_recording, tmp_path, forced_entries, exit_params):
+    recording = synthetic_recording(days=20, seed=5, trend=60)
+    vector = vector_backtest.run_vector_backtest(recording, exit_params=exit_params)
+    replay = backtest.run_backtest(recording, reports_dir=tmp_path, exit_params=exit_params)
+    expected = replay_trades(tmp_path)
+
+    assert len(vector.trades) > 20
+    assert replay.trades == len(vector.trades) == len(expected)
+    assert vector.result_points == pytest.approx(replay.result_points)
+    for column in TRADE_COLUMNS:
+        actual, wanted = vector.trades[column], expected[column]
+        if pd.api.types.is_numeric_dtype(wanted):
+            np.testing.assert_allclose(actual.to_numpy(float), wanted.to_numpy(float), rtol=1e-9, atol=1e-9, err_msg=column)
+        else:
+            assert actual.astype(str).tolist() == wanted.astype(str).tolist(), column
+
+
+@pytest.mark.parametrize(
+    "params",
+    [RegimeParams(), RegimeParams(macro_lookback=40, context15_lookback=30, adx_trend=18, adx_strong=23, slope_strong=0.1)],
+    ids=["padrao", "ajustado"],
+)
+def test_cross_check_agrees_with_scalar_path(synthetic_recording, params):
+    recording = synthetic_recording(days=30, seed=7, trend=60)
+    result = vector_backtest.run_vector_backtest(
+        recording, start="2024-05-20 09:00", cross_check_samples=150, detector=RegimeDetector(params=params)
+    )
+    report = result.cross_check
+    assert report.samples == 150
+    assert report.ok, report.examples
+    assert report.max_feature_error < 1e-9
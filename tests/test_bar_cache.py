@@ -0,0 +1,144 @@
+"""``BarRingBuffer``/``BarCache``: janelas contíguas, delta do MT5, validação na entrada e views sem cópia."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from bar_cache import BarCache, BarRingBuffer, valid_rates
+from mt5_replay import RATES_DTYPE
+from regime_detector import RegimeDetector
+
+
+def make_rates(count: int, start: int = 0, step: int = 300) -> np.ndarray:
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    rates["time"] = start + np.arange(count) * step
+    rates["close"] = 100_000.0 + np.arange(count)
+    rates["open"] = rates["close"] - 5.0
+    rates["high"] = rates["close"] + 10.0
+    rates["low"] = rates["close"] - 10.0
+    return rates
+
+
+class FakeTerminal:
+    """``copy_rates_from_pos`` sobre uma série fixa; ``now`` candles visíveis, o último em formação."""
+
+    def __init__(self, series: np.ndarray, now: int) -> None:
+        self.series = series
+        self.now = now
+        self.counts: list[int] = []
+
+    def __call__(self, symbol: str, timeframe: int, start_pos: int, count: int) -> np.ndarray:
+        self.counts.append(count)
+        return self.series[max(0, self.now - count):self.now].copy()
+
+
+def test_ring_buffer_keeps_last_capacity_bars_contiguous():
+    buf = BarRingBuffer(5, RATES_DTYPE)
+    rates = make_rates(13)
+    for lo in range(0, 13, 3):
+        buf.merge(rates[lo:lo + 3])
+        expected = rates[max(0, min(lo + 3, 13) - 5):min(lo + 3, 13)]
+        np.testing.assert_array_equal(buf.view(), expected)
+    assert len(buf) == 5
+    assert buf.last_time == int(rates["time"][-1])
+    np.testing.assert_array_equal(buf.view(2), rates[-2:])
+
+
+def test_ring_buffer_view_is_read_only_without_copy():
+    buf = BarRingBuffer(4, RATES_DTYPE)
+    buf.merge(make_rates(6))
+    view = buf.view()
+    assert not view.flags.writeable
+    assert np.shares_memory(view, buf._data)
+    with pytest.raises(ValueError):
+        view["close"][0] = 0.0
+
+
+def test_ring_buffer_rewrites_forming_bar_and_ignores_older():
+    buf = BarRingBuffer(4, RATES_DTYPE)
+    rates = make_rates(3)
+    assert buf.merge(rates) == 3
+    forming = rates[-1:].copy()
+    forming["close"] += 50.0
+    assert buf.merge(np.concatenate([rates[:1], forming])) == 0
+    assert len(buf) == 3
+    assert buf.view()["close"][-1] == forming["close"][0]
+    assert buf.view()["close"][0] == rates["close"][0]
+
+
+def test_cache_fetches_only_the_delta():
+    series = make_rates(1000)
+    terminal = FakeTerminal(series, now=400)
+    cache = BarCache(terminal, capacity=300, initial_delta=2)
+    np.testing.assert_array_equal(cache.refresh("WIN$", 5), series[100:400])
+    assert terminal.counts == [300]
+
+    for now in range(401, 420):
+        terminal.now = now
+        np.testing.assert_array_equal(cache.refresh("WIN$", 5), series[now - 300:now])
+    assert terminal.counts[1:] == [2] * 19
+    assert cache.stats.full_reloads == 1
+
+
+def test_cache_widens_fetch_after_a_gap_and_reloads_when_lost():
+    series = make_rates(2000)
+    terminal = FakeTerminal(series, now=400)
+    cache = BarCache(terminal, capacity=300, initial_delta=2)
+    cache.refresh("WIN$", 5)
+
+    terminal.now = 420  # 20 candles sem atualizar: 2 -> 8 -> 32
+    np.testing.assert_array_equal(cache.refresh("WIN$", 5), series[120:420])
+    assert terminal.counts[1:] == [2, 8, 32]
+    assert cache.stats.full_reloads == 1
+
+    terminal.now = 1500  # nada se sobrepõe ao buffer: recarga completa
+    np.testing.assert_array_equal(cache.refresh("WIN$", 5), series[1200:1500])
+    assert cache.stats.full_reloads == 2
+
+
+def test_cache_state_round_trip():
+    series = make_rates(600)
+    cache = BarCache(FakeTerminal(series, now=500), capacity=300)
+    cache.refresh("WIN$", 5)
+    cache.refresh("WIN$", 15)
+
+    restored = BarCache(FakeTerminal(series, now=501), capacity=300)
+    restored.restore_state(cache.export_state())
+    for timeframe in (5, 15):
+        np.testing.assert_array_equal(restored.buffer("WIN$", timeframe).view(), cache.buffer("WIN$", timeframe).view())
+    np.testing.assert_array_equal(restored.refresh("WIN$", 5), series[201:501])
+    assert restored.stats.full_reloads == 0
+
+
+def test_valid_rates_copies_only_when_dropping():
+    rates = make_rates(10)
+    assert valid_rates(rates) is rates
+    rates["low"][3] = np.nan
+    rates["close"][7] = np.inf
+    cleaned = valid_rates(rates)
+    np.testing.assert_array_equal(cleaned["time"], np.delete(rates["time"], [3, 7]))
+
+
+def test_cache_drops_invalid_bars_at_ingest():
+    series = make_rates(400)
+    series["high"][250] = np.nan
+    cache = BarCache(FakeTerminal(series, now=400), capacity=300)
+    view = cache.refresh("WIN$", 5)
+    assert len(view) == 299
+    assert np.isfinite(view["high"]).all()
+
+
+def test_pivots_from_field_views_match_lists():
+    rng = np.random.default_rng(4)
+    rates = make_rates(300)
+    rates["high"] += rng.normal(0, 80, 300).cumsum()
+    rates["low"] = rates["high"] - 20.0 - rng.uniform(0, 40, 300)
+    buf = BarRingBuffer(300, RATES_DTYPE)
+    buf.merge(rates)
+    highs, lows = buf.view()["high"][-120:], buf.view()["low"][-120:]
+    assert np.shares_memory(highs, buf._data)
+    for lookback in (20, 60, 120):
+        from_views = RegimeDetector._detect_fractal_pivots(highs, lows, lookback)
+        from_lists = RegimeDetector._detect_fractal_pivots(highs.tolist(), lows.tolist(), lookback)
+        assert from_views == from_lists
+    assert RegimeDetector._detect_fractal_pivots(highs[:0], lows[:0], 20) == ([], [])
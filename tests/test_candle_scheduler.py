@@ -0,0 +1,93 @@
+"""``CandleScheduler`` sobre o relógio da replay: espera do limite, calibração, timeout e parada."""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from candle_scheduler import CandleScheduler
+from mt5_replay import ReplayClock, server_epoch
+
+START = "2024-05-07 10:02:10"
+
+
+@pytest.fixture
+def clock():
+    return ReplayClock(START)
+
+
+def bar_source(clock: ReplayClock, boundary: int, appears_at: float, server_lag: float = 0.0):
+    """Último candle M5 visto pelo servidor: o novo surge ``appears_at`` s após o limite (horário do servidor)."""
+    def last_bar_time():
+        server_now = clock.time() - server_lag
+        return boundary if server_now >= boundary + appears_at else boundary - 300
+
+    return last_bar_time
+
+
+def test_sleeps_until_boundary_and_polls_briefly(clock):
+    scheduler = CandleScheduler(clock)
+    boundary = scheduler.next_boundary()
+    assert boundary == server_epoch("2024-05-07 10:05")
+
+    assert scheduler.wait_for_bar(boundary, bar_source(clock, boundary, 0.2), threading.Event()) == boundary
+    assert boundary + 0.2 <= clock.time() <= boundary + 0.2 + scheduler.poll_interval
+    assert 1 < scheduler.stats.polls <= (scheduler.lead + 0.2) / scheduler.poll_interval + 2  # acordou ``lead`` s antes
+    assert scheduler.stats.timeouts == 0
+    assert scheduler.offset == pytest.approx(boundary - clock.time())  # atraso de publicação absorvido
+
+
+def test_calibrate_uses_measured_offset(clock):
+    scheduler = CandleScheduler(clock)
+    scheduler.calibrate(clock.time() + 12)
+    assert scheduler.offset == pytest.approx(12)
+    scheduler.calibrate(clock.time() - 30)
+    assert scheduler.offset == pytest.approx(-30)
+    scheduler.calibrate(None)
+    assert scheduler.offset == pytest.approx(-30)
+
+
+def test_negative_offset_moves_the_wakeup(clock):
+    """Servidor 30 s atrás do relógio local: sem aprender o offset negativo daria timeout."""
+    scheduler = CandleScheduler(clock)
+    scheduler.calibrate(clock.time() - 30)
+    boundary = scheduler.next_boundary()
+    assert boundary == server_epoch("2024-05-07 10:05")
+
+    last_bar_time = bar_source(clock, boundary, 0.1, server_lag=30)
+    assert scheduler.wait_for_bar(boundary, last_bar_time, threading.Event()) == boundary
+    assert scheduler.stats.timeouts == 0
+    assert clock.time() == pytest.approx(boundary + 30.1, abs=scheduler.poll_interval)
+
+
+def test_timeout_returns_none(clock):
+    scheduler = CandleScheduler(clock, poll_timeout=20.0)
+    boundary = scheduler.next_boundary()
+    assert scheduler.wait_for_bar(boundary, lambda: boundary - 300, threading.Event()) is None
+    assert scheduler.stats.timeouts == 1
+    assert boundary + 20.0 <= clock.time() <= boundary + 20.0 + scheduler.max_poll_interval
+    assert scheduler.stats.polls < 50  # consultas espaçadas depois do primeiro segundo
+
+
+def test_stop_event_interrupts_sleep_and_polling(clock):
+    scheduler = CandleScheduler(clock)
+    boundary = scheduler.next_boundary()
+    stop_event = threading.Event()
+    stop_event.set()
+    before = clock.time()
+    assert scheduler.wait_for_bar(boundary, lambda: boundary, stop_event) is None
+    assert clock.time() == before
+    assert scheduler.stats.polls == 0
+
+    stop_event.clear()
+    calls = []
+
+    def last_bar_time():
+        calls.append(clock.time())
+        if len(calls) == 3:
+            stop_event.set()
+        return boundary - 300
+
+    assert scheduler.wait_for_bar(boundary, last_bar_time, stop_event) is None
+    assert len(calls) == 3
+    assert scheduler.stats.timeouts == 0
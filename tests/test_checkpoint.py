@@ -0,0 +1,93 @@
+"""Checkpoint do ``MT5Connector``: retomada com o mesmo snapshot sem recarregar o histórico."""
+from __future__ import annotations
+
+import logging
+from numbers import Real
+
+import numpy as np
+import pytest
+
+import mt5_replay
+
+mt5_replay.install()
+
+from mt5_connector import MT5Connector  # noqa: E402  (precisa ver o mt5_replay instalado acima)
+from state_store import load_checkpoint, save_checkpoint  # noqa: E402
+
+logger = logging.getLogger("test_checkpoint")
+
+
+def assert_same_snapshot(expected: dict, actual: dict) -> None:
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray) or (isinstance(value, Real) and not isinstance(value, bool)):
+            np.testing.assert_allclose(actual[key], value, rtol=1e-12, atol=1e-9, err_msg=key)
+        else:
+            assert actual[key] == value, key
+
+
+def connect(derive_from, path, counter=None) -> MT5Connector:
+    connector = MT5Connector(logger, derive_from=derive_from, state_path=path)
+    if counter is not None:
+        fetch = connector._bar_cache._fetch
+
+        def counted(*args):
+            counter.append(args[-1])
+            return fetch(*args)
+
+        connector._bar_cache._fetch = counted
+    assert connector.connect(1, "x", "Replay")
+    return connector
+
+
+@pytest.mark.parametrize("derive_from", [None, mt5_replay.TIMEFRAME_M5])
+def test_restart_resumes_from_checkpoint(synthetic_recording, tmp_path, derive_from):
+    session = mt5_replay.load(synthetic_recording(days=14), start="2024-05-23 09:30")
+    path = tmp_path / "state.npz"
+    running = connect(derive_from, path)
+    for _ in range(12):
+        running.build_market_snapshot("WIN$")
+        session.clock.advance(300)
+    running.build_market_snapshot("WIN$")
+    assert running.checkpoint()
+
+    session.clock.advance(1800)  # 30 min desligado
+    fetched: list[int] = []
+    restarted = connect(derive_from, path, fetched)
+    snapshot = restarted.build_market_snapshot("WIN$")
+    assert_same_snapshot(running.build_market_snapshot("WIN$"), snapshot)
+    assert restarted._bar_cache.stats.full_reloads == 0
+    assert fetched and max(fetched) < restarted._bar_cache.capacity  # só o delta desde o checkpoint
+
+
+def test_checkpoint_with_other_config_is_ignored(synthetic_recording, tmp_path):
+    session = mt5_replay.load(synthetic_recording(days=14), start="2024-05-23 09:30")
+    path = tmp_path / "state.npz"
+    running = connect(None, path)
+    running.build_market_snapshot("WIN$")
+    assert running.checkpoint()
+
+    session.clock.advance(300)
+    restarted = connect(mt5_replay.TIMEFRAME_M5, path)
+    restarted.build_market_snapshot("WIN$")
+    assert restarted._bar_cache.stats.full_reloads == 1
+
+
+def test_state_store_round_trip_and_corruption(tmp_path):
+    path = tmp_path / "nested" / "state.npz"
+    sections = {
+        "bars": {"WIN$N|5": np.arange(6, dtype="int64"), "WIN$N|15": np.zeros(0)},
+        "indicators": {"WIN$N|5|ema": np.linspace(0, 1, 4)},
+    }
+    save_checkpoint(path, sections, {"capacity": 300})
+    loaded, meta = load_checkpoint(path)
+    assert meta == {"capacity": 300}
+    assert loaded.keys() == sections.keys()
+    for section, items in sections.items():
+        for name, arr in items.items():
+            np.testing.assert_array_equal(loaded[section][name], arr)
+    assert not path.with_name(path.name + ".tmp").exists()
+
+    path.write_bytes(path.read_bytes()[:40])
+    assert load_checkpoint(path) is None
+    assert load_checkpoint(tmp_path / "missing.npz") is None
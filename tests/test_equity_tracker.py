@@ -0,0 +1,92 @@
+"""``EquityTracker``: métricas O(1) contra uma recomputação NumPy/pandas da série inteira."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from equity_tracker import EquityTracker, _profit_factor
+from utils import B3_TZ
+
+TRADES = 2500
+CAPACITY = 1000
+MAX_MONTHS = 120
+
+
+@pytest.fixture(scope="module")
+def series():
+    """Resultado por trade (com zeros) a cada 2 dias desde 2012: ~165 meses."""
+    rng = np.random.default_rng(17)
+    pnl = np.round(rng.normal(3.0, 45.0, TRADES), 2)
+    pnl[rng.random(TRADES) < 0.05] = 0.0
+    start = datetime(2012, 1, 2, 10, 30, tzinfo=B3_TZ)
+    times = [start + timedelta(days=2 * i, minutes=int(m)) for i, m in enumerate(rng.integers(0, 400, TRADES))]
+    return pnl, times
+
+
+@pytest.fixture(scope="module")
+def tracker(series):
+    pnl, times = series
+    tracker = EquityTracker(capacity=CAPACITY, max_months=MAX_MONTHS)
+    equity = np.cumsum(pnl)
+    for i, (value, when) in enumerate(zip(equity.tolist(), times)):
+        tracker.add(value, i + 1, value, timestamp=when)
+    return tracker
+
+
+def test_stats_match_full_recomputation(series, tracker):
+    pnl, times = series
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.r_[0.0, equity])[1:]
+    at_peak = np.flatnonzero(equity >= peak)
+    since_peak = np.arange(TRADES) - np.maximum.accumulate(np.where(equity >= peak, np.arange(TRADES), -1))
+    stdev = pnl.std(ddof=1)
+    downside = np.sqrt(np.mean(np.minimum(pnl, 0.0) ** 2))
+
+    stats = tracker.stats()
+    assert stats.trades == TRADES
+    assert stats.equity == pytest.approx(equity[-1])
+    assert stats.peak == pytest.approx(peak[-1])
+    assert stats.drawdown == pytest.approx(peak[-1] - equity[-1])
+    assert stats.max_drawdown == pytest.approx((peak - equity).max())
+    assert stats.drawdown_trades == TRADES - 1 - at_peak[-1]
+    assert stats.max_drawdown_trades == since_peak.max()
+    assert stats.drawdown_since == (times[at_peak[-1]] if stats.drawdown_trades else None)
+    assert stats.win_rate == pytest.approx((pnl > 0).mean())
+    assert stats.profit_factor == pytest.approx(pnl[pnl > 0].sum() / -pnl[pnl < 0].sum())
+    assert stats.expectancy == pytest.approx(pnl.mean(), rel=1e-9)
+    assert stats.stdev == pytest.approx(stdev, rel=1e-9)  # Welford contra a fórmula de duas passadas
+    assert stats.sharpe == pytest.approx(pnl.mean() / stdev, rel=1e-9)
+    assert stats.sortino == pytest.approx(pnl.mean() / downside, rel=1e-9)
+    assert stats.updated_at == times[-1]
+
+
+def test_ring_buffer_keeps_last_capacity_points(series, tracker):
+    pnl, times = series
+    history = tracker.history
+    assert len(history) == CAPACITY
+    np.testing.assert_allclose([p.equity_reais for p in history], np.cumsum(pnl)[-CAPACITY:])
+    assert [p.timestamp for p in history] == times[-CAPACITY:]
+    assert history[-1].expectancy_reais == pytest.approx(np.cumsum(pnl)[-1] / TRADES)
+
+
+def test_months_match_groupby_and_are_capped(series, tracker):
+    pnl, times = series
+    equity = np.cumsum(pnl)
+    frame = pd.DataFrame({"month": [t.strftime("%Y-%m") for t in times], "pnl": pnl, "equity": equity, "before": equity - pnl})
+    groups = list(frame.groupby("month", sort=True))
+    assert len(groups) > MAX_MONTHS
+    assert list(tracker.months) == [month for month, _ in groups[-MAX_MONTHS:]]
+
+    for month, rows in groups[-MAX_MONTHS:]:
+        stats = tracker.months[month]
+        start = rows["before"].iloc[0]
+        month_peak = np.maximum.accumulate(np.r_[start, rows["equity"].to_numpy()])[1:]
+        assert stats.equity_start == pytest.approx(start)
+        assert stats.equity_end == pytest.approx(rows["equity"].iloc[-1])
+        assert (stats.trades, stats.wins) == (len(rows), int((rows["pnl"] > 0).sum()))
+        gains, losses = rows["pnl"].clip(lower=0).sum(), -rows["pnl"].clip(upper=0).sum()
+        assert stats.profit_factor == pytest.approx(_profit_factor(gains, losses))
+        assert stats.max_drawdown == pytest.approx((month_peak - rows["equity"].to_numpy()).max())
@@ -0,0 +1,121 @@
+"""``IndicatorEngine``: recorrências O(1) iguais ao ``ewm(adjust=False)`` do pandas sobre o histórico visto.
+
+Tolerância: ``rtol=1e-9`` (as recorrências acumulam só erro de arredondamento, ~1e-13 na
+prática). Depois da semente, o estado carrega todo o histórico incorporado e não o recálculo
+sobre a janela de 300 candles; esse desvio (peso residual do início da janela) é conferido à parte.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from bench_indicators import synthetic_bars
+from indicator_engine import IndicatorEngine, TimeframeIndicators
+
+WINDOW = 300
+RTOL = 1e-9
+
+
+@pytest.fixture(scope="module")
+def bars():
+    df = synthetic_bars(1500)
+    high, low, close = (df[col].to_numpy().copy() for col in ("high", "low", "close"))
+    high[400:420] = low[400:420] = close[400:420] = close[400]  # candles sem range nem DM
+    return np.arange(len(close), dtype="int64") * 900, high, low, close
+
+
+def pandas_reference(high, low, close, period: int = 14) -> dict[str, float]:
+    """EMA/ATR/ADX de Wilder com ``Series.ewm(adjust=False)`` sobre toda a série (último candle incluso)."""
+    h, l, c = pd.Series(high), pd.Series(low), pd.Series(close)
+    wilder = {"alpha": 1 / period, "adjust": False}
+    prev_close = c.shift()
+    tr = pd.concat([h - l, (h - prev_close).abs(), (l - prev_close).abs()], axis=1).max(axis=1)
+    atr = tr.ewm(**wilder).mean()
+    up, down = h.diff(), -l.diff()
+    plus_dm = up.where((up > down) & (up > 0))
+    minus_dm = down.where((down > up) & (down > 0))
+    atr_di = atr.replace(0, np.nan)
+    plus_di = 100 * plus_dm.ewm(**wilder).mean() / atr_di
+    minus_di = 100 * minus_dm.ewm(**wilder).mean() / atr_di
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)
+    ema20 = c.ewm(span=20, adjust=False).mean()
+    atr_filled = atr.fillna(0.0)
+    return {
+        "ema20": ema20.iloc[-1],
+        "ema20_prev3": ema20.iloc[-4] if len(c) >= 4 else np.nan,
+        "ema50": c.ewm(span=50, adjust=False).mean().iloc[-1],
+        "atr14": atr_filled.iloc[-1],
+        "atr14_prev": atr_filled.iloc[-2] if len(c) >= 2 else np.nan,
+        "atr14_mean30": atr_filled.iloc[-30:].mean(),
+        "adx14": np.nan_to_num(dx.ewm(**wilder).mean().iloc[-1], nan=0.0),
+    }
+
+
+def assert_matches(values, high, low, close, rtol=RTOL):
+    for name, value in pandas_reference(high, low, close).items():
+        np.testing.assert_allclose(getattr(values, name), value, rtol=rtol, atol=1e-9, err_msg=name)
+
+
+def test_streaming_matches_pandas_over_seen_history(bars):
+    times, high, low, close = bars
+    engine = IndicatorEngine()
+    for end in range(2, len(close)):
+        start = max(0, end - WINDOW)
+        values = engine.update("WIN$", 15, times[start:end], high[start:end], low[start:end], close[start:end])
+        if end % 7 == 0 or end < 40:
+            assert_matches(values, high[:end], low[:end], close[:end])
+
+
+def test_window_recompute_differs_only_by_residual_weight(bars):
+    """Contra o recálculo sobre a janela o desvio é o peso do início: (13/14)^299 ~ 2e-10 no ATR."""
+    times, high, low, close = bars
+    engine = IndicatorEngine()
+    for end in range(2, 1200):
+        start = max(0, end - WINDOW)
+        values = engine.update("WIN$", 15, times[start:end], high[start:end], low[start:end], close[start:end])
+    window = slice(1200 - WINDOW, 1200 - 1)
+    np.testing.assert_allclose(values.atr14, indicators.wilder_atr(high[window], low[window], close[window])[-1], rtol=1e-7)
+    np.testing.assert_allclose(values.ema20, indicators.ema(close[window], 20)[-1], rtol=1e-12)
+
+
+def test_forming_bar_is_peeked_without_committing(bars):
+    times, high, low, close = bars
+    engine = IndicatorEngine()
+    window = slice(500, 800)
+    engine.update("WIN$", 15, times[window], high[window], low[window], close[window])
+    state = engine.state("WIN$", 15)
+    committed = state.to_arrays()
+    partial_high, partial_low, partial_close = high[window].copy(), low[window].copy(), close[window].copy()
+    partial_high[-1] += 500
+    partial_close[-1] += 300
+    values = engine.update("WIN$", 15, times[window], partial_high, partial_low, partial_close)
+    assert engine.state("WIN$", 15) is state
+    for name, arr in state.to_arrays().items():
+        np.testing.assert_array_equal(arr, committed[name])
+    assert_matches(values, partial_high, partial_low, partial_close)
+
+
+def test_gap_reseeds_from_window_and_restore_resumes(bars):
+    times, high, low, close = bars
+    engine = IndicatorEngine()
+    engine.update("WIN$", 15, times[:300], high[:300], low[:300], close[:300])
+    window = slice(900, 1200)  # lacuna maior que a janela: semeia de novo com a janela
+    assert_matches(engine.update("WIN$", 15, times[window], high[window], low[window], close[window]), high[window], low[window], close[window])
+
+    restored = IndicatorEngine()
+    restored.restore_state(engine.export_state())
+    window = slice(905, 1205)  # retomada do checkpoint: só os candles novos entram
+    expected = engine.update("WIN$", 15, times[window], high[window], low[window], close[window])
+    assert restored.update("WIN$", 15, times[window], high[window], low[window], close[window]) == expected
+    assert_matches(expected, high[900:1205], low[900:1205], close[900:1205])
+
+
+def test_checkpoint_arrays_round_trip(bars):
+    times, high, low, close = bars
+    engine = IndicatorEngine()
+    engine.update("WIN$", 15, times[:300], high[:300], low[:300], close[:300])
+    state = engine.state("WIN$", 15)
+    copy = TimeframeIndicators.from_arrays(state.to_arrays())
+    assert copy.peek(high[299], low[299], close[299]) == state.peek(high[299], low[299], close[299])
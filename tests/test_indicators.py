@@ -0,0 +1,51 @@
+"""Paridade dos kernels de ``indicators`` com as expressões pandas originais."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from bench_indicators import cases, synthetic_bars
+
+
+@pytest.mark.parametrize("bars", [1, 2, 15, 300, 5000])
+@pytest.mark.parametrize("name", list(cases(synthetic_bars(2))))
+def test_kernel_matches_pandas(bars, name):
+    ref, fast = cases(synthetic_bars(bars))[name]
+    np.testing.assert_allclose(fast(), ref().to_numpy(dtype="float64"), rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("length", [10, indicators._EWM_EXACT_MAX + 500])
+def test_ewm_mean_ignores_nan_like_pandas(length):
+    rng = np.random.default_rng(3)
+    values = rng.normal(0, 1, length)
+    values[rng.random(length) < 0.05] = np.nan
+    values[:3] = np.nan
+    alpha = indicators.ewm_alpha(span=20)
+    expected = pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(indicators.ewm_mean(values, alpha), expected, rtol=1e-12)
+
+
+def test_ewm_mean_long_clean_tail_uses_blocks():
+    values = synthetic_bars(indicators._EWM_EXACT_MAX * 3)["close"].to_numpy()
+    expected = pd.Series(values).ewm(span=50, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(indicators.ema(values, 50), expected, rtol=1e-13)
+
+
+def test_ewm_mean_writes_into_out():
+    values = np.arange(10, dtype="float64")
+    out = np.empty(10)
+    result = indicators.ewm_mean(values, 0.5, out=out)
+    assert result is out
+    np.testing.assert_allclose(out, pd.Series(values).ewm(alpha=0.5, adjust=False).mean().to_numpy())
+
+
+def test_rolling_shorter_than_window_is_all_nan():
+    assert np.isnan(indicators.rolling_mean(np.arange(3.0), 5)).all()
+
+
+def test_dmi_flat_market_has_zero_adx():
+    flat = np.full(50, 100.0)
+    result = indicators.dmi(flat, flat, flat)
+    np.testing.assert_array_equal(result.adx, np.zeros(50))
@@ -0,0 +1,112 @@
+"""``MarkStore``: colunas por mês, leitura por faixa de datas e reabertura de um diretório existente."""
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from mark_store import MarkStore
+from mt5_replay import server_epoch
+from utils import B3_TZ, to_epoch
+
+STEP = 6 * 3600
+
+
+@pytest.fixture
+def marks():
+    """Marcas de 6 em 6 horas de 20/04 a 10/06/2024 (três meses)."""
+    times = np.arange(server_epoch("2024-04-20 09:00"), server_epoch("2024-06-10 18:00"), STEP, dtype="int64")
+    rng = np.random.default_rng(3)
+    realized = rng.normal(0, 50, len(times)).cumsum().astype("float32")
+    unrealized = rng.normal(0, 20, len(times)).astype("float32")
+    return times, realized, unrealized
+
+
+def fill(store: MarkStore, times, realized, unrealized) -> None:
+    for t, r, u in zip(times.tolist(), realized.tolist(), unrealized.tolist()):
+        store.record(t, r, u)
+
+
+def months_after(times: np.ndarray, month: str) -> np.ndarray:
+    return times.astype("datetime64[s]").astype("datetime64[M]") > np.datetime64(month)
+
+
+def test_flush_partitions_by_month(tmp_path, marks):
+    times, realized, unrealized = marks
+    store = MarkStore(tmp_path, flush_every=50)
+    fill(store, *marks)
+    assert store.written == len(times) // 50 * 50 and len(store) == len(times) % 50
+    store.close()
+
+    assert store.months() == ["2024-04", "2024-05", "2024-06"]
+    months = times.astype("datetime64[s]").astype("datetime64[M]").astype(str)
+    for month in store.months():
+        on_disk = np.fromfile(tmp_path / month / "time.i64", dtype="int64")
+        np.testing.assert_array_equal(on_disk, times[months == month])
+        assert (tmp_path / month / "realized.f32").stat().st_size == 4 * len(on_disk)
+
+
+@pytest.mark.parametrize(
+    ("date_from", "date_to"),
+    [
+        ("2024-05-10", "2024-05-20 12:00"),
+        (date(2024, 4, 30), date(2024, 5, 1)),
+        (datetime(2024, 5, 31, 18, 0, tzinfo=B3_TZ), None),  # fuso ignorado: horário do servidor
+        (None, server_epoch("2024-04-25 03:00")),
+        ("2024-07-01", "2024-07-31"),
+    ],
+)
+def test_read_filters_range_including_buffer(tmp_path, marks, date_from, date_to):
+    times, realized, unrealized = marks
+    store = MarkStore(tmp_path, flush_every=40)
+    fill(store, *marks)  # parte ainda no buffer
+    lo = -(2**62) if date_from is None else to_epoch(date_from)
+    hi = 2**62 if date_to is None else to_epoch(date_to)
+    inside = (times >= lo) & (times <= hi)
+
+    got = store.read(date_from, date_to)
+    np.testing.assert_array_equal(got.time, times[inside])
+    np.testing.assert_array_equal(got.realized, realized[inside])
+    np.testing.assert_array_equal(got.equity, realized[inside].astype("float64") + unrealized[inside])
+
+
+def test_reopen_appends_and_overwrite_replaces(tmp_path, marks):
+    times, realized, unrealized = marks
+    half = len(times) // 2
+    first = MarkStore(tmp_path, flush_every=30)
+    fill(first, times[:half], realized[:half], unrealized[:half])
+    first.close()
+
+    reopened = MarkStore(tmp_path, flush_every=30)
+    np.testing.assert_array_equal(reopened.read().time, times[:half])
+    fill(reopened, times[half:], realized[half:], unrealized[half:])
+    reopened.close()
+    full = MarkStore(tmp_path).read()
+    np.testing.assert_array_equal(full.time, times)
+    np.testing.assert_array_equal(full.unrealized, unrealized)
+
+    rerun = MarkStore(tmp_path, flush_every=30)  # mesmo período reprocessado sem ``overwrite``
+    fill(rerun, times[:10], realized[:10] + 1, unrealized[:10])
+    rerun.close()
+    again = MarkStore(tmp_path).read()
+    np.testing.assert_array_equal(again.time, times)  # horários repetidos ficam com a última marca
+    np.testing.assert_array_equal(again.realized[:10], realized[:10] + 1)
+
+    replaced = MarkStore(tmp_path, overwrite=True)
+    fill(replaced, times[:10], realized[:10], unrealized[:10])
+    replaced.close()
+    np.testing.assert_array_equal(MarkStore(tmp_path).read().time, np.concatenate([times[:10], times[months_after(times, "2024-04")]]))
+
+
+def test_torn_flush_is_trimmed_on_read(tmp_path, marks):
+    store = MarkStore(tmp_path, flush_every=25)
+    fill(store, *marks)
+    store.close()
+    month = store.months()[-1]
+    path = tmp_path / month / "realized.f32"
+    path.write_bytes(path.read_bytes()[:-6])  # queda no meio do flush
+
+    got = MarkStore(tmp_path).read(f"{month}-01")
+    assert len(got.time) == len(got.realized) == len(got.unrealized)
+    assert len(got.time) == path.stat().st_size // 4
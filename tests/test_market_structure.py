@@ -0,0 +1,90 @@
+"""Estrutura incremental (``StructureEngine``) contra o reprocessamento de ``RegimeDetector._structure``."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from market_structure import StructureEngine, StructureView, structure_names, structure_series
+from mt5_replay import TIMEFRAME_H1, TIMEFRAME_M15
+from regime_detector import RegimeDetector
+
+WINDOW = 300  # capacidade do cache de candles
+SERIES = 120  # recorte ``high_series_*`` do snapshot
+
+
+@pytest.mark.parametrize(
+    ("timeframe", "suffix", "lookback"),
+    [
+        (TIMEFRAME_M15, "15", RegimeDetector.CONTEXT15_LOOKBACK),
+        (TIMEFRAME_H1, "60", RegimeDetector.MACRO_LOOKBACK),
+        (TIMEFRAME_M15, "15", 37),
+    ],
+    ids=["m15", "h1", "m15-lookback37"],
+)
+def test_incremental_matches_detector_scan(synthetic_recording, timeframe, suffix, lookback):
+    rates = synthetic_recording(days=30, seed=4, trend=40).rates[("WIN$", timeframe)]
+    detector = RegimeDetector()
+    engine = StructureEngine()
+    rng = np.random.default_rng(1)
+    checked = 0
+    for end in range(2, len(rates) + 1):
+        window = rates[max(0, end - WINDOW):end].copy()
+        if rng.random() < 0.5:  # candle em formação recém-aberto: o pivô tentativo muda
+            window[-1]["high"] = window[-1]["low"] = window[-1]["open"]
+        view = engine.update("WIN$", timeframe, window["time"], window["high"], window["low"], lookback)
+
+        data = {f"high_series_{suffix}": window["high"][-SERIES:], f"low_series_{suffix}": window["low"][-SERIES:]}
+        assert (view.structure, view.pivot_count) == detector._structure(data, suffix, lookback)
+        highs, lows = detector._detect_fractal_pivots(data[f"high_series_{suffix}"], data[f"low_series_{suffix}"], lookback)
+        assert (view.pivot_highs, view.pivot_lows) == (highs, lows)
+        checked += view.pivot_count >= 2
+    assert checked > 0
+
+
+def test_batch_series_matches_incremental(synthetic_recording):
+    rates = synthetic_recording(days=20, seed=2, trend=40).rates[("WIN$", TIMEFRAME_M15)]
+    lookback = RegimeDetector.CONTEXT15_LOOKBACK
+    batch = structure_series(rates["high"], rates["low"], lookback)
+    names = structure_names(batch.structure)
+    engine = StructureEngine()
+    for end in range(1, len(rates) + 1):
+        window = rates[max(0, end - WINDOW):end]
+        view = engine.update("WIN$", TIMEFRAME_M15, window["time"], window["high"], window["low"], lookback)
+        assert (view.structure, view.pivot_count) == (names[end - 1], batch.pivot_count[end - 1])
+
+
+def test_gap_and_restore_resume_the_same_pivots(synthetic_recording):
+    rates = synthetic_recording(days=20, seed=2, trend=40).rates[("WIN$", TIMEFRAME_M15)]
+    lookback = RegimeDetector.CONTEXT15_LOOKBACK
+    engine = StructureEngine()
+    for end in range(250, 400):
+        engine.update("WIN$", TIMEFRAME_M15, rates["time"][:end][-WINDOW:], rates["high"][:end][-WINDOW:], rates["low"][:end][-WINDOW:], lookback)
+
+    restored = StructureEngine()
+    restored.restore_state(engine.export_state())
+    window = rates[405 - WINDOW:405]
+    expected = engine.update("WIN$", TIMEFRAME_M15, window["time"], window["high"], window["low"], lookback)
+    assert restored.update("WIN$", TIMEFRAME_M15, window["time"], window["high"], window["low"], lookback) == expected
+
+    window = rates[len(rates) - WINDOW:]  # lacuna maior que a janela: tracker novo sobre a janela
+    view = engine.update("WIN$", TIMEFRAME_M15, window["time"], window["high"], window["low"], lookback)
+    data = {"high_series_15": window["high"][-SERIES:], "low_series_15": window["low"][-SERIES:]}
+    assert (view.structure, view.pivot_count) == RegimeDetector()._structure(data, "15", lookback)
+
+
+@pytest.mark.parametrize("lookback", [RegimeDetector.CONTEXT15_LOOKBACK, 37])
+def test_snapshot_pivots_are_keyed_by_lookback(synthetic_recording, lookback):
+    """O ``pivots15`` do snapshot só é usado se tiver o mesmo lookback; senão a janela é reprocessada."""
+    rates = synthetic_recording(days=10, seed=4, trend=40).rates[("WIN$", TIMEFRAME_M15)]
+    window = rates[-WINDOW:]
+    data = {"high_series_15": window["high"][-SERIES:], "low_series_15": window["low"][-SERIES:]}
+    detector = RegimeDetector()
+    scanned = detector._structure(data, "15", lookback)
+
+    data["pivots15"] = StructureView("LH_LL", 99, [], [], RegimeDetector.CONTEXT15_LOOKBACK)  # marcador
+    precomputed = lookback == RegimeDetector.CONTEXT15_LOOKBACK
+    assert detector._structure(data, "15", lookback) == (("LH_LL", 99) if precomputed else scanned)
+
+    engine = StructureEngine()
+    data["pivots15"] = engine.update("WIN$", TIMEFRAME_M15, window["time"], window["high"], window["low"], lookback)
+    assert detector._structure(data, "15", lookback) == scanned
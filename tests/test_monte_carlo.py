@@ -0,0 +1,78 @@
+"""``run_monte_carlo``: formatos, percentis e ruína contra uma recomputação direta com a mesma semente."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monte_carlo import run_monte_carlo
+
+PATHS = 3000
+
+
+@pytest.fixture(scope="module")
+def trades() -> pd.DataFrame:
+    rng = np.random.default_rng(21)
+    count = 120
+    days = pd.bdate_range("2024-03-04", periods=40).strftime("%Y-%m-%d")
+    return pd.DataFrame(
+        {
+            "timestamp_close": [f"{days[i // 3]}T11:{i % 3:02d}:00-03:00" for i in range(count)],
+            "pnl_reais": np.round(rng.normal(8.0, 60.0, count), 2),
+            "atr15": rng.uniform(150.0, 350.0, count),
+        }
+    )
+
+
+@pytest.mark.parametrize(("method", "horizon"), [("bootstrap", 50), ("bootstrap", None), ("permutation", 50)])
+def test_shapes_and_monotone_percentiles(trades, method, horizon):
+    result = run_monte_carlo(trades, paths=PATHS, method=method, horizon=horizon, chunk=1000, seed=4)
+    expected_horizon = len(trades) if method == "permutation" or horizon is None else horizon
+    assert result.trades == expected_horizon
+    for name in ("max_drawdown", "max_drawdown_pct", "recovery_trades", "final_equity", "ended_underwater", "ruined"):
+        assert getattr(result, name).shape == (PATHS,), name
+    assert (result.max_drawdown >= 0).all() and (result.max_drawdown_pct < 1).all()
+    assert (result.recovery_trades <= expected_horizon).all()
+    assert result.trades_per_day == pytest.approx(3.0)
+
+    table = result.percentiles()
+    assert list(table.index) == ["p50", "p75", "p90", "p95", "p99"]
+    assert (table.diff().iloc[1:] >= 0).all().all()
+    np.testing.assert_allclose(table["recovery_days"], table["recovery_trades"] / 3.0)
+
+
+def test_seed_is_reproducible(trades):
+    first = run_monte_carlo(trades, paths=PATHS, sizing="equity", seed=9)
+    second = run_monte_carlo(trades, paths=PATHS, sizing="equity", seed=9)
+    np.testing.assert_array_equal(first.final_equity, second.final_equity)
+    np.testing.assert_array_equal(first.max_drawdown, second.max_drawdown)
+
+
+def test_ruin_matches_direct_recomputation(trades):
+    capital, ruin, contracts, horizon = 3000.0, 2500.0, 2, 80
+    result = run_monte_carlo(
+        trades, capital=capital, paths=PATHS, sizing="fixed", contracts=contracts, horizon=horizon, ruin_equity=ruin, chunk=PATHS, seed=13
+    )
+    index = np.random.default_rng(13).integers(0, len(trades), size=(PATHS, horizon))
+    equity = capital + np.cumsum(trades["pnl_reais"].to_numpy()[index] * contracts, axis=1)
+    equity = np.column_stack([np.full(PATHS, capital), equity])
+    peak = np.maximum.accumulate(equity, axis=1)
+
+    ruined = equity.min(axis=1) < ruin
+    assert 0.05 < ruined.mean() < 0.95
+    assert result.ruin_probability == ruined.mean()
+    np.testing.assert_allclose(result.final_equity, equity[:, -1])
+    np.testing.assert_allclose(result.max_drawdown, (peak - equity).max(axis=1))
+    np.testing.assert_allclose(result.max_drawdown_pct, ((peak - equity) / peak).max(axis=1))
+
+
+def test_permutation_keeps_the_ledger_total(trades):
+    result = run_monte_carlo(trades, paths=500, method="permutation", sizing="fixed", contracts=1, seed=2)
+    np.testing.assert_allclose(result.final_equity, 10000.0 + trades["pnl_reais"].sum())
+
+
+def test_rejects_capital_at_or_below_ruin(trades):
+    with pytest.raises(ValueError):
+        run_monte_carlo(trades, capital=2000.0, ruin_equity=2000.0, paths=10)
+    with pytest.raises(ValueError):
+        run_monte_carlo(trades, capital=1500.0, paths=10)
@@ -0,0 +1,86 @@
+"""``RegimeDetector.classify_batch`` idêntico a ``classify`` linha a linha, inclusive nos empates de ``round``."""
+from __future__ import annotations
+
+from dataclasses import fields
+
+import numpy as np
+import pytest
+
+from market_structure import StructureView, structure_names
+from regime_detector import RegimeDetector, RegimeParams, RegimeSignal
+
+FLOAT_COLUMNS = ("adx15", "adx60", "ema20", "ema50", "ema20_15_prev3", "atr15", "atr15_mean30", "ema20_60", "ema50_60", "atr60")
+
+
+def random_columns(rng: np.random.Generator, n: int, params: RegimeParams) -> dict[str, np.ndarray]:
+    """Colunas em grade (muitos valores exatamente nos limiares) com ATR zero de vez em quando."""
+    thresholds = [params.adx_quiet, params.adx_trend, params.adx_strong, params.adx_full]
+    columns = {
+        "adx15": np.where(rng.random(n) < 0.1, rng.choice(thresholds, n), rng.integers(0, 5000, n) / 100),
+        "adx60": np.where(rng.random(n) < 0.1, rng.choice(thresholds, n), rng.integers(0, 5000, n) / 100),
+        "ema20": 120_000 + rng.integers(-400, 400, n).astype(float),
+        "ema50": 120_000 + rng.integers(-400, 400, n).astype(float),
+        "ema20_15_prev3": 120_000 + rng.integers(-400, 400, n).astype(float),
+        "atr15": rng.choice([0.0, 80.0, 100.0, 150.0, 220.0], n),
+        "atr15_mean30": rng.choice([80.0, 100.0, 150.0], n),
+        "ema20_60": 120_000 + rng.integers(-800, 800, n).astype(float),
+        "ema50_60": 120_000 + rng.integers(-800, 800, n).astype(float),
+        "atr60": rng.choice([0.0, 300.0, 450.0, 600.0], n),
+        "structure15": rng.integers(-1, 2, n).astype(np.int8),
+        "structure60": rng.integers(-1, 2, n).astype(np.int8),
+        "pivot_count15": rng.integers(0, 7, n),
+        "pivot_count60": rng.integers(0, 7, n),
+    }
+    same = rng.random(n) < 0.05
+    columns["ema50"][same] = columns["ema20"][same]  # direção NEUTRO
+    return columns
+
+
+def lateral_ties(params: RegimeParams) -> dict[str, np.ndarray]:
+    """Confiança LATERAL ``0.5 + (adx_trend - adx15) / (2 adx_trend)`` caindo em xxx.5 milésimos."""
+    m = np.arange(500, 1000)
+    adx15 = params.adx_trend - (2 * m - 999) / 1000 * params.adx_trend
+    n = len(adx15)
+    columns = {name: np.full(n, 120_000.0) for name in FLOAT_COLUMNS}
+    columns.update(
+        adx15=adx15, adx60=np.full(n, 10.0), atr15=np.full(n, 200.0), atr15_mean30=np.full(n, 100.0), atr60=np.full(n, 400.0),
+        structure15=np.zeros(n, dtype=np.int8), structure60=np.zeros(n, dtype=np.int8),
+        pivot_count15=np.zeros(n, dtype=np.int64), pivot_count60=np.zeros(n, dtype=np.int64),
+    )
+    return columns
+
+
+def assert_rows_match(detector: RegimeDetector, columns: dict[str, np.ndarray]) -> None:
+    batch = detector.classify_batch(columns)
+    p = detector.params
+    names15, names60 = structure_names(columns["structure15"]), structure_names(columns["structure60"])
+    for i in range(len(batch)):
+        data = {name: float(columns[name][i]) for name in FLOAT_COLUMNS}
+        data["pivots15"] = StructureView(str(names15[i]), int(columns["pivot_count15"][i]), [], [], p.context15_lookback)
+        data["pivots60"] = StructureView(str(names60[i]), int(columns["pivot_count60"][i]), [], [], p.macro_lookback)
+        expected = detector.classify(data)
+        actual = batch.signal(i)
+        for field in fields(RegimeSignal):
+            assert getattr(actual, field.name) == getattr(expected, field.name), (i, field.name)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [RegimeParams(), RegimeParams(adx_trend=18, adx_strong=23, adx_quiet=15, slope_strong=0.1, atr_expansion=1.2)],
+    ids=["padrao", "ajustado"],
+)
+def test_batch_matches_scalar_rows(params):
+    detector = RegimeDetector(params=params)
+    assert_rows_match(detector, random_columns(np.random.default_rng(11), 4000, params))
+
+
+def test_batch_matches_scalar_on_rounding_ties():
+    params = RegimeParams()
+    columns = lateral_ties(params)
+    confidence = np.minimum(1.0, 0.5 + np.maximum(0.0, (params.adx_trend - columns["adx15"]) / params.adx_trend) / 2)
+    np_rounded = np.round(confidence * 1000) / 1000
+    assert (np_rounded != [round(v, 3) for v in confidence.tolist()]).sum() > 100  # ``np.round`` sozinho divergiria
+
+    detector = RegimeDetector(params=params)
+    assert set(detector.classify_batch(columns).regime) == {"LATERAL"}
+    assert_rows_match(detector, columns)
@@ -0,0 +1,122 @@
+"""``resample``/``SessionResampler``: candles derivados do M5 ancorados na abertura do pregão."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+import mt5_replay
+from mt5_replay import RATES_DTYPE
+from resampler import SessionResampler, bucket_start, resample
+
+mt5_replay.install()
+
+from mt5_connector import MT5Connector  # noqa: E402  (precisa ver o mt5_replay instalado acima)
+
+DAY = 86400
+OPEN = 9 * 3600
+FIRST_DAY = int(datetime(2024, 3, 4, tzinfo=timezone.utc).timestamp())
+
+
+@pytest.fixture(scope="module")
+def m5():
+    """Pregões de 09:00 a 18:25 em M5, com alguns candles faltando como no MT5."""
+    times = np.concatenate([FIRST_DAY + d * DAY + OPEN + np.arange(114) * 300 for d in range(6)])
+    times = np.delete(times, [7, 8, 150, 401])
+    rng = np.random.default_rng(8)
+    rates = np.zeros(len(times), dtype=RATES_DTYPE)
+    rates["time"] = times
+    rates["open"] = 120_000.0 + rng.normal(0, 40, len(times)).cumsum()
+    rates["close"] = rates["open"] + rng.normal(0, 30, len(times))
+    rates["high"] = np.maximum(rates["open"], rates["close"]) + rng.uniform(0, 25, len(times))
+    rates["low"] = np.minimum(rates["open"], rates["close"]) - rng.uniform(0, 25, len(times))
+    rates["tick_volume"] = rng.integers(100, 1000, len(times))
+    rates["real_volume"] = rates["tick_volume"] * 3
+    rates["spread"] = rng.integers(1, 6, len(times))
+    return rates
+
+
+def naive_resample(rates: np.ndarray, period: int) -> list[tuple]:
+    groups: dict[int, list] = {}
+    for row in rates:
+        seconds = int(row["time"]) % DAY
+        anchor = int(row["time"]) - seconds + OPEN
+        groups.setdefault(anchor + (int(row["time"]) - anchor) // period * period, []).append(row)
+    return [
+        (start, rows[0]["open"], max(r["high"] for r in rows), min(r["low"] for r in rows), rows[-1]["close"],
+         sum(int(r["tick_volume"]) for r in rows), int(rows[-1]["spread"]), sum(int(r["real_volume"]) for r in rows))
+        for start, rows in groups.items()
+    ]
+
+
+@pytest.mark.parametrize("period", [900, 2700, 3600, 7200])
+def test_batch_resample_matches_naive_grouping(m5, period):
+    out = resample(m5, period)
+    assert out.tolist() == naive_resample(m5, period)
+    seconds = (out["time"] - OPEN) % DAY
+    assert (seconds % period == 0).all()  # 45 min e 2 h ancorados às 09:00, não à meia-noite
+
+
+def test_bucket_start_accepts_scalars_and_arrays(m5):
+    assert bucket_start(FIRST_DAY + OPEN + 2700 + 600, 2700) == FIRST_DAY + OPEN + 2700
+    np.testing.assert_array_equal(bucket_start(m5["time"][:3], 900), FIRST_DAY + OPEN)
+    assert len(resample(m5[:0], 900)) == 0
+
+
+@pytest.mark.parametrize("period", [900, 3600])
+def test_incremental_matches_batch_with_forming_bar(m5, period):
+    capacity = 40
+    resampler = SessionResampler(period, capacity=capacity)
+    resampler.seed(resample(m5[:150], period)[-capacity:])
+    for now in range(151, len(m5) + 1):
+        window = m5[max(0, now - 300):now].copy()
+        window[-1]["high"] = window[-1]["low"] = window[-1]["close"] = window[-1]["open"]  # recém-aberto
+        expected = resample(np.concatenate([m5[:now - 1], window[-1:]]), period)[-capacity:]
+        np.testing.assert_array_equal(resampler.update(window), expected)
+        np.testing.assert_array_equal(resampler.update(m5[max(0, now - 300):now]), resample(m5[:now], period)[-capacity:])
+    assert not resampler.needs_seed
+
+
+def test_needs_seed_when_base_no_longer_overlaps(m5):
+    resampler = SessionResampler(900, capacity=40)
+    resampler.seed(resample(m5[:150], 900)[-40:])
+    resampler.update(m5[:160])
+    resampler.update(m5[400:460])
+    assert resampler.needs_seed
+
+
+def test_needs_seed_when_base_starts_after_seed(m5):
+    """Logo após a semente ainda não há candle base incorporado; a lacuna vem do início do base."""
+    resampler = SessionResampler(900, capacity=40)
+    resampler.seed(resample(m5[:150], 900)[-40:])
+    resampler.update(m5[:149])
+    assert not resampler.needs_seed
+    resampler.update(m5[400:460])
+    assert resampler.needs_seed
+
+
+def test_state_round_trip(m5):
+    resampler = SessionResampler(900, capacity=40)
+    resampler.seed(resample(m5[:150], 900)[-40:])
+    resampler.update(m5[:200])
+    restored = SessionResampler(900, capacity=40)
+    restored.restore(resampler.to_arrays())
+    np.testing.assert_array_equal(restored.update(m5[50:260]), resampler.update(m5[50:260]))
+    np.testing.assert_array_equal(restored.update(m5[100:260]), resample(m5[:260], 900)[-40:])
+
+
+def test_connector_reseeds_in_the_same_call_after_gap(synthetic_recording):
+    """Lacuna maior que a capacidade (reinício): o M15 derivado já sai certo na primeira chamada."""
+    session = mt5_replay.load(synthetic_recording(days=14), start="2024-05-09 10:00")
+    connector = MT5Connector(logging.getLogger("test_resampler"), derive_from=mt5_replay.TIMEFRAME_M5)
+    assert connector.connect(1, "x", "Replay")
+    connector._snapshot_rates("WIN$")
+
+    session.clock.set("2024-05-22 14:02")
+    _, m15, _ = connector._snapshot_rates("WIN$")
+    assert not connector._resamplers[("WIN$", mt5_replay.TIMEFRAME_M15)].needs_seed
+    expected = mt5_replay.copy_rates_from_pos("WIN$", mt5_replay.TIMEFRAME_M15, 0, len(m15))
+    np.testing.assert_array_equal(m15["time"], expected["time"])
+    np.testing.assert_array_equal(m15[:-1], expected[:-1])  # o candle em formação vem do M5 corrente
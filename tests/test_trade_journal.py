@@ -0,0 +1,90 @@
+"""``TradeJournal``: recuperação do WAL após queda e ``submit`` sem bloqueio com o overflow cheio."""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from trade_journal import TRADE_COLUMNS, TradeJournal, monthly_path
+from utils import B3_TZ
+
+WHEN = datetime(2024, 3, 4, 11, 0, tzinfo=B3_TZ)
+
+
+def _trade(i: int) -> dict:
+    row = dict.fromkeys(TRADE_COLUMNS)
+    row.update(
+        timestamp_open=f"2024-03-04T10:{i:02d}:00-03:00", timestamp_close=f"2024-03-04T11:{i:02d}:00-03:00",
+        direction="VENDA", entry_price=120_000.0 + i, exit_price=119_950.5 + i, pnl_points=49.5, pnl_reais=9.9,
+        regime="TENDENCIA", confidence=0.75,
+    )
+    return row
+
+
+def write_wal(journal: TradeJournal, rows: list[dict], torn: bool = False) -> None:
+    """WAL como o escritor deixa quando cai entre o ``fsync`` do WAL e o truncamento."""
+    journal.reports_dir.mkdir(parents=True, exist_ok=True)
+    path = str(monthly_path(journal.reports_dir, WHEN))
+    lines = [json.dumps({"path": path, "row": row}) + "\n" for row in rows]
+    if torn:
+        lines.append(json.dumps({"path": path, "row": _trade(59)})[:40])
+    journal.wal_path.write_text("".join(lines), encoding="utf-8")
+
+
+def written(journal: TradeJournal) -> pd.DataFrame:
+    return pd.read_csv(monthly_path(journal.reports_dir, WHEN))
+
+
+def test_replays_unflushed_wal_lines(tmp_path):
+    journal = TradeJournal(tmp_path)
+    write_wal(journal, [_trade(1), _trade(2)], torn=True)
+    journal.start()
+    assert journal.close()
+
+    trades = written(journal)
+    assert trades["entry_price"].tolist() == [120_001.0, 120_002.0]  # a linha cortada do WAL é ignorada
+    assert list(trades.columns) == TRADE_COLUMNS
+    assert journal.wal_path.stat().st_size == 0
+
+
+def test_recovery_skips_rows_already_in_csv(tmp_path):
+    journal = TradeJournal(tmp_path)
+    journal.start()
+    journal.submit(_trade(1), WHEN)
+    assert journal.close()
+    write_wal(journal, [_trade(1), _trade(2)])  # queda depois do CSV, antes de truncar o WAL
+
+    assert TradeJournal(tmp_path).recover() == 2
+    assert written(journal)["entry_price"].tolist() == [120_001.0, 120_002.0]
+
+
+def test_recovery_repairs_torn_csv_line(tmp_path):
+    journal = TradeJournal(tmp_path)
+    journal.start()
+    journal.submit(_trade(1), WHEN)
+    assert journal.close()
+    csv_path = monthly_path(tmp_path, WHEN)
+    with open(csv_path, "a", encoding="utf-8") as fp:
+        fp.write("2024-03-04T10:02:00-03:00,2024-03-04T11:02")  # queda no meio da linha
+    write_wal(journal, [_trade(2)])
+
+    journal.start()
+    journal.submit(_trade(3), WHEN)
+    assert journal.close()
+    assert written(journal)["entry_price"].tolist() == [120_001.0, 120_002.0, 120_003.0]
+    assert csv_path.read_bytes().endswith(b"\n")
+
+
+def test_submit_spills_instead_of_blocking(tmp_path):
+    journal = TradeJournal(tmp_path, max_queue=1, max_overflow=1)  # escritor parado
+    for i in range(4):
+        journal.submit(_trade(i), WHEN)
+    stats = journal.stats()
+    assert (stats.submitted, stats.overflowed, stats.spilled, stats.dropped) == (2, 1, 2, 0)
+    assert journal.spill_path.exists()
+
+    journal.start()  # o spill volta na recuperação; fila e overflow pelo escritor
+    assert journal.close()
+    assert sorted(written(journal)["entry_price"].tolist()) == [120_000.0 + i for i in range(4)]
+    assert not journal.spill_path.exists()
@@ -0,0 +1,32 @@
+"""``TradeStore.aggregate``: profit factor com a mesma convenção do ``EquityTracker``."""
+from __future__ import annotations
+
+import pandas as pd
+
+from equity_tracker import _profit_factor
+from trade_journal import TRADE_COLUMNS
+from trade_store import TradeStore
+
+
+def _trade(i: int, regime: str, pnl: float) -> dict:
+    row = dict.fromkeys(TRADE_COLUMNS)
+    row.update(
+        timestamp_open=f"2024-03-04T10:{i:02d}:00-03:00", timestamp_close=f"2024-03-04T11:{i:02d}:00-03:00",
+        direction="COMPRA", entry_price=120_000.0 + i, regime=regime, pnl_points=pnl, pnl_reais=pnl * 0.2, confidence=0.5,
+    )
+    return row
+
+
+def test_profit_factor_matches_equity_tracker(tmp_path):
+    groups = {"GANHOS": [10.0, 5.0], "ZERO": [0.0], "MISTO": [10.0, -5.0], "PERDAS": [-3.0]}
+    trades = []
+    for regime, pnls in groups.items():
+        for pnl in pnls:
+            trades.append(_trade(len(trades), regime, pnl))
+    with TradeStore(tmp_path / "trades.sqlite") as store:
+        assert store.add_trades(pd.DataFrame(trades)) == len(trades)
+        table = store.aggregate(["regime"]).set_index("regime")
+    for regime, pnls in groups.items():
+        gains = sum(p for p in pnls if p > 0)
+        losses = -sum(p for p in pnls if p < 0)
+        assert table.loc[regime, "profit_factor"] == _profit_factor(gains, losses), regime
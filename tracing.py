@@ -0,0 +1,122 @@
+"""Rastreamento estruturado (níveis + categorias) com custo quase nulo sem assinantes.
+
+Os componentes emitem eventos com mensagem-modelo e campos nomeados; nada é formatado
+nem alocado além da própria chamada enquanto nenhum sink assinar a categoria/nível::
+
+    TRACER.subscribe(print_sink, level=DEBUG, categories={"regime"})
+    TRACER.emit("regime", DEBUG, "ADX15=%(adx15).2f", adx15=adx15)
+
+Para trechos cujo custo está nos argumentos (ex.: ``df.dtypes``), use ``TRACER.enabled``.
+"""
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+
+_OFF = sys.maxsize
+
+
+@dataclass(frozen=True)
+class TraceEvent:
+    time: float
+    category: str
+    level: int
+    message: str
+    fields: dict = field(default_factory=dict)
+
+    def render(self) -> str:
+        return self.message % self.fields if self.fields else self.message
+
+
+Sink = Callable[[TraceEvent], None]
+
+
+@dataclass(frozen=True, eq=False)
+class Subscription:
+    sink: Sink
+    level: int = DEBUG
+    categories: Optional[frozenset[str]] = None  # None = todas
+
+    def accepts(self, category: str, level: int) -> bool:
+        return level >= self.level and (self.categories is None or category in self.categories)
+
+
+class Tracer:
+    """Distribui eventos aos sinks assinados; ``enabled`` é uma consulta a dicionário.
+
+    O limiar efetivo por categoria (menor nível entre os sinks que a aceitam, ou desligado
+    por ``set_category``) é recalculado só quando assinaturas/chaves mudam.
+    """
+
+    def __init__(self) -> None:
+        self._subs: tuple[Subscription, ...] = ()
+        self._switches: dict[str, bool] = {}
+        self._levels: dict[str, int] = {}
+        self._default = _OFF
+        self._lock = threading.Lock()
+
+    def subscribe(self, sink: Sink, level: int = DEBUG, categories: Optional[Iterable[str]] = None) -> Subscription:
+        sub = Subscription(sink, level, frozenset(categories) if categories is not None else None)
+        with self._lock:
+            self._subs = (*self._subs, sub)
+            self._recompute()
+        return sub
+
+    def unsubscribe(self, sub: Optional[Subscription]) -> None:
+        if sub is None:
+            return
+        with self._lock:
+            self._subs = tuple(s for s in self._subs if s is not sub)
+            self._recompute()
+
+    def set_category(self, category: str, enabled: bool) -> None:
+        """Liga/desliga uma categoria para todos os sinks."""
+        with self._lock:
+            self._switches[category] = enabled
+            self._recompute()
+
+    def _recompute(self) -> None:
+        self._default = min((s.level for s in self._subs if s.categories is None), default=_OFF)
+        named = {c for s in self._subs if s.categories for c in s.categories} | set(self._switches)
+        levels = {}
+        for category in named:
+            if not self._switches.get(category, True):
+                levels[category] = _OFF
+                continue
+            levels[category] = min((s.level for s in self._subs if s.categories is None or category in s.categories), default=_OFF)
+        self._levels = levels
+
+    def enabled(self, category: str, level: int = DEBUG) -> bool:
+        return level >= self._levels.get(category, self._default)
+
+    def emit(self, category: str, level: int, message: str, **fields) -> None:
+        if level < self._levels.get(category, self._default):
+            return
+        event = TraceEvent(time.time(), category, level, message, fields)
+        for sub in self._subs:
+            if sub.accepts(category, level):
+                sub.sink(event)
+
+
+TRACER = Tracer()
+
+
+def callback_sink(callback: Optional[Callable[[str], None]] = None, logger=None, prefix: str = "[DEBUG] ") -> Sink:
+    """Sink no formato antigo dos ``_debug``: texto prefixado para logger e/ou callback da GUI."""
+
+    def sink(event: TraceEvent) -> None:
+        payload = prefix + event.render()
+        if logger is not None:
+            logger.info(payload)
+        if callback is not None:
+            callback(payload)
+
+    return sink
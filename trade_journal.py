@@ -0,0 +1,350 @@
+"""Journal write-behind dos trades fechados (CSV mensal em ``reports/<ano>/trades_<ano>_<mês>.csv``).
+
+``submit`` só enfileira a linha (fila limitada; se ela encher, as linhas seguintes vão para
+um deque de overflow de até ``max_overflow`` linhas, sem descartar) e volta, sem nunca
+bloquear o engine. Com o overflow cheio (disco parado há muito tempo) a linha é acrescentada
+ao ``journal.spill`` (sem ``fsync``) com um erro no log e regravada no próximo ``start``; se nem
+isso for possível ela é descartada com erro. A memória nunca passa de ``max_queue + max_overflow``
+linhas. ``start`` (chamado na criação do ``TradingEngine``) faz a recuperação e sobe a thread
+de escrita, que junta as linhas em lotes e, para cada lote:
+
+1. acrescenta o lote ao log ``journal.wal`` (JSON por linha) e faz ``fsync``;
+2. acrescenta as linhas aos CSVs mensais (``csv.DictWriter``, mesmo cabeçalho) com ``fsync``;
+3. trunca o WAL: o lote está confirmado.
+
+Na abertura seguinte, linhas que ficaram no WAL (queda entre 1 e 3) ou no spill são regravadas
+nos CSVs, pulando as que já estavam lá e descartando uma última linha de CSV cortada pela metade.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+TRADE_COLUMNS = [
+    "timestamp_open", "timestamp_close", "direction", "entry_price", "stop_loss", "take_profit", "exit_price",
+    "exit_reason", "pnl_points", "pnl_reais", "regime", "confidence", "atr15", "adx15", "dist_rel", "slope_rel",
+    "rr_ratio", "duration_minutes", "mfe_points", "mae_points",
+]
+
+
+@dataclass
+class JournalStats:
+    submitted: int
+    written: int
+    overflowed: int  # linhas que passaram pelo deque de overflow
+    spilled: int  # linhas que encontraram o overflow cheio e foram para o ``journal.spill``
+    dropped: int  # linhas descartadas (overflow cheio e falha ao gravar o spill)
+    batches: int
+    failures: int
+    queue_depth: int  # linhas aceitas e ainda não gravadas
+    last_latency: float  # segundos entre ``submit`` e o ``fsync`` do CSV
+    max_latency: float
+    mean_latency: float
+
+
+def monthly_path(reports_dir: str | Path, when: datetime) -> Path:
+    return Path(reports_dir) / f"{when.year}" / f"trades_{when.year}_{when.month:02d}.csv"
+
+
+def upgrade_header(path: str | Path) -> bool:
+    """Regrava um CSV de trades com cabeçalho antigo no de ``TRADE_COLUMNS`` (colunas novas vazias)."""
+    path = Path(path)
+    if not path.exists() or path.stat().st_size == 0:
+        return False
+    with open(path, newline="", encoding="utf-8") as fp:
+        reader = csv.DictReader(fp)
+        if reader.fieldnames == TRADE_COLUMNS:
+            return False
+        rows = list(reader)
+    scratch = path.with_suffix(".tmp")
+    with open(scratch, "w", newline="", encoding="utf-8") as fp:
+        writer = csv.DictWriter(fp, fieldnames=TRADE_COLUMNS, lineterminator=os.linesep, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(scratch, path)
+    return True
+
+
+def _csv_line(row: dict) -> str:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=TRADE_COLUMNS, lineterminator="\n").writerow(row)
+    return buffer.getvalue().rstrip("\n")
+
+
+def _json_default(value):
+    return value.item()  # escalares NumPy vindos do snapshot
+
+
+class TradeJournal:
+    """Grava trades fora da thread do engine, com WAL para sobreviver a quedas."""
+
+    def __init__(
+        self,
+        reports_dir: str | Path = "reports",
+        max_queue: int = 1024,
+        max_overflow: int = 16384,
+        batch_size: int = 64,
+        flush_interval: float = 0.5,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.reports_dir = Path(reports_dir)
+        self.wal_path = self.reports_dir / "journal.wal"
+        self.spill_path = self.reports_dir / "journal.spill"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_overflow = max_overflow
+        self.logger = logger or logging.getLogger(__name__)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._overflow: deque = deque()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._submitted = 0
+        self._written = 0
+        self._overflowed = 0
+        self._spilled = 0
+        self._dropped = 0
+        self._batches = 0
+        self._failures = 0
+        self._last_latency = 0.0
+        self._max_latency = 0.0
+        self._latency_sum = 0.0
+
+    # ----------------------------------------------------------------- engine
+    def submit(self, row: dict, when: datetime) -> Path:
+        """Enfileira a linha do trade fechado em ``when`` e devolve o CSV de destino.
+
+        Nunca bloqueia nem inicia o escritor: com o overflow cheio (``max_overflow``) a linha
+        vai para o ``journal.spill``.
+        """
+        path = monthly_path(self.reports_dir, when)
+        with self._idle:
+            full = len(self._overflow) >= self.max_overflow
+            pending = self._submitted - self._written
+        if full:
+            self._spill(str(path), row, pending)
+            return path
+        with self._idle:
+            item = (str(path), row, time.perf_counter())
+            self._submitted += 1
+            if self._overflow:
+                self._overflow.append(item)  # mantém a ordem enquanto o overflow não esvazia
+                self._overflowed += 1
+                return path
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._overflow.append(item)
+                self._overflowed += 1
+        return path
+
+    def stats(self) -> JournalStats:
+        with self._lock:
+            return JournalStats(
+                submitted=self._submitted,
+                written=self._written,
+                overflowed=self._overflowed,
+                spilled=self._spilled,
+                dropped=self._dropped,
+                batches=self._batches,
+                failures=self._failures,
+                queue_depth=self._submitted - self._written,
+                last_latency=self._last_latency,
+                max_latency=self._max_latency,
+                mean_latency=self._latency_sum / self._written if self._written else 0.0,
+            )
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._submitted - self._written
+
+    def _spill(self, path: str, row: dict, pending: int) -> None:
+        try:
+            self.reports_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as fp:
+                fp.write(json.dumps({"path": path, "row": row}, default=_json_default) + "\n")
+        except OSError as exc:
+            with self._lock:
+                self._dropped += 1
+            self.logger.error("[JOURNAL] Overflow cheio (%d linhas aguardando) e spill falhou: trade para %s descartado: %s", pending, path, exc)
+            return
+        with self._lock:
+            self._spilled += 1
+        self.logger.error("[JOURNAL] Overflow cheio (%d linhas aguardando): trade para %s gravado em %s até o próximo start", pending, path, self.spill_path)
+
+    # ------------------------------------------------------------- ciclo de vida
+    def start(self) -> None:
+        """Regrava o que ficou no WAL/spill e inicia a thread de escrita (idempotente)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name="trade-journal")
+        self.recover()
+        self._stop.clear()
+        self._thread.start()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera até tudo o que foi aceito estar nos CSVs; ``False`` se estourar ``timeout``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._submitted > self._written:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining if remaining is not None else self.flush_interval)
+        return True
+
+    def close(self, timeout: Optional[float] = 5.0) -> bool:
+        if self._thread is None:
+            return True
+        done = self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        return done
+
+    # ------------------------------------------------------------------ escrita
+    def _take_batch(self) -> list[tuple[str, dict, float]]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            pass
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if len(batch) < self.batch_size and self._queue.empty():
+            with self._lock:
+                while self._overflow and len(batch) < self.batch_size:
+                    batch.append(self._overflow.popleft())
+        return batch
+
+    def _run(self) -> None:
+        pending: list[tuple[str, dict, float]] = []
+        while True:
+            if not pending:
+                if self._stop.is_set() and self._queue.empty() and not self._overflow:
+                    return
+                pending = self._take_batch()
+                if not pending:
+                    continue
+            try:
+                self._commit(pending)
+            except Exception as exc:  # disco cheio, permissão...: tenta de novo sem perder o lote
+                with self._lock:
+                    self._failures += 1
+                self.logger.exception("[JOURNAL] Falha ao gravar %d trade(s): %s", len(pending), exc)
+                if self._stop.wait(1.0):
+                    return  # encerrando: o que chegou ao WAL é regravado no próximo ``start``
+                continue
+            now = time.perf_counter()
+            with self._idle:
+                for _, _, submitted_at in pending:
+                    latency = now - submitted_at
+                    self._latency_sum += latency
+                    self._max_latency = max(self._max_latency, latency)
+                    self._last_latency = latency
+                self._written += len(pending)
+                self._batches += 1
+                self._idle.notify_all()
+            pending = []
+
+    def _commit(self, batch: list[tuple[str, dict, float]]) -> None:
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.wal_path, "a", encoding="utf-8") as wal:
+            for path, row, _ in batch:
+                wal.write(json.dumps({"path": path, "row": row}, default=_json_default) + "\n")
+            wal.flush()
+            os.fsync(wal.fileno())
+        self._append_rows([(path, row) for path, row, _ in batch])
+        self._truncate_wal()
+
+    def _append_rows(self, rows: list[tuple[str, dict]], skip_existing: bool = False) -> None:
+        by_path: dict[str, list[dict]] = {}
+        for path, row in rows:
+            by_path.setdefault(path, []).append(row)
+        for path, items in by_path.items():
+            target = Path(path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if skip_existing:
+                self._repair_tail(target)
+            if upgrade_header(target):
+                self.logger.info("[JOURNAL] Cabeçalho de %s atualizado para as colunas atuais", target)
+            if skip_existing:
+                existing = self._lines(target)
+                items = [row for row in items if _csv_line(row) not in existing]
+                if not items:
+                    continue
+            with open(target, "a", newline="", encoding="utf-8") as fp:
+                writer = csv.DictWriter(fp, fieldnames=TRADE_COLUMNS, lineterminator=os.linesep)  # como o ``to_csv``
+                if fp.tell() == 0:
+                    writer.writeheader()
+                writer.writerows(items)
+                fp.flush()
+                os.fsync(fp.fileno())
+
+    def _truncate_wal(self) -> None:
+        with open(self.wal_path, "r+b") as wal:
+            wal.truncate(0)
+            wal.flush()
+            os.fsync(wal.fileno())
+
+    # ---------------------------------------------------------------- recuperação
+    @staticmethod
+    def _repair_tail(path: Path) -> None:
+        """Corta uma última linha incompleta do CSV (queda no meio da escrita)."""
+        if not path.exists():
+            return
+        data = path.read_bytes()
+        if data and not data.endswith(b"\n"):
+            with open(path, "r+b") as fp:
+                fp.truncate(data.rfind(b"\n") + 1)
+
+    @staticmethod
+    def _lines(path: Path) -> set[str]:
+        """Linhas já presentes no CSV."""
+        if not path.exists():
+            return set()
+        return {line.rstrip("\r") for line in path.read_text(encoding="utf-8").split("\n") if line}
+
+    @staticmethod
+    def _read_log(path: Path) -> list[tuple[str, dict]]:
+        if not path.exists():
+            return []
+        rows = []
+        with open(path, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # última linha cortada: nunca foi confirmada nem gravada no CSV
+                rows.append((record["path"], record["row"]))
+        return rows
+
+    def recover(self) -> int:
+        """Regrava nos CSVs as linhas do WAL e do spill ainda não confirmadas; devolve quantas foram lidas."""
+        rows = self._read_log(self.wal_path) + self._read_log(self.spill_path)
+        if rows:
+            self._append_rows(rows, skip_existing=True)
+            self.logger.warning("[JOURNAL] %d trade(s) recuperado(s) do WAL", len(rows))
+        if self.wal_path.exists():
+            self._truncate_wal()
+        self.spill_path.unlink(missing_ok=True)
+        return len(rows)
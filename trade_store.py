@@ -0,0 +1,254 @@
+"""Base SQLite dos trades fechados, com índices e agregações feitas no próprio banco.
+
+Os CSVs mensais (``<reports>/<ano>/trades_<ano>_<mês>.csv``) entram uma vez por
+``import_reports``; reimportar só acrescenta o que falta (a chave é abertura, fechamento,
+direção e preço de entrada). Além das colunas do CSV cada trade guarda os epochs de
+abertura/fechamento, a hora e o dia da semana da entrada (relógio da B3) e o mês do
+fechamento, indexados para que ``aggregate``/``distribution`` (regime, faixa de confiança,
+hora, dia da semana, MFE/MAE...) respondam em milissegundos sem abrir os CSVs.
+
+Uso: ``python trade_store.py reports --db reports/trades.sqlite --by regime,hour``
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from trade_journal import TRADE_COLUMNS
+from utils import B3_TZ, to_epoch
+
+_REAL = {
+    "entry_price", "stop_loss", "take_profit", "exit_price", "pnl_points", "pnl_reais", "confidence", "atr15",
+    "adx15", "dist_rel", "slope_rel", "rr_ratio", "duration_minutes", "mfe_points", "mae_points",
+}
+DERIVED_COLUMNS = ["opened", "closed", "hour", "weekday", "month"]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{name} {'REAL' if name in _REAL else 'TEXT'}" for name in TRADE_COLUMNS)},
+    opened INTEGER NOT NULL,
+    closed INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    weekday INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    UNIQUE (timestamp_open, timestamp_close, direction, entry_price)
+);
+CREATE INDEX IF NOT EXISTS trades_closed ON trades (closed);
+CREATE INDEX IF NOT EXISTS trades_regime ON trades (regime, closed);
+CREATE INDEX IF NOT EXISTS trades_direction ON trades (direction, closed);
+"""
+
+# agrupamentos aceitos por ``aggregate``/``distribution`` (nome -> expressão SQL)
+GROUPS = {
+    "regime": "regime",
+    "direction": "direction",
+    "exit_reason": "exit_reason",
+    "hour": "hour",  # hora da entrada
+    "weekday": "weekday",  # 0 = segunda, da entrada
+    "month": "month",  # mês do fechamento (AAAA-MM)
+    "year": "substr(month, 1, 4)",
+    "confidence": None,  # faixa de ``confidence_step``
+}
+DISTRIBUTIONS = ("mfe_points", "mae_points", "pnl_points", "duration_minutes")
+
+
+def _bucket(column: str, step: float) -> str:
+    """Piso de ``column`` em múltiplos de ``step`` (``CAST`` trunca em direção ao zero).
+
+    A folga de 1e-9 evita que 0.3 / 0.1 = 2.9999... caia na faixa de baixo.
+    """
+    step = float(step)
+    if step <= 0:
+        raise ValueError("step deve ser positivo")
+    scaled = f"({column} / {step!r} + 1e-9)"
+    return f"ROUND((CAST({scaled} AS INTEGER) - ({scaled} < CAST({scaled} AS INTEGER))) * {step!r}, 6)"
+
+
+def _with_derived(trades: pd.DataFrame) -> pd.DataFrame:
+    frame = trades.reindex(columns=TRADE_COLUMNS)
+    opened_local = pd.to_datetime(frame["timestamp_open"].str[:19])
+    epoch = pd.Timestamp(0, tz="UTC")
+    second = pd.Timedelta(seconds=1)
+    frame["opened"] = (pd.to_datetime(frame["timestamp_open"], utc=True) - epoch) // second
+    frame["closed"] = (pd.to_datetime(frame["timestamp_close"], utc=True) - epoch) // second
+    frame["hour"] = opened_local.dt.hour
+    frame["weekday"] = opened_local.dt.weekday
+    frame["month"] = frame["timestamp_close"].str[:7]
+    return frame
+
+
+class TradeStore:
+    """Trades em SQLite (``reports/trades.sqlite`` por padrão) com consultas agregadas."""
+
+    def __init__(self, path: str | Path = "reports/trades.sqlite") -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "TradeStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --------------------------------------------------------------- carga
+    def add_trades(self, trades: pd.DataFrame) -> int:
+        """Insere trades no formato de ``TRADE_COLUMNS`` (ignora os já gravados); devolve quantos entraram."""
+        if trades.empty:
+            return 0
+        frame = _with_derived(trades)
+        frame = frame.astype(object).where(frame.notna(), None)
+        names = TRADE_COLUMNS + DERIVED_COLUMNS
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO trades ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                frame[names].itertuples(index=False, name=None),
+            )
+        return self.conn.total_changes - before
+
+    def import_reports(self, reports_dir: str | Path) -> int:
+        """Importa todos os ``trades_*.csv`` de ``reports_dir`` (CSVs antigos ficam sem MFE/MAE)."""
+        added = 0
+        for path in sorted(Path(reports_dir).glob("*/trades_*.csv")):
+            added += self.add_trades(pd.read_csv(path))
+        return added
+
+    # ------------------------------------------------------------- consultas
+    @staticmethod
+    def _where(start=None, end=None, regime: Optional[str] = None, direction: Optional[str] = None) -> tuple[str, list]:
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("closed >= ?")
+            params.append(to_epoch(start, B3_TZ))
+        if end is not None:
+            clauses.append("closed < ?")
+            params.append(to_epoch(end, B3_TZ))
+        if regime is not None:
+            clauses.append("regime = ?")
+            params.append(regime)
+        if direction is not None:
+            clauses.append("direction = ?")
+            params.append(direction)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _groups(by: Iterable[str], confidence_step: float) -> list[str]:
+        selected = []
+        for name in by:
+            if name not in GROUPS:
+                raise ValueError(f"Agrupamento inválido: {name!r} (opções: {', '.join(GROUPS)})")
+            expression = GROUPS[name] or _bucket("confidence", confidence_step)
+            selected.append(f"{expression} AS {name}")
+        return selected
+
+    def _query(self, sql: str, params: list) -> pd.DataFrame:
+        cursor = self.conn.execute(sql, params)
+        return pd.DataFrame(cursor.fetchall(), columns=[item[0] for item in cursor.description])
+
+    def aggregate(
+        self,
+        by: Iterable[str] = ("regime",),
+        start=None,
+        end=None,
+        regime: Optional[str] = None,
+        direction: Optional[str] = None,
+        confidence_step: float = 0.1,
+    ) -> pd.DataFrame:
+        """Trades, acerto, expectativa, resultado, profit factor e MFE/MAE médios por grupo."""
+        groups = self._groups(by, confidence_step)
+        where, params = self._where(start, end, regime, direction)
+        keys = ", ".join(str(i + 1) for i in range(len(groups)))
+        sql = (
+            f"SELECT {''.join(g + ', ' for g in groups)}"
+            "COUNT(*) AS trades, "
+            "AVG(pnl_points > 0) AS win_rate, "
+            "AVG(pnl_points) AS expectancy, "
+            "SUM(pnl_points) AS result_points, "
+            "SUM(pnl_reais) AS result_reais, "
+            # mesma convenção de ``EquityTracker``: sem perdas, inf se houve ganho e 0 se não
+            "CASE WHEN MIN(pnl_points) < 0 THEN SUM(CASE WHEN pnl_points > 0 THEN pnl_points ELSE 0 END) "
+            "/ -SUM(CASE WHEN pnl_points < 0 THEN pnl_points ELSE 0 END) "
+            "WHEN MAX(pnl_points) > 0 THEN 9e999 ELSE 0.0 END AS profit_factor, "
+            "AVG(mfe_points) AS mfe_points, "
+            "AVG(mae_points) AS mae_points "
+            f"FROM trades{where}"
+            + (f" GROUP BY {keys} ORDER BY {keys}" if groups else "")
+        )
+        return self._query(sql, params)
+
+    def distribution(
+        self,
+        column: str = "mfe_points",
+        step: float = 50.0,
+        by: Iterable[str] = (),
+        start=None,
+        end=None,
+        regime: Optional[str] = None,
+        direction: Optional[str] = None,
+        confidence_step: float = 0.1,
+    ) -> pd.DataFrame:
+        """Histograma de ``column`` em faixas de ``step`` (coluna ``bucket`` = início da faixa)."""
+        if column not in DISTRIBUTIONS:
+            raise ValueError(f"Coluna inválida: {column!r} (opções: {', '.join(DISTRIBUTIONS)})")
+        groups = self._groups(by, confidence_step) + [f"{_bucket(column, step)} AS bucket"]
+        where, params = self._where(start, end, regime, direction)
+        where += (" AND " if where else " WHERE ") + f"{column} IS NOT NULL"
+        keys = ", ".join(str(i + 1) for i in range(len(groups)))
+        sql = (
+            f"SELECT {', '.join(groups)}, COUNT(*) AS trades, AVG(pnl_points) AS expectancy "
+            f"FROM trades{where} GROUP BY {keys} ORDER BY {keys}"
+        )
+        return self._query(sql, params)
+
+    def trades(self, start=None, end=None, regime: Optional[str] = None, direction: Optional[str] = None) -> pd.DataFrame:
+        """Trades do filtro em ordem de fechamento, nas colunas do CSV."""
+        where, params = self._where(start, end, regime, direction)
+        return self._query(f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades{where} ORDER BY closed, id", params)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("reports", help="diretório dos CSVs mensais a importar (reports/ ou saída de backtest)")
+    parser.add_argument("--db", help="arquivo SQLite (padrão: <reports>/trades.sqlite)")
+    parser.add_argument("--by", default="", help=f"agrupamentos separados por vírgula ({', '.join(GROUPS)}; padrão: regime)")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--regime")
+    parser.add_argument("--direction", choices=("COMPRA", "VENDA"))
+    parser.add_argument("--confidence-step", type=float, default=0.1)
+    parser.add_argument("--dist", choices=DISTRIBUTIONS, help="mostra o histograma desta coluna em vez da agregação")
+    parser.add_argument("--step", type=float, default=50.0, help="largura das faixas do histograma")
+    args = parser.parse_args()
+
+    with TradeStore(args.db or Path(args.reports) / "trades.sqlite") as store:
+        added = store.import_reports(args.reports)
+        by = [name for name in args.by.split(",") if name]
+        filters = {"start": args.start, "end": args.end, "regime": args.regime, "direction": args.direction}
+        started = time.perf_counter()
+        if args.dist:
+            table = store.distribution(args.dist, args.step, by=by, confidence_step=args.confidence_step, **filters)
+        else:
+            table = store.aggregate(by or ["regime"], confidence_step=args.confidence_step, **filters)
+        elapsed = time.perf_counter() - started
+        print(table.round(3).to_string(index=False))
+        print(f"trades={len(store)} importados={added} consulta={elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
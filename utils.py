@@ -2,14 +2,32 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import date, datetime, timedelta, time
+from datetime import date, datetime, timedelta, time, timezone, tzinfo
 from math import floor
+from time import sleep as _sleep
 from zoneinfo import ZoneInfo
 
+import numpy as np
+
 B3_TZ = ZoneInfo("America/Sao_Paulo")
 WIN_POINT_VALUE = 0.20
+B3_SESSION_OPEN = time(9, 0)
+TIMEFRAME_M1 = 1  # código MT5 (ver ``timeframe_seconds``), sem importar o MetaTrader5
+# layout de ``copy_rates_*`` do MetaTrader5 (o mesmo servido pelo ``mt5_replay``)
+RATES_DTYPE = np.dtype(
+    [
+        ("time", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("tick_volume", "<u8"),
+        ("spread", "<i4"),
+        ("real_volume", "<u8"),
+    ]
+)
 # Flag temporária para instrumentação detalhada do Bloco A.
-DEBUG_MODE = True
+DEBUG_MODE = False
 
 
 @dataclass
@@ -26,6 +44,51 @@ def now_b3() -> datetime:
     return datetime.now(tz=B3_TZ)
 
 
+class SystemClock:
+    """Relógio real usado pelo engine (substituível por um relógio de replay)."""
+
+    @staticmethod
+    def now() -> datetime:
+        return now_b3()
+
+    @staticmethod
+    def time() -> float:
+        """Horário de parede da B3 como epoch (mesma convenção dos timestamps do MT5)."""
+        moment = now_b3()
+        return moment.timestamp() + moment.utcoffset().total_seconds()
+
+    @staticmethod
+    def sleep(seconds: float) -> None:
+        _sleep(seconds)
+
+
+def to_epoch(value, tz: tzinfo | None = None) -> int:
+    """datetime/date/str/número → epoch em segundos.
+
+    Sem ``tz`` é o epoch do servidor do MT5 (horário de parede codificado como UTC; um fuso
+    presente é ignorado). Com ``tz`` (ex.: ``B3_TZ``) valores sem fuso são lidos nele e o
+    resultado é o epoch real.
+    """
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if tz is None:
+        value = value.replace(tzinfo=timezone.utc)
+    elif value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    return int(value.timestamp())
+
+
+def timeframe_seconds(timeframe: int) -> int:
+    """Duração de um timeframe MT5 em segundos (minutos abaixo de 16384, horas acima)."""
+    if timeframe < 16384:
+        return timeframe * 60
+    return (timeframe - 16384) * 3600
+
+
 def is_within_trading_window(moment: datetime, window: TradingWindow) -> bool:
     """Valida se está dentro da janela padrão de operação."""
     local_time = moment.timetz().replace(tzinfo=None)
@@ -0,0 +1,837 @@
+"""Backtest vetorizado do Sniper Adaptativo para pesquisa de parâmetros.
+
+Reproduz, em colunas NumPy, o que o ``TradingEngine`` vê a cada abertura de candle M5 na
+replay (``backtest.py``): o candle M5 em formação só com a abertura, os candles 15m/60m
+parciais (M5 fechados do bucket + abertura atual), indicadores com o estado dos candles
+fechados mais um ``peek`` do parcial, estrutura com o pivô tentativo do candle em formação,
+regime (``RegimeDetector.classify_batch``) recalculado só nos eventos de 15m, máscara de
+``_entry_conditions_met``/``_can_trade_now`` e níveis de stop/take em ATR. Só as saídas
+(breakeven e trailing pela EMA20 do 5m) dependem do caminho e passam por um kernel compacto.
+
+``cross_check`` refaz, em candles sorteados, o caminho escalar (``MT5Connector._compute_snapshot``
+sobre janelas de 300 candles, ``RegimeDetector.classify`` e ``_entry_conditions_met``).
+
+Uso: ``python vector_backtest.py replay/win_2024.npz --start 2024-03-01 --cross-check 200``
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+import mt5_replay
+from indicators import ewm_alpha, ewm_mean, true_range
+from intrabar import DrillDownStats, IntrabarResolver
+from market_structure import fractal_pivots, last_pivots, structure_from_last, structure_names
+from mt5_replay import TIMEFRAME_H1, TIMEFRAME_M5, TIMEFRAME_M15, Recording, server_epoch
+from regime_detector import RegimeBatch, RegimeDetector
+from resampler import resample
+from risk_manager import ExitParams, RiskManager
+from trade_journal import TRADE_COLUMNS, upgrade_header
+from utils import B3_TZ, TradingWindow, points_to_reais
+
+MIN_BARS = 60  # mesmo mínimo de ``MT5Connector._cached_rates``
+SNAPSHOT_WINDOW = 300  # capacidade do ``BarCache`` usada pelo cross-check
+_FEATURE_KEYS = (
+    "close_15m", "high_15m", "low_15m", "ema20_15", "ema50_15", "ema20_5", "ema20_15_prev3", "atr15",
+    "atr15_mean30", "adx15", "ema20_60", "ema50_60", "atr60", "adx60", "ema_distance_atr",
+)
+
+
+@dataclass
+class CrossCheckReport:
+    samples: int = 0
+    feature_mismatches: int = 0
+    signal_mismatches: int = 0
+    entry_mismatches: int = 0
+    max_feature_error: float = 0.0
+    examples: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.feature_mismatches or self.signal_mismatches or self.entry_mismatches)
+
+
+class Simulation(NamedTuple):
+    batch: RegimeBatch
+    events: np.ndarray  # eventos de 15m (reclassificação)
+    signal_index: np.ndarray  # evento de 15m vigente em cada candle (-1 sem sinal)
+    conditions: np.ndarray  # ``_entry_conditions_met`` por candle
+    trades: pd.DataFrame
+
+
+@dataclass
+class VectorBacktestResult:
+    bars: int
+    signals: int
+    trades: pd.DataFrame
+    result_points: float
+    elapsed: float
+    cross_check: Optional[CrossCheckReport] = None
+    drill_down: Optional[DrillDownStats] = None
+
+    @property
+    def bars_per_second(self) -> float:
+        return self.bars / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def load_rates(source: Recording | Path | str, symbol: str = "WIN$") -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """M5/M15/H1 da gravação; timeframes ausentes são agregados do M5 (sessão B3)."""
+    recording = source if isinstance(source, Recording) else Recording.load(source)
+    r5 = recording.rates[(symbol, TIMEFRAME_M5)]
+    r15 = recording.rates.get((symbol, TIMEFRAME_M15))
+    r60 = recording.rates.get((symbol, TIMEFRAME_H1))
+    return r5, resample(r5, 900) if r15 is None else r15, resample(r5, 3600) if r60 is None else r60
+
+
+def _forming(r5: np.ndarray, rates: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bucket e máxima/mínima do candle parcial de ``rates`` em cada abertura M5.
+
+    Mesmo critério de ``mt5_replay``: abertura do bucket, M5 já fechados dentro dele e a
+    abertura do M5 atual (que também é o fechamento parcial).
+    """
+    t5 = r5["time"]
+    bucket = np.searchsorted(rates["time"], t5, side="right") - 1
+    first = np.searchsorted(t5, rates["time"][np.maximum(bucket, 0)], side="left")
+    pos = np.arange(len(t5)) - first
+
+    high = np.full(len(t5), -np.inf)
+    low = np.full(len(t5), np.inf)
+    for p in range(1, int(pos.max(initial=0)) + 1):
+        idx = np.flatnonzero(pos == p)
+        high[idx] = np.maximum(high[idx - 1], r5["high"][idx - 1])
+        low[idx] = np.minimum(low[idx - 1], r5["low"][idx - 1])
+    price = r5["open"].astype("float64")
+    bar_open = rates["open"][np.maximum(bucket, 0)]
+    high = np.maximum(np.maximum(bar_open, high), price)
+    low = np.minimum(np.minimum(bar_open, low), price)
+    return bucket, high, low
+
+
+def _ewm_weights(samples: np.ndarray, alpha: float) -> np.ndarray:
+    """``old_wt`` da recorrência do pandas após cada amostra (decai a cada NaN após o início)."""
+    n = len(samples)
+    index = np.arange(n)
+    last = np.maximum.accumulate(np.where(samples == samples, index, -1))
+    gap = index - last
+    powers = [1.0]
+    for _ in range(int(gap.max(initial=0)) if n else 0):
+        powers.append(powers[-1] * (1.0 - alpha))  # mesmo produto iterado de ``_ewm_advance``
+    return np.where(last >= 0, np.asarray(powers)[np.minimum(gap, len(powers) - 1)], 1.0)
+
+
+def _ewm_peek(value: np.ndarray, old_wt: np.ndarray, sample: np.ndarray, alpha: float) -> np.ndarray:
+    """``EwmState.peek`` elemento a elemento (estado já iniciado)."""
+    started = value == value
+    old_wt = np.where(started, old_wt * (1.0 - alpha), old_wt)
+    with np.errstate(invalid="ignore"):
+        blended = (old_wt * value + alpha * sample) / (old_wt + alpha)
+    has_sample = sample == sample
+    return np.where(started, np.where(has_sample & (value != sample), blended, value), np.where(has_sample, sample, value))
+
+
+def _dx(plus_dm: np.ndarray, minus_dm: np.ndarray, atr: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        atr = np.where(atr == 0, np.nan, atr)
+        plus_di = 100 * plus_dm / atr
+        minus_di = 100 * minus_dm / atr
+        total = plus_di + minus_di
+        return 100 * np.abs(plus_di - minus_di) / np.where(total == 0, np.nan, total)
+
+
+def _directional(high: np.ndarray, low: np.ndarray, prev_high: np.ndarray, prev_low: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    up_move = high - prev_high
+    down_move = -(low - prev_low)
+    with np.errstate(invalid="ignore"):
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, np.nan)
+        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, np.nan)
+    return plus_dm, minus_dm
+
+
+def timeframe_columns(
+    rates: np.ndarray, bucket: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14, history: int = 30
+) -> dict[str, np.ndarray]:
+    """``TimeframeIndicators.peek`` em colunas: estado até ``bucket - 1`` + candle parcial.
+
+    O estado usa todo o histórico fechado (a replay semeia com a janela de 300 candles; a
+    diferença é o peso residual do início, ~1e-10). Entradas com ``bucket < 1`` ficam sem sentido.
+    """
+    closes = rates["close"].astype("float64")
+    highs = rates["high"].astype("float64")
+    lows = rates["low"].astype("float64")
+    wilder = ewm_alpha(alpha=1 / period)
+    prev = np.maximum(bucket - 1, 0)
+
+    ema20 = ewm_mean(closes, ewm_alpha(span=20))
+    ema50 = ewm_mean(closes, ewm_alpha(span=50))
+    atr = ewm_mean(true_range(highs, lows, closes), wilder)
+    plus_dm, minus_dm = _directional(highs, lows, np.r_[np.nan, highs[:-1]], np.r_[np.nan, lows[:-1]])
+    plus_ewm, minus_ewm = ewm_mean(plus_dm, wilder), ewm_mean(minus_dm, wilder)
+    dx = _dx(plus_ewm, minus_ewm, atr)
+    dx_ewm = ewm_mean(dx, wilder)
+
+    prev_close = closes[prev]
+    tr_now = np.maximum(np.maximum(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    plus_now, minus_now = _directional(high, low, highs[prev], lows[prev])
+    atr_now = _ewm_peek(atr[prev], np.ones(len(prev)), tr_now, wilder)
+    dx_now = _dx(
+        _ewm_peek(plus_ewm[prev], _ewm_weights(plus_dm, wilder)[prev], plus_now, wilder),
+        _ewm_peek(minus_ewm[prev], _ewm_weights(minus_dm, wilder)[prev], minus_now, wilder),
+        atr_now,
+    )
+    adx_now = _ewm_peek(dx_ewm[prev], _ewm_weights(dx, wilder)[prev], dx_now, wilder)
+
+    # média de ``history`` ATRs (fechados + atual) somada por linha como o ``peek`` escalar
+    atr_filled = np.nan_to_num(atr, nan=0.0)
+    atr_now = np.nan_to_num(atr_now, nan=0.0)
+    lags = np.arange(1 - history, 0)
+    window = np.empty((len(bucket), history))
+    window[:, :-1] = atr_filled[np.clip(bucket[:, None] + lags, 0, None)]
+    window[:, -1] = atr_now
+    atr_mean = window.sum(axis=1) / history
+    atr_mean[bucket < history - 1] = np.nan
+
+    return {
+        "ema20": _ewm_peek(ema20[prev], np.ones(len(prev)), close, ewm_alpha(span=20)),
+        "ema20_prev3": np.where(bucket >= 3, ema20[np.maximum(bucket - 3, 0)], np.nan),
+        "ema50": _ewm_peek(ema50[prev], np.ones(len(prev)), close, ewm_alpha(span=50)),
+        "atr14": atr_now,
+        "atr14_prev": atr_filled[prev],
+        "atr14_mean30": atr_mean,
+        "adx14": np.nan_to_num(adx_now, nan=0.0),
+    }
+
+
+def structure_columns(
+    rates: np.ndarray, bucket: np.ndarray, high: np.ndarray, low: np.ndarray, lookback: int, width: int = 2, count: int = 3
+) -> dict[str, np.ndarray]:
+    """``StructureTracker.peek`` em colunas: pivôs confirmados até ``bucket - 1`` + o tentativo."""
+    highs = rates["high"].astype("float64")
+    lows = rates["low"].astype("float64")
+    n = len(highs)
+    high_mask, low_mask = fractal_pivots(highs, lows, width)
+    bars = np.arange(n)
+    lo = np.maximum(width, bars + 1 - lookback)
+    hi = bars - width - 1  # candidatos cujo lado direito já fechou
+    pivot_highs, high_count = last_pivots(highs, high_mask, lo, hi, count)
+    pivot_lows, low_count = last_pivots(lows, low_mask, lo, hi, count)
+    b = np.maximum(bucket, 0)
+    pivot_highs, high_count = pivot_highs[b], high_count[b]
+    pivot_lows, low_count = pivot_lows[b], low_count[b]
+
+    # candidato que depende do candle em formação: centro em ``bucket - width``
+    center = np.clip(b - width, 0, n - 1)
+    tentative_high = b >= 2 * width
+    tentative_low = tentative_high.copy()
+    for k in range(1, width + 1):
+        left = np.clip(center - k, 0, n - 1)
+        tentative_high &= highs[center] > highs[left]
+        tentative_low &= lows[center] < lows[left]
+        if k < width:
+            right = np.clip(center + k, 0, n - 1)
+            tentative_high &= highs[center] > highs[right]
+            tentative_low &= lows[center] < lows[right]
+    tentative_high &= highs[center] > high
+    tentative_low &= lows[center] < low
+
+    for pivots, counts, tentative, values in (
+        (pivot_highs, high_count, tentative_high, highs),
+        (pivot_lows, low_count, tentative_low, lows),
+    ):
+        pivots[tentative, :-1] = pivots[tentative, 1:]
+        pivots[tentative, -1] = values[center[tentative]]
+        counts[tentative] = np.minimum(counts[tentative] + 1, count)
+
+    return {
+        "structure": structure_from_last(pivot_highs, pivot_lows, high_count, low_count),
+        "pivot_count": high_count + low_count,
+        "pivot_highs": pivot_highs,
+        "pivot_lows": pivot_lows,
+    }
+
+
+def snapshot_columns(
+    r5: np.ndarray,
+    r15: np.ndarray,
+    r60: np.ndarray,
+    context15_lookback: int = RegimeDetector.CONTEXT15_LOOKBACK,
+    macro_lookback: int = RegimeDetector.MACRO_LOOKBACK,
+) -> dict[str, np.ndarray]:
+    """Colunas do ``build_market_snapshot`` em cada abertura M5 (chaves do snapshot).
+
+    Além das chaves do snapshot inclui ``time``, ``bucket15/60`` e ``high_60m``/``low_60m``
+    (candles parciais), ``valid`` (snapshot não seria ``None``), ``structure15/60`` e
+    ``pivot_count15/60`` no formato de ``classify_batch`` e os pivôs de cada evento.
+    """
+    price = r5["open"].astype("float64")
+    n = len(price)
+    bucket15, high15, low15 = _forming(r5, r15)
+    bucket60, high60, low60 = _forming(r5, r60)
+    index5 = np.arange(n)
+
+    ind5 = timeframe_columns(r5, index5, price, price, price)
+    ind15 = timeframe_columns(r15, bucket15, high15, low15, price)
+    ind60 = timeframe_columns(r60, bucket60, high60, low60, price)
+
+    columns = {
+        "time": r5["time"].astype("int64"),
+        "bucket15": bucket15,
+        "bucket60": bucket60,
+        "valid": (index5 + 1 >= MIN_BARS) & (bucket15 + 1 >= MIN_BARS) & (bucket60 + 1 >= MIN_BARS),
+        "close_5m": price,
+        "close_15m": price,
+        "high_15m": high15,
+        "low_15m": low15,
+        "high_60m": high60,
+        "low_60m": low60,
+        "ema20": ind15["ema20"],
+        "ema50": ind15["ema50"],
+        "ema20_15": ind15["ema20"],
+        "ema50_15": ind15["ema50"],
+        "ema20_5": ind5["ema20"],
+        "ema20_15_prev3": ind15["ema20_prev3"],
+        "atr15": ind15["atr14"],
+        "atr15_prev": ind15["atr14_prev"],
+        "atr15_mean30": ind15["atr14_mean30"],
+        "adx15": ind15["adx14"],
+        "ema20_60": ind60["ema20"],
+        "ema50_60": ind60["ema50"],
+        "ema20_60_prev3": ind60["ema20_prev3"],
+        "atr60": ind60["atr14"],
+        "adx60": ind60["adx14"],
+        "ema_distance_atr": np.abs(ind15["ema20"] - ind15["ema50"]) / np.maximum(ind15["atr14"], 1e-9),
+    }
+    return with_structure(columns, r15, r60, context15_lookback, macro_lookback)
+
+
+def with_structure(
+    columns: dict[str, np.ndarray], r15: np.ndarray, r60: np.ndarray, context15_lookback: int, macro_lookback: int
+) -> dict[str, np.ndarray]:
+    """Cópia rasa de ``columns`` com a estrutura 15m/60m recalculada para outros lookbacks."""
+    columns = dict(columns)
+    for suffix, rates, lookback in (("15", r15, context15_lookback), ("60", r60, macro_lookback)):
+        st = structure_columns(rates, columns[f"bucket{suffix}"], columns[f"high_{suffix}m"], columns[f"low_{suffix}m"], lookback)
+        columns[f"structure{suffix}"] = st["structure"]
+        columns[f"pivot_count{suffix}"] = st["pivot_count"]
+        columns[f"pivot_highs{suffix}"] = st["pivot_highs"]
+        columns[f"pivot_lows{suffix}"] = st["pivot_lows"]
+    return columns
+
+
+def tradable_mask(times: np.ndarray, window: Optional[TradingWindow] = None) -> np.ndarray:
+    """``_can_trade_now`` em colunas: dentro da janela e fora do dia de vencimento."""
+    window = window or TradingWindow()
+    seconds = times % 86400
+    start = window.start.hour * 3600 + window.start.minute * 60 + window.start.second
+    end = window.end.hour * 3600 + window.end.minute * 60 + window.end.second
+    days = (times // 86400).astype("datetime64[D]")
+    day_of_month = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    weekday = ((times // 86400) + 3) % 7  # 1970-01-01 foi quinta-feira
+    expiration = (weekday == 2) & (day_of_month >= 15) & (day_of_month <= 21)  # 3ª quarta-feira
+    return (seconds >= start) & (seconds <= end) & ~expiration
+
+
+def signal_events(columns: dict[str, np.ndarray], in_range: np.ndarray) -> np.ndarray:
+    """Eventos em que o engine reclassifica: primeiro snapshot válido e cada candle 15m novo."""
+    active = columns["valid"] & in_range
+    bucket = columns["bucket15"]
+    changed = np.r_[True, bucket[1:] != bucket[:-1]]
+    events = active & changed
+    first = np.flatnonzero(active)
+    if len(first):
+        events[first[0]] = True
+    return events
+
+
+def entry_conditions(columns: dict[str, np.ndarray], batch: RegimeBatch, signal_index: np.ndarray) -> np.ndarray:
+    """``_entry_conditions_met`` com o sinal do último evento de 15m e o snapshot do evento."""
+    s = np.maximum(signal_index, 0)
+    direction = batch.direction[s]
+    ema20, ema50, atr15 = columns["ema20_15"], columns["ema50_15"], columns["atr15"]
+    close, high, low = columns["close_15m"], columns["high_15m"], columns["low_15m"]
+    buy = (direction == "COMPRA") & (ema20 > ema50) & (low <= ema20) & (close > ema20)
+    sell = (direction == "VENDA") & (ema20 < ema50) & (high >= ema20) & (close < ema20)
+    return (
+        (signal_index >= 0)
+        & (batch.macro[s] == "MACRO_TENDENCIA")
+        & (batch.context15[s] == "TENDENCIA_FORTE")
+        & (batch.confidence_score[s] >= 0.75)
+        & (np.abs(ema20 - ema50) > 0.4 * atr15)
+        & (buy | sell)
+    )
+
+
+def entry_levels(columns: dict[str, np.ndarray], buy: np.ndarray, exit_params: Optional[ExitParams] = None) -> dict[str, np.ndarray]:
+    """Stop/take de ``_open_position`` (ATR15, mínima/máxima do 15m e múltiplo pela distância)."""
+    p = exit_params or ExitParams()
+    atr15 = columns["atr15"]
+    entry = columns["close_5m"]
+    stop_base = p.stop_atr * atr15
+    take_points = np.where(columns["ema_distance_atr"] > p.extended_distance, p.take_r_extended, p.take_r) * stop_base
+    buy_stop = entry - stop_base
+    buy_stop = np.where(columns["low_15m"] - 1.0 < buy_stop, columns["low_15m"] - 1.0, buy_stop)
+    sell_stop = entry + stop_base
+    sell_stop = np.where(columns["high_15m"] + 1.0 > sell_stop, columns["high_15m"] + 1.0, sell_stop)
+    stop = np.where(buy, buy_stop, sell_stop)
+    stop_points = np.where(buy, entry - stop, stop - entry)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rr_ratio = np.where(stop_points > 0, take_points / stop_points, 0.0)
+        slope_rel = np.where(atr15 > 0, (columns["ema20_15"] - columns["ema20_15_prev3"]) / atr15, 0.0)
+    return {
+        "stop_price": stop,
+        "take_price": np.where(buy, entry + take_points, entry - take_points),
+        "stop_points": stop_points,
+        "take_points": take_points,
+        "rr_ratio": rr_ratio,
+        "slope_rel": slope_rel,
+    }
+
+
+def _exit_scan(
+    price: np.ndarray,
+    ema: np.ndarray,
+    start: int,
+    entry: float,
+    stop: float,
+    take: float,
+    stop_points: float,
+    chunk: int = 64,
+    low: Optional[np.ndarray] = None,
+    high: Optional[np.ndarray] = None,
+    touch: Optional[Callable[[int, float, float], tuple[str, float]]] = None,
+) -> tuple[int, str, float, float]:
+    """Evento, motivo, stop vigente e preço quando ``_manage_open_position`` fecha uma compra.
+
+    Antes do breakeven stop/take são fixos; depois o stop é ``min(max(stop, EMA20_5), take - 1)``
+    acumulado, resolvido por trecho com ``fmax.accumulate``. Vendas chegam com preços negados.
+    Com ``low``/``high`` (por candle M5, negados e trocados nas vendas) o candle ``j - 1`` é
+    conferido antes da abertura ``j``, como em ``_manage_intrabar``; ``touch(m, stop, take)``
+    devolve o nível tocado primeiro no candle ``m`` e o preço de saída.
+    """
+    n = len(price)
+    pos = start
+    armed = False
+    limit = take - 1.0
+    intrabar = low is not None
+    crossed = None
+    while pos < n:
+        end = min(n, pos + chunk)
+        chunk *= 2
+        p = price[pos:end]
+        if not armed:
+            hit = (p <= stop) | (p >= take) | (p - entry >= stop_points)
+            if intrabar:
+                crossed = (low[pos - 1:end - 1] <= stop) | (high[pos - 1:end - 1] >= take)
+                hit |= crossed
+            if not hit.any():
+                pos = end
+                continue
+            j = pos + int(hit.argmax())
+            if crossed is not None and crossed[j - pos]:
+                level, fill = touch(j - 1, stop, take)
+                return j, ("TP" if level == "take" else "SL"), stop, fill
+            if price[j] <= stop:
+                return j, "SL", stop, float(price[j])
+            if price[j] >= take:
+                return j, "TP", stop, float(price[j])
+            armed = True
+            stop = min(max(entry, float(np.fmax(entry, ema[j]))), limit)
+            pos = j + 1
+            continue
+        trail = np.minimum(np.fmax(stop, np.fmax.accumulate(ema[pos:end])), limit)
+        before = np.empty_like(trail)
+        before[0] = stop
+        before[1:] = trail[:-1]
+        hit = (p <= before) | (p >= take)
+        if intrabar:
+            crossed = (low[pos - 1:end - 1] <= before) | (high[pos - 1:end - 1] >= take)
+            hit |= crossed
+        if hit.any():
+            j = int(hit.argmax())
+            if crossed is not None and crossed[j]:
+                level, fill = touch(pos + j - 1, float(before[j]), take)
+                return pos + j, ("TP" if level == "take" else "TRAILING"), float(before[j]), fill
+            return pos + j, ("TRAILING" if p[j] <= before[j] else "TP"), float(before[j]), float(p[j])
+        stop = float(trail[-1])
+        pos = end
+    return -1, "", stop, float("nan")
+
+
+def _excursions(
+    price: np.ndarray, start: int, j: int, entry: float, stop: float, take: float, exit_price: float,
+    low: Optional[np.ndarray] = None, high: Optional[np.ndarray] = None,
+) -> tuple[float, float]:
+    """MFE/MAE (pontos) com os preços que ``SimulatedPosition.observe`` vê até a saída ``j``.
+
+    Mesma convenção de sinais de ``_exit_scan``; ``stop`` é o stop vigente na saída. Com
+    ``low``/``high`` os candles inteiros entram, menos o da saída intrabar (só o preço de saída).
+    """
+    seen = [price[start:j] - entry, [exit_price - entry]]
+    if low is not None:
+        last = j - 1 if low[j - 1] <= stop or high[j - 1] >= take else j
+        seen += [low[start - 1:last] - entry, high[start - 1:last] - entry]
+    moves = np.concatenate(seen)
+    return max(0.0, float(moves.max())), max(0.0, float(-moves.min()))
+
+
+def trailing_inputs(ema: np.ndarray, stop_points: np.ndarray | float, exit_params: ExitParams) -> tuple[np.ndarray, np.ndarray | float]:
+    """Adapta EMA/gatilho do breakeven à regra de trailing para ``_exit_scan``.
+
+    ``breakeven`` não acompanha a EMA (EMA toda NaN) e ``none`` nunca arma (gatilho infinito).
+    """
+    if exit_params.trailing == "none":
+        return ema, np.full_like(np.asarray(stop_points, dtype="float64"), np.inf)
+    if exit_params.trailing == "breakeven":
+        return np.full_like(ema, np.nan), stop_points
+    return ema, stop_points
+
+
+def _moment(epoch: int) -> datetime:
+    """Mesmo ``datetime`` de ``ReplayClock.now`` para o epoch do servidor."""
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=B3_TZ)
+
+
+def simulate_trades(
+    columns: dict[str, np.ndarray],
+    batch: RegimeBatch,
+    signal_index: np.ndarray,
+    entries: np.ndarray,
+    capital: float,
+    contracts: int,
+    exit_params: Optional[ExitParams] = None,
+    intrabar: Optional[IntrabarResolver] = None,
+    symbol: str = "WIN$",
+) -> pd.DataFrame:
+    """Percorre só as entradas possíveis; cada posição é resolvida por ``_exit_scan``.
+
+    Com ``intrabar`` os candles M5 da fonte (alinhados a ``columns``) entram na varredura e os
+    candles ambíguos passam pelo drill-down do ``IntrabarResolver``.
+    """
+    exit_params = exit_params or ExitParams()
+    price = columns["close_5m"]
+    times = columns["time"]
+    s = np.maximum(signal_index, 0)
+    buy = batch.direction[s] == "COMPRA"
+    levels = entry_levels(columns, buy, exit_params)
+    ema, trigger = trailing_inputs(columns["ema20_5"], levels["stop_points"], exit_params)
+    candidates = np.flatnonzero(entries)
+    ranges = {}
+    if intrabar is not None:
+        bars = intrabar.bars(symbol, TIMEFRAME_M5, int(times[0]), int(times[-1]))
+        if len(bars) != len(times) or not np.array_equal(bars["time"], times):
+            raise ValueError("Candles M5 do intrabar não batem com as colunas")
+        opens, highs, lows = bars["open"], bars["high"], bars["low"]
+
+        def touch_buy(m: int, stop: float, take: float) -> tuple[str, float]:
+            return intrabar.touch(symbol, int(times[m]), 300, opens[m], highs[m], lows[m], True, stop, take)
+
+        def touch_sell(m: int, stop: float, take: float) -> tuple[str, float]:
+            level, fill = intrabar.touch(symbol, int(times[m]), 300, opens[m], highs[m], lows[m], False, -stop, -take)
+            return level, -fill
+
+        ranges = {True: {"low": lows, "high": highs, "touch": touch_buy}, False: {"low": -highs, "high": -lows, "touch": touch_sell}}
+
+    signed = {True: (price, ema), False: (-price, -ema)}  # vendas com preços negados
+    rows = []
+    i = 0
+    while i < len(candidates):
+        k = int(candidates[i])
+        size = RiskManager.calculate_position_size(capital, 0.0075, exit_params.stop_atr * float(columns["atr15"][k]))
+        if min(size.contracts, contracts) <= 0:
+            i += 1
+            continue
+        entry, stop, take = float(price[k]), float(levels["stop_price"][k]), float(levels["take_price"][k])
+        intrabar_args = ranges.get(bool(buy[k]), {})
+        sign = 1.0 if buy[k] else -1.0
+        path, path_ema = signed[bool(buy[k])]
+        j, reason, final_stop, exit_price = _exit_scan(
+            path, path_ema, k + 1, sign * entry, sign * stop, sign * take, float(trigger[k]), **intrabar_args
+        )
+        if j < 0:
+            break  # posição ainda aberta no fim da série
+        mfe, mae = _excursions(
+            path, k + 1, j, sign * entry, final_stop, sign * take, exit_price,
+            intrabar_args.get("low"), intrabar_args.get("high"),
+        )
+        final_stop, exit_price = sign * final_stop, sign * exit_price
+        pnl = exit_price - entry if buy[k] else entry - exit_price
+        opened, closed = _moment(int(times[k])), _moment(int(times[j]))
+        sig = int(s[k])
+        rows.append({
+            "timestamp_open": opened.isoformat(),
+            "timestamp_close": closed.isoformat(),
+            "direction": "COMPRA" if buy[k] else "VENDA",
+            "entry_price": entry,
+            "stop_loss": final_stop,  # o engine grava o stop já movido pelo breakeven/trailing
+            "take_profit": take,
+            "exit_price": exit_price,
+            "exit_reason": reason,
+            "pnl_points": pnl,
+            "pnl_reais": points_to_reais(pnl),
+            "regime": str(batch.regime[sig]),
+            "confidence": float(batch.confidence_score[sig]),
+            "atr15": float(columns["atr15"][k]),
+            "adx15": float(columns["adx15"][k]),
+            "dist_rel": float(batch.dist_rel_15[sig]),
+            "slope_rel": float(levels["slope_rel"][k]),
+            "rr_ratio": float(levels["rr_ratio"][k]),
+            "duration_minutes": round((closed - opened).total_seconds() / 60.0, 2),
+            "mfe_points": mfe,
+            "mae_points": mae,
+        })
+        i = int(np.searchsorted(candidates, j))  # reabre no mesmo evento da saída, como o engine
+    return pd.DataFrame(rows, columns=TRADE_COLUMNS)
+
+
+def write_trade_reports(trades: pd.DataFrame, reports_dir: str | Path) -> list[Path]:
+    """Grava os trades no CSV mensal de ``_persist_closed_trade`` (por data de fechamento)."""
+    written = []
+    months = pd.to_datetime(trades["timestamp_close"].str[:7])
+    for month, group in trades.groupby(months, sort=True):
+        folder = Path(reports_dir) / f"{month.year}"
+        path = folder / f"trades_{month.year}_{month.month:02d}.csv"
+        os.makedirs(folder, exist_ok=True)
+        upgrade_header(path)
+        group.to_csv(path, mode="a", header=not path.exists(), index=False)
+        written.append(path)
+    return written
+
+
+def _visible(rates: np.ndarray, index: int, high: float, low: float, close: float) -> np.ndarray:
+    """Janela do ``BarCache`` com o candle ``index`` em formação (como a replay o entrega)."""
+    window = rates[max(0, index + 1 - SNAPSHOT_WINDOW):index + 1].copy()
+    window["high"][-1], window["low"][-1], window["close"][-1] = high, low, close
+    return window
+
+
+def cross_check(
+    r5: np.ndarray,
+    r15: np.ndarray,
+    r60: np.ndarray,
+    columns: dict[str, np.ndarray],
+    batch: RegimeBatch,
+    signal_index: np.ndarray,
+    conditions: np.ndarray,
+    samples: int = 200,
+    seed: int = 0,
+    symbol: str = "WIN$",
+    rel_tol: float = 1e-9,
+    detector: Optional[RegimeDetector] = None,
+) -> CrossCheckReport:
+    """Compara, em eventos sorteados, colunas/sinal/entrada com o caminho escalar do engine."""
+    # importados aqui: o conector importa o ``MetaTrader5``, que nesta ferramenta offline é a
+    # replay instalada explicitamente (como em backtest.py), salvo se o conector já foi importado
+    if "mt5_connector" not in sys.modules:
+        mt5_replay.install()
+    from engine import TradingEngine
+    from mt5_connector import MT5Connector
+
+    connector = MT5Connector(logging.getLogger("vector_backtest"))
+    detector = detector or RegimeDetector()
+    rng = np.random.default_rng(seed)
+    pool = np.flatnonzero(signal_index >= 0)
+    picks = np.sort(rng.choice(pool, size=min(samples, len(pool)), replace=False)) if len(pool) else pool
+    report = CrossCheckReport(samples=len(picks))
+
+    def scalar_snapshot(k: int) -> dict:
+        price = float(columns["close_5m"][k])
+        return connector._compute_snapshot(
+            symbol,
+            _visible(r5, k, price, price, price),
+            _visible(r15, int(columns["bucket15"][k]), columns["high_15m"][k], columns["low_15m"][k], price),
+            _visible(r60, int(columns["bucket60"][k]), columns["high_60m"][k], columns["low_60m"][k], price),
+        )
+
+    def note(message: str) -> None:
+        if len(report.examples) < 20:
+            report.examples.append(message)
+
+    # o conector é aquecido desde o início da série (passos menores que a janela), então o
+    # estado incremental dos indicadores é o mesmo do histórico completo usado nas colunas
+    needed = sorted(set(picks.tolist()) | set(signal_index[picks].tolist()))
+    snapshots: dict[int, dict] = {}
+    cursor = int(np.argmax(columns["bucket15"] >= 1))
+    for k in needed:
+        while k - cursor > SNAPSHOT_WINDOW // 2:
+            scalar_snapshot(cursor)
+            cursor += SNAPSHOT_WINDOW // 2
+        snapshots[k] = scalar_snapshot(k)
+        cursor = k
+
+    for k in picks.tolist():
+        s = int(signal_index[k])
+        when = _moment(int(columns["time"][k])).strftime("%Y-%m-%d %H:%M")
+        snap_k = snapshots[k]
+        signal = detector.classify(snapshots[s])
+
+        for key in _FEATURE_KEYS:
+            expected, got = snap_k[key], float(columns[key][k])
+            if expected != expected and got != got:
+                continue
+            error = abs(got - expected) / max(1.0, abs(expected))
+            report.max_feature_error = max(report.max_feature_error, error)
+            if not error <= rel_tol:
+                report.feature_mismatches += 1
+                note(f"{when} {key}: escalar={expected!r} vetorizado={got!r}")
+        for suffix, lookback in (("15", detector.params.context15_lookback), ("60", detector.params.macro_lookback)):
+            expected = detector._structure(snap_k, suffix, lookback)
+            got = (str(structure_names(columns[f"structure{suffix}"][k:k + 1])[0]), int(columns[f"pivot_count{suffix}"][k]))
+            if expected != got:
+                report.feature_mismatches += 1
+                note(f"{when} estrutura{suffix}: escalar={expected[0]}/{expected[1]} vetorizado={got[0]}/{got[1]}")
+
+        vector_signal = batch.signal(s)
+        for name in ("macro", "context15", "regime", "direction", "confidence_score", "structure15", "structure60"):
+            if getattr(signal, name) != getattr(vector_signal, name):
+                report.signal_mismatches += 1
+                note(f"{when} {name}: escalar={getattr(signal, name)!r} vetorizado={getattr(vector_signal, name)!r}")
+        expected_entry, _ = TradingEngine._entry_conditions_met(None, snap_k, signal)
+        if bool(expected_entry) != bool(conditions[k]):
+            report.entry_mismatches += 1
+            note(f"{when} entrada: escalar={expected_entry} vetorizado={bool(conditions[k])}")
+    return report
+
+
+def entry_signals(
+    columns: dict[str, np.ndarray],
+    in_range: np.ndarray,
+    detector: Optional[RegimeDetector] = None,
+) -> tuple[RegimeBatch, np.ndarray, np.ndarray, np.ndarray]:
+    """Regime em lote, eventos de 15m, sinal vigente e ``_entry_conditions_met`` por candle (sem trades)."""
+    detector = detector or RegimeDetector()
+    events = signal_events(columns, in_range)
+    batch = detector.classify_batch(columns)
+    latest = np.maximum.accumulate(np.where(events, np.arange(len(events)), -1))
+    signal_index = np.where(columns["valid"] & in_range, latest, -1)
+    return batch, events, signal_index, entry_conditions(columns, batch, signal_index)
+
+
+def simulate(
+    columns: dict[str, np.ndarray],
+    in_range: np.ndarray,
+    capital: float,
+    contracts: int,
+    detector: Optional[RegimeDetector] = None,
+    exit_params: Optional[ExitParams] = None,
+    intrabar: Optional[IntrabarResolver] = None,
+    symbol: str = "WIN$",
+) -> Simulation:
+    """Regime, entradas e trades sobre colunas prontas.
+
+    A estrutura de ``columns`` deve ter sido calculada com os lookbacks de ``detector.params``
+    (``snapshot_columns``/``with_structure``).
+    """
+    batch, events, signal_index, conditions = entry_signals(columns, in_range, detector)
+    entries = conditions & tradable_mask(columns["time"])
+    trades = simulate_trades(columns, batch, signal_index, entries, capital, contracts, exit_params, intrabar, symbol)
+    return Simulation(batch, events, signal_index, conditions, trades)
+
+
+def run_vector_backtest(
+    source: Recording | Path | str,
+    start=None,
+    end=None,
+    symbol: str = "WIN$",
+    capital: float = 10000.0,
+    contracts: int = 5,
+    reports_dir: str | Path | None = None,
+    cross_check_samples: int = 0,
+    detector: Optional[RegimeDetector] = None,
+    exit_params: Optional[ExitParams] = None,
+    intrabar: bool = False,
+) -> VectorBacktestResult:
+    """Mesma varredura de ``backtest.run_backtest`` (aberturas M5 entre ``start`` e ``end``), em lote.
+
+    ``intrabar`` confere stop/take pela máxima/mínima dos candles, com drill-down em M1/ticks.
+    """
+    recording = source if isinstance(source, Recording) else Recording.load(source)
+    r5, r15, r60 = load_rates(recording, symbol)
+    times = r5["time"].astype("int64")
+    lo = server_epoch(start) if start is not None else int(times[0])
+    hi = server_epoch(end) if end is not None else int(times[-1])
+    in_range = (times >= lo) & (times <= hi)
+    if not in_range.any():
+        raise ValueError("Nenhum candle M5 no intervalo do backtest")
+    detector = detector or RegimeDetector()
+
+    started = time.perf_counter()
+    columns = snapshot_columns(r5, r15, r60, detector.params.context15_lookback, detector.params.macro_lookback)
+    resolver = IntrabarResolver.from_recording(recording) if intrabar else None
+    sim = simulate(columns, in_range, capital, contracts, detector, exit_params, resolver, symbol)
+    elapsed = time.perf_counter() - started
+
+    report = None
+    if cross_check_samples:
+        report = cross_check(
+            r5, r15, r60, columns, sim.batch, sim.signal_index, sim.conditions,
+            samples=cross_check_samples, symbol=symbol, detector=detector,
+        )
+    if reports_dir is not None and len(sim.trades):
+        write_trade_reports(sim.trades, reports_dir)
+    return VectorBacktestResult(
+        bars=int(in_range.sum()),
+        signals=int(sim.events.sum()),
+        trades=sim.trades,
+        result_points=float(sim.trades["pnl_points"].sum()),
+        elapsed=elapsed,
+        cross_check=report,
+        drill_down=resolver.stats if resolver is not None else None,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="arquivo .npz do mt5_replay")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--symbol", default="WIN$")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--contracts", type=int, default=5)
+    parser.add_argument("--reports", help="grava os trades no CSV mensal neste diretório")
+    parser.add_argument("--cross-check", type=int, default=0, metavar="N", help="confere N candles sorteados no caminho escalar")
+    parser.add_argument("--intrabar", action="store_true", help="stop/take pela máxima/mínima, com drill-down em M1/ticks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s | %(message)s")
+    result = run_vector_backtest(
+        args.recording,
+        args.start,
+        args.end,
+        symbol=args.symbol,
+        capital=args.capital,
+        contracts=args.contracts,
+        reports_dir=args.reports,
+        cross_check_samples=args.cross_check,
+        intrabar=args.intrabar,
+    )
+    print(
+        f"candles={result.bars} sinais={result.signals} trades={len(result.trades)} "
+        f"resultado={result.result_points:.2f} pts tempo={result.elapsed:.3f}s ({result.bars_per_second:.0f} candles/s)"
+    )
+    drill = result.drill_down
+    if drill is not None:
+        print(
+            f"intrabar: saídas={drill.touches} drill-down={drill.drilled} (M1={drill.resolved_m1} "
+            f"ticks={drill.resolved_ticks} sem_dados={drill.unresolved})"
+        )
+    check = result.cross_check
+    if check is not None:
+        print(
+            f"cross-check: amostras={check.samples} features={check.feature_mismatches} sinais={check.signal_mismatches} "
+            f"entradas={check.entry_mismatches} erro_max={check.max_feature_error:.2e}"
+        )
+        for line in check.examples:
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Walk-forward dos parâmetros de regime sobre o histórico local (``HistoryStore``).
+
+O período é dividido em janelas móveis: ``train`` meses de otimização (in-sample, grid de
+``RegimeParams`` como no ``regime_sweep``) seguidos de ``test`` meses de avaliação
+(out-of-sample) com o melhor conjunto; a janela anda ``test`` meses por fold. Cada fold roda
+num processo do pool e grava suas colunas do ``vector_backtest`` em cache, numa chave que
+depende dos candles do fold: reexecuções só recalculam os folds cujos dados mudaram. Os
+trades out-of-sample dos folds, em sequência, formam a curva de capital final.
+
+A otimização in-sample só vê candles até o fim da janela de treino (as saídas não olham o
+teste). Posições ainda abertas no fim de uma janela são descartadas, como no backtest.
+
+Uso: ``python walk_forward.py history --start 2022-01-03 --end 2024-12-30 --train 6 --test 1 --cache wf_cache``
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from history_store import HistoryStore
+from mt5_replay import TIMEFRAME_H1, TIMEFRAME_M5, TIMEFRAME_M15, server_epoch
+from regime_detector import RegimeDetector, RegimeParams
+from regime_sweep import DEFAULT_GRID, _parse_grid, parameter_grid, rank, trade_stats
+from resampler import resample
+from vector_backtest import simulate, snapshot_columns, with_structure
+
+FEATURES_VERSION = 1  # muda a chave do cache quando o cálculo das colunas mudar
+
+
+@dataclass(frozen=True)
+class Fold:
+    index: int
+    train_start: datetime
+    test_start: datetime
+    test_end: datetime  # exclusivo
+
+
+@dataclass
+class WalkForwardResult:
+    folds: pd.DataFrame  # uma linha por fold: parâmetros escolhidos, métricas in/out-of-sample
+    trades: pd.DataFrame  # trades out-of-sample com a coluna ``fold``
+    equity: pd.DataFrame  # curva costurada: timestamp_close, fold, pnl_points, equity
+    elapsed: float
+
+    @property
+    def out_of_sample(self) -> dict[str, float]:
+        return trade_stats(self.trades["pnl_points"].to_numpy())
+
+
+def make_folds(start, end, train_months: int, test_months: int) -> list[Fold]:
+    """Janelas ``[train_start, test_start)``/``[test_start, test_end)`` andando ``test_months``."""
+    first, last = pd.Timestamp(start), pd.Timestamp(end)
+    folds = []
+    while True:
+        train_start = first + pd.DateOffset(months=test_months * len(folds))
+        test_start = train_start + pd.DateOffset(months=train_months)
+        test_end = min(test_start + pd.DateOffset(months=test_months), last)
+        if test_start >= test_end:
+            return folds
+        folds.append(Fold(len(folds), train_start.to_pydatetime(), test_start.to_pydatetime(), test_end.to_pydatetime()))
+
+
+def _read_rates(store: HistoryStore, symbol: str, date_from: datetime, date_to: datetime) -> tuple[np.ndarray, ...]:
+    lo, hi = server_epoch(date_from), server_epoch(date_to) - 1
+    r5 = store.read_range(symbol, TIMEFRAME_M5, lo, hi)
+    r15 = store.read_range(symbol, TIMEFRAME_M15, lo, hi)
+    r60 = store.read_range(symbol, TIMEFRAME_H1, lo, hi)
+    return r5, r15 if len(r15) else resample(r5, 900), r60 if len(r60) else resample(r5, 3600)
+
+
+def fold_features(
+    store: HistoryStore, symbol: str, fold: Fold, cache_dir: str | Path, warmup_days: int = 30
+) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray, bool]:
+    """Colunas do fold (com ``warmup_days`` antes do treino), do cache quando os candles não mudaram.
+
+    Devolve ``(colunas, rates15, rates60, veio_do_cache)``; as colunas do cache são memmaps.
+    """
+    r5, r15, r60 = _read_rates(store, symbol, fold.train_start - timedelta(days=warmup_days), fold.test_end)
+    if len(r5) == 0:
+        raise ValueError(f"Fold {fold.index}: nenhum candle M5 no histórico")
+    digest = hashlib.blake2b(digest_size=10)
+    digest.update(json.dumps([FEATURES_VERSION, RegimeDetector.CONTEXT15_LOOKBACK, RegimeDetector.MACRO_LOOKBACK]).encode())
+    for rates in (r5, r15, r60):
+        digest.update(np.ascontiguousarray(rates).tobytes())
+    cache = Path(cache_dir) / f"{symbol.replace('$', '_')}_{fold.train_start:%Y%m%d}_{fold.test_end:%Y%m%d}_{digest.hexdigest()}"
+
+    meta_path = cache / "meta.json"
+    if meta_path.exists():
+        names = json.loads(meta_path.read_text(encoding="utf-8"))["columns"]
+        columns = {name: np.load(cache / f"{name}.npy", mmap_mode="r") for name in names}
+        return columns, np.load(cache / "rates15.npy"), np.load(cache / "rates60.npy"), True
+
+    columns = snapshot_columns(r5, r15, r60)
+    scratch = cache.with_name(cache.name + f".tmp{os.getpid()}")
+    scratch.mkdir(parents=True, exist_ok=True)
+    for name, values in columns.items():
+        np.save(scratch / f"{name}.npy", values)
+    np.save(scratch / "rates15.npy", r15)
+    np.save(scratch / "rates60.npy", r60)
+    (scratch / "meta.json").write_text(json.dumps({"columns": list(columns)}), encoding="utf-8")
+    try:
+        scratch.rename(cache)
+    except OSError:
+        shutil.rmtree(scratch, ignore_errors=True)  # outro processo gravou a mesma chave
+    return columns, r15, r60, False
+
+
+def _head(columns: dict[str, np.ndarray], stop: int) -> dict[str, np.ndarray]:
+    return {name: values[:stop] for name, values in columns.items()}
+
+
+def run_fold(
+    store_root: str,
+    symbol: str,
+    fold: Fold,
+    combos: list[RegimeParams],
+    cache_dir: str,
+    capital: float,
+    contracts: int,
+    sort_by: str,
+    min_trades: int,
+    warmup_days: int,
+) -> tuple[dict, pd.DataFrame]:
+    """Otimiza no treino e avalia o melhor conjunto no teste; devolve o resumo e os trades de teste."""
+    started = time.perf_counter()
+    columns, r15, r60, cached = fold_features(HistoryStore(store_root), symbol, fold, cache_dir, warmup_days)
+    times = np.asarray(columns["time"])
+    test_start, test_end = server_epoch(fold.test_start), server_epoch(fold.test_end)
+    split = int(np.searchsorted(times, test_start))
+    train_range = times[:split] >= server_epoch(fold.train_start)
+    test_range = (times >= test_start) & (times < test_end)
+
+    structures: dict[tuple[int, int], dict[str, np.ndarray]] = {
+        (RegimeDetector.CONTEXT15_LOOKBACK, RegimeDetector.MACRO_LOOKBACK): columns
+    }
+    rows = []
+    for params in combos:
+        key = (params.context15_lookback, params.macro_lookback)
+        if key not in structures:
+            structures[key] = with_structure(columns, r15, r60, *key)
+        sim = simulate(_head(structures[key], split), train_range, capital, contracts, RegimeDetector(params=params))
+        rows.append({**asdict(params), **trade_stats(sim.trades["pnl_points"].to_numpy())})
+    table = rank(pd.DataFrame(rows), sort_by, min_trades)
+    best = RegimeParams(**{name: type(default)(table.iloc[0][name]) for name, default in asdict(RegimeParams()).items()})
+
+    key = (best.context15_lookback, best.macro_lookback)
+    trades = simulate(structures[key], test_range, capital, contracts, RegimeDetector(params=best)).trades
+    trades.insert(0, "fold", fold.index)
+    in_sample = {f"is_{name}": value for name, value in table.to_dict("records")[0].items() if name not in asdict(best)}
+    out_sample = {f"oos_{name}": value for name, value in trade_stats(trades["pnl_points"].to_numpy()).items()}
+    summary = {
+        "fold": fold.index,
+        "train_start": fold.train_start.date().isoformat(),
+        "test_start": fold.test_start.date().isoformat(),
+        "test_end": fold.test_end.date().isoformat(),
+        **asdict(best),
+        **in_sample,
+        **out_sample,
+        "cached": cached,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    return summary, trades
+
+
+def run_walk_forward(
+    store: HistoryStore | str | Path,
+    start,
+    end,
+    symbol: str = "WIN$",
+    train_months: int = 6,
+    test_months: int = 1,
+    grid: Optional[dict[str, Iterable]] = None,
+    capital: float = 10000.0,
+    contracts: int = 5,
+    cache_dir: str | Path = "walk_forward_cache",
+    workers: Optional[int] = None,
+    sort_by: str = "expectancy",
+    min_trades: int = 5,
+    warmup_days: int = 30,
+) -> WalkForwardResult:
+    """Roda todos os folds em paralelo e costura os trades out-of-sample em ordem."""
+    root = str(store.root if isinstance(store, HistoryStore) else store)
+    folds = make_folds(start, end, train_months, test_months)
+    if not folds:
+        raise ValueError("Período curto demais para uma janela de treino e uma de teste")
+    combos = parameter_grid(grid or DEFAULT_GRID)
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(folds))
+    args = (combos, str(cache_dir), capital, contracts, sort_by, min_trades, warmup_days)
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(run_fold, root, symbol, fold, *args) for fold in folds]
+        results = [future.result() for future in futures]
+
+    trades = pd.concat([fold_trades for _, fold_trades in results], ignore_index=True)
+    equity = trades[["timestamp_close", "fold", "pnl_points"]].copy()
+    equity["equity"] = equity["pnl_points"].cumsum()
+    return WalkForwardResult(
+        folds=pd.DataFrame([summary for summary, _ in results]),
+        trades=trades,
+        equity=equity,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("history", help="raiz do HistoryStore")
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    parser.add_argument("--symbol", default="WIN$")
+    parser.add_argument("--train", type=int, default=6, help="meses de otimização por fold")
+    parser.add_argument("--test", type=int, default=1, help="meses de avaliação (e passo) por fold")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--contracts", type=int, default=5)
+    parser.add_argument("--grid", action="append", default=[], metavar="NOME=v1,v2", help="valores de um campo de RegimeParams")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--cache", default="walk_forward_cache", help="diretório das colunas por fold")
+    parser.add_argument("--sort", default="expectancy")
+    parser.add_argument("--min-trades", type=int, default=5)
+    parser.add_argument("--warmup-days", type=int, default=30)
+    parser.add_argument("--out", help="grava a curva out-of-sample em CSV")
+    args = parser.parse_args()
+
+    result = run_walk_forward(
+        args.history,
+        args.start,
+        args.end,
+        symbol=args.symbol,
+        train_months=args.train,
+        test_months=args.test,
+        grid=_parse_grid(args.grid) or None,
+        capital=args.capital,
+        contracts=args.contracts,
+        cache_dir=args.cache,
+        workers=args.workers,
+        sort_by=args.sort,
+        min_trades=args.min_trades,
+        warmup_days=args.warmup_days,
+    )
+    if args.out:
+        result.equity.to_csv(args.out, index=False)
+    print(result.folds.to_string())
+    stats = result.out_of_sample
+    print(
+        f"folds={len(result.folds)} trades={stats['trades']} resultado={stats['result_points']:.2f} pts "
+        f"drawdown={stats['max_drawdown']:.2f} pts cache={int(result.folds['cached'].sum())}/{len(result.folds)} "
+        f"tempo={result.elapsed:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()